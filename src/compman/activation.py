@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from compman import cup, openair, storage, xcsoar
+
+# Airspace around the contest area, that is kept when trimming
+TRIM_MARGIN_KM = 50
+
+log = logging.getLogger("compman")
+
+# Activations replace the same files, never run them at the same time
+_APPLY_LOCK = threading.Lock()
+
+
+@dataclass
+class ActivationPlan:
+    """Files to install into XCSoar directory and profiles to update"""
+
+    files: Dict[str, str] = field(default_factory=dict)
+    digests: Dict[str, str] = field(default_factory=dict)
+    options: Dict[str, str] = field(default_factory=dict)
+    profiles: List[str] = field(default_factory=list)
+    trim_airspace: bool = False
+
+
+def plan(comp: storage.StoredCompetition) -> ActivationPlan:
+    """Plan activation of competition files in all its profiles.
+
+    Every file is installed only once, no matter how many profiles use it.
+    """
+    act = ActivationPlan(profiles=list(comp.profiles))
+    if comp.airspace:
+        _plan_file(act, comp.id, comp.airspace, xcsoar.AIRSPACE_FILE)
+        act.options["AirspaceFile"] = xcsoar.get_local_path(xcsoar.AIRSPACE_FILE)
+    if comp.waypoints:
+        _plan_file(act, comp.id, comp.waypoints, xcsoar.WAYPOINT_FILE)
+        act.options["WPFile"] = xcsoar.get_local_path(xcsoar.WAYPOINT_FILE)
+    act.trim_airspace = comp.trim_airspace and bool(comp.airspace and comp.waypoints)
+    return act
+
+
+def _plan_file(act: ActivationPlan, cid: str, stored: str, fname: str) -> None:
+    act.files[fname] = storage.get_full_file_path(cid, stored)
+    digest = storage.get_file_digest(cid, stored)
+    if digest is not None:
+        act.digests[fname] = digest
+
+
+def apply(act: ActivationPlan) -> None:
+    """Install files and update profiles.
+
+    Either everything is done, or, if any step fails, everything that was
+    already done is undone and the error is raised.
+    """
+    if not act.profiles:
+        return
+
+    with _APPLY_LOCK:
+        _apply(act)
+
+
+def _apply(act: ActivationPlan) -> None:
+    # Prepare and check files and read all the profiles before touching
+    # anything. Trimmed airspace is a subset of the validated one.
+    _validate(act)
+    if act.trim_airspace:
+        _trim_airspace(act)
+    profiles = [xcsoar.get_xcsoar_profile(p) for p in act.profiles]
+    for prf in profiles:
+        prf.set_options(act.options)
+
+    installed: List[xcsoar.InstalledFile] = []
+    saved: List[xcsoar.XCSoarProfile] = []
+    try:
+        for fname, src in act.files.items():
+            inst = xcsoar.install_file(src, fname, act.digests.get(fname))
+            if inst is not None:
+                installed.append(inst)
+        for prf in profiles:
+            if prf.save():
+                saved.append(prf)
+    except Exception:
+        log.exception("Activation failed, rolling back")
+        _rollback(installed, saved)
+        raise
+
+    for inst in installed:
+        xcsoar.discard_backup(inst)
+    log.info(
+        f"Activated {len(act.files)} files in {len(profiles)} profiles, "
+        f"{len(installed)} files and {len(saved)} profiles changed"
+    )
+
+
+async def activate(comp: storage.StoredCompetition) -> None:
+    """Activate competition files in XCSoar profiles, off the event loop"""
+    act = plan(comp)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, apply, act)
+
+
+def _trim_airspace(act: ActivationPlan) -> None:
+    """Replace airspace file with one limited to the contest area.
+
+    Contest area is the extent of waypoints plus `TRIM_MARGIN_KM`. Trimmed
+    file is stored, so it is created only once. If no zone is near the
+    contest area, airspace file is installed as it is.
+    """
+    airspace = act.files[xcsoar.AIRSPACE_FILE]
+    waypoints = act.files[xcsoar.WAYPOINT_FILE]
+    sources = [
+        act.digests.get(xcsoar.AIRSPACE_FILE) or xcsoar.hash_file(airspace),
+        act.digests.get(xcsoar.WAYPOINT_FILE) or xcsoar.hash_file(waypoints),
+    ]
+    kind = f"airspace-trimmed-{TRIM_MARGIN_KM}km"
+    trimmed = storage.find_derived_file(kind, sources)
+    if trimmed is None:
+        extent = cup.read_file(waypoints, sources[1]).extent()
+        if extent is None:
+            log.warning("No waypoints to define contest area, not trimming airspace")
+            return
+        area = openair.expand_bounds(extent, TRIM_MARGIN_KM)
+
+        tmpname = storage.get_temp_path(f"{kind}.part")
+        with open(airspace, "r", encoding="latin-1") as fin:
+            with open(tmpname, "w", encoding="latin-1") as fout:
+                stats = openair.trim(fin, area, fout)
+        if stats.kept == 0:
+            os.unlink(tmpname)
+            log.warning("No airspace near the contest area, not trimming airspace")
+            return
+        log.info(f"Trimmed airspace: kept {stats.kept}, dropped {stats.dropped}")
+        trimmed = storage.store_derived_file(kind, sources, tmpname)
+
+    assert trimmed.sha256 is not None
+    act.files[xcsoar.AIRSPACE_FILE] = storage.get_object_path(trimmed.sha256)
+    act.digests[xcsoar.AIRSPACE_FILE] = trimmed.sha256
+
+
+def _validate(act: ActivationPlan) -> None:
+    src = act.files.get(xcsoar.AIRSPACE_FILE)
+    if src is None:
+        return
+    digest = act.digests.get(xcsoar.AIRSPACE_FILE)
+    if digest is not None and xcsoar.is_installed(xcsoar.AIRSPACE_FILE, digest):
+        # Was validated when installed
+        return
+    try:
+        openair.validate_file(src, digest)
+    except openair.OpenAirError as e:
+        raise openair.OpenAirError(f"Invalid airspace file: {e}") from e
+
+
+def _rollback(
+    installed: List[xcsoar.InstalledFile], saved: List[xcsoar.XCSoarProfile]
+) -> None:
+    for prf in saved:
+        try:
+            prf.revert()
+        except OSError:
+            log.exception(f"Cannot restore profile {prf.filename}")
+    for inst in reversed(installed):
+        try:
+            xcsoar.restore_file(inst)
+        except OSError:
+            log.exception(f"Cannot restore {inst.fname}")
@@ -0,0 +1,47 @@
+import argparse
+import os
+import sys
+
+from compman import storage
+
+
+def add_location_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--datadir",
+        default=os.environ.get("COMPMAN_DATADIR", storage.DEFAULT_DATADIR),
+        help=(
+            "Path to directory where compman stores data. By default "
+            "~/.compman. Also can be set with COMPMAN_DATADIR environment variable"
+        ),
+    )
+    parser.add_argument(
+        "--xcsoardir",
+        default=os.environ.get("COMPMAN_XCSOARDIR", None),
+        help=(
+            "Path to xcsoar home directory. By default ~/.xcsoar. Also can be set "
+            "with COMPMAN_XCSOARDIR environment variable"
+        ),
+    )
+
+
+def positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive number: {value}")
+    return number
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    if argv[:1] == ["sync"]:
+        # Headless mode is used in boot scripts, don't load the UI at all
+        from compman import sync
+
+        sys.exit(sync.run(argv[1:]))
+
+    from compman import main as ui
+
+    ui.run(argv)
@@ -0,0 +1,85 @@
+import logging
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from aiohttp import ClientConnectionError
+
+PROBE_TTL = 10.0
+IPV4_ROUTES = "/proc/net/route"
+IPV6_ROUTES = "/proc/net/ipv6_route"
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+_ONLINE: Optional[bool] = None
+_PROBED_AT = 0.0
+
+log = logging.getLogger("compman")
+
+
+class OfflineError(ClientConnectionError):
+    """Device has no network connection, request is not attempted"""
+
+
+def is_online() -> bool:
+    """Return True if device appears to be connected to a network.
+
+    The probe only checks whether any non-loopback interface has a default
+    route, so it is cheap and never blocks. Result is cached for a few
+    seconds.
+    """
+    global _ONLINE, _PROBED_AT
+    now = time.monotonic()
+    if _ONLINE is None or now - _PROBED_AT > PROBE_TTL:
+        online = probe()
+        if online != _ONLINE:
+            log.info("Network is online" if online else "Network is offline")
+        _ONLINE = online
+        _PROBED_AT = now
+    return _ONLINE
+
+
+def invalidate() -> None:
+    global _ONLINE
+    _ONLINE = None
+
+
+def check(url: str) -> None:
+    """Raise OfflineError if url cannot be reached because device is offline"""
+    host = urlsplit(url).hostname
+    if host in LOCAL_HOSTS:
+        return
+    if not is_online():
+        raise OfflineError("No network connection")
+
+
+def probe() -> bool:
+    try:
+        return _has_default_route()
+    except FileNotFoundError:
+        # Not linux, cannot tell. Assume we are online.
+        return True
+
+
+def _has_default_route() -> bool:
+    with open(IPV4_ROUTES) as f:
+        next(f, None)  # Skip header
+        for line in f:
+            fields = line.split()
+            if len(fields) < 4 or fields[0] == "lo":
+                continue
+            destination, flags = fields[1], int(fields[3], 16)
+            if destination == "00000000" and flags & 0x1:  # RTF_UP
+                return True
+
+    try:
+        with open(IPV6_ROUTES) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 10 or fields[9] == "lo":
+                    continue
+                if fields[0] == "0" * 32 and fields[1] == "00":
+                    return True
+    except FileNotFoundError:
+        pass
+
+    return False
@@ -0,0 +1,224 @@
+import bisect
+import csv
+import math
+from array import array
+from typing import IO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Waypoint section of the file ends with this line, tasks follow
+TASKS_SEPARATOR = "-----Related Tasks-----"
+
+# Size of spatial index cell, in degrees
+GRID_STEP = 0.25
+EARTH_RADIUS_KM = 6371.0
+
+Bounds = Tuple[float, float, float, float]
+Cell = Tuple[int, int]
+
+_WAYPOINTS: Dict[str, "WaypointSet"] = {}
+
+
+class Waypoint(NamedTuple):
+    name: str
+    code: str
+    lat: float
+    lon: float
+
+
+class WaypointSet:
+    """Waypoints of a CUP file.
+
+    Coordinates are kept in flat arrays. Waypoints are indexed by grid cell
+    for nearest waypoint lookups, and by lowercase name for prefix lookups.
+    """
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.codes: List[str] = []
+        self.lats = array("d")
+        self.lons = array("d")
+        self._grid: Dict[Cell, List[int]] = {}
+        self._by_name: List[Tuple[str, int]] = []
+        self._by_name_sorted = True
+        # Range of occupied grid cells, (min_i, min_j, max_i, max_j)
+        self._cells = (0, 0, -1, -1)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, idx: int) -> Waypoint:
+        return Waypoint(
+            self.names[idx], self.codes[idx], self.lats[idx], self.lons[idx]
+        )
+
+    def add(self, name: str, code: str, lat: float, lon: float) -> None:
+        idx = len(self.names)
+        self.names.append(name)
+        self.codes.append(code)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        i, j = _cell(lat, lon)
+        self._grid.setdefault((i, j), []).append(idx)
+        if idx == 0:
+            self._cells = (i, j, i, j)
+        else:
+            min_i, min_j, max_i, max_j = self._cells
+            self._cells = (min(min_i, i), min(min_j, j), max(max_i, i), max(max_j, j))
+        self._by_name.append((name.lower(), idx))
+        self._by_name_sorted = False
+
+    def extent(self) -> Optional[Bounds]:
+        """Return (min_lat, min_lon, max_lat, max_lon) of all waypoints"""
+        if not self.names:
+            return None
+        return min(self.lats), min(self.lons), max(self.lats), max(self.lons)
+
+    def find(self, prefix: str) -> List[Waypoint]:
+        """Return waypoints whose names start with prefix, ignoring case"""
+        if not self._by_name_sorted:
+            self._by_name.sort()
+            self._by_name_sorted = True
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._by_name, (prefix, -1))
+        found = []
+        for name, idx in self._by_name[start:]:
+            if not name.startswith(prefix):
+                break
+            found.append(self[idx])
+        return found
+
+    def nearest(self, lat: float, lon: float) -> Optional[Waypoint]:
+        """Return waypoint nearest to given point.
+
+        Grid cells are searched in growing rings around the point, until no
+        unsearched cell can contain anything closer.
+        """
+        if not self.names:
+            return None
+        ci, cj = _cell(lat, lon)
+        min_i, min_j, max_i, max_j = self._cells
+        max_ring = max(ci - min_i, max_i - ci, cj - min_j, max_j - cj)
+
+        best, best_dist = -1, math.inf
+        for ring in range(max_ring + 1):
+            for cell in _ring(ci, cj, ring):
+                for idx in self._grid.get(cell, ()):
+                    dist = distance_km(lat, lon, self.lats[idx], self.lons[idx])
+                    if dist < best_dist:
+                        best, best_dist = idx, dist
+            if best_dist <= _ring_distance_km(lat, ring):
+                break
+        return self[best]
+
+    def format(self) -> str:
+        if not self.names:
+            return "no waypoints"
+        min_lat, min_lon, max_lat, max_lon = self.extent() or (0, 0, 0, 0)
+        mid_lat = (min_lat + max_lat) / 2
+        height = distance_km(min_lat, min_lon, max_lat, min_lon)
+        width = distance_km(mid_lat, min_lon, mid_lat, max_lon)
+        wps = "waypoint" if len(self) == 1 else "waypoints"
+        return f"{len(self)} {wps}, {width:.0f} x {height:.0f} km"
+
+
+def parse_lat(text: str) -> float:
+    """Parse CUP latitude, like 4621.467N"""
+    text = text.strip()
+    hemisphere = text[-1:].upper()
+    if len(text) < 6 or text[4] != "." or hemisphere not in "NS":
+        raise ValueError(f"invalid latitude: {text}")
+    value = int(text[:2]) + float(text[2:-1]) / 60
+    return -value if hemisphere == "S" else value
+
+
+def parse_lon(text: str) -> float:
+    """Parse CUP longitude, like 01410.417E"""
+    text = text.strip()
+    hemisphere = text[-1:].upper()
+    if len(text) < 7 or text[5] != "." or hemisphere not in "EW":
+        raise ValueError(f"invalid longitude: {text}")
+    value = int(text[:3]) + float(text[3:-1]) / 60
+    return -value if hemisphere == "W" else value
+
+
+def iter_waypoints(f: IO[str]) -> Iterator[Waypoint]:
+    """Yield every waypoint in SeeYou CUP file.
+
+    Rows with unparsable coordinates are skipped.
+    """
+    name_col, code_col, lat_col, lon_col = 0, 1, 3, 4
+    for n, row in enumerate(csv.reader(f)):
+        if not row:
+            continue
+        if row[0].strip() == TASKS_SEPARATOR:
+            break
+        if n == 0:
+            header = [c.strip().lower() for c in row]
+            if "lat" in header and "lon" in header:
+                lat_col, lon_col = header.index("lat"), header.index("lon")
+                if "name" in header:
+                    name_col = header.index("name")
+                if "code" in header:
+                    code_col = header.index("code")
+                continue
+        try:
+            lat, lon = parse_lat(row[lat_col]), parse_lon(row[lon_col])
+            yield Waypoint(row[name_col].strip(), row[code_col].strip(), lat, lon)
+        except (ValueError, IndexError):
+            continue
+
+
+def read(f: IO[str]) -> WaypointSet:
+    wps = WaypointSet()
+    for wp in iter_waypoints(f):
+        wps.add(*wp)
+    return wps
+
+
+def read_file(path: str, digest: Optional[str] = None) -> WaypointSet:
+    """Read waypoint file. Results are cached by file content hash."""
+    if digest is not None and digest in _WAYPOINTS:
+        return _WAYPOINTS[digest]
+    with open(path, "r", encoding="latin-1") as f:
+        wps = read(f)
+    if digest is not None:
+        _WAYPOINTS[digest] = wps
+    return wps
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great circle distance between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(a), 1.0))
+
+
+def _cell(lat: float, lon: float) -> Cell:
+    return math.floor(lat / GRID_STEP), math.floor(lon / GRID_STEP)
+
+
+def _ring(ci: int, cj: int, ring: int) -> Iterator[Cell]:
+    if ring == 0:
+        yield ci, cj
+        return
+    for j in range(cj - ring, cj + ring + 1):
+        yield ci - ring, j
+        yield ci + ring, j
+    for i in range(ci - ring + 1, ci + ring):
+        yield i, cj - ring
+        yield i, cj + ring
+
+
+def _ring_distance_km(lat: float, ring: int) -> float:
+    """Lower bound of distance to any cell outside of the given ring"""
+    # Meridians converge, so take the width of a cell at its polar side
+    polar_lat = min(abs(lat) + (ring + 1) * GRID_STEP, 90.0)
+    step = ring * GRID_STEP
+    return min(
+        distance_km(0, 0, step, 0),
+        distance_km(polar_lat, 0, polar_lat, step),
+    )
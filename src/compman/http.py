@@ -1,12 +1,402 @@
-import io
-from typing import IO
+import asyncio
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+)
 
-from aiohttp import ClientSession
+from aiohttp import (
+    ClientPayloadError,
+    ClientResponse,
+    ClientSession,
+    ClientTimeout,
+    TCPConnector,
+)
 
+from compman import connectivity, httpcache
+from compman.netpolicy import CircuitOpenError, get_policy
+from compman.scheduler import Priority, ProgressCallback, ProgressTracker
 
-async def fetch_file(file_url: str) -> IO[bytes]:
-    async with ClientSession() as session:
-        async with session.get(file_url) as response:
-            content = await response.read()
+CONNECTION_LIMIT = 8
+CONNECTION_LIMIT_PER_HOST = 4
+KEEPALIVE_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 15.0
+READ_TIMEOUT = 30.0
+PAGE_DEADLINE = 60.0
+CHUNK_SIZE = 64 * 1024
 
-    return io.BytesIO(content)
+_SESSION: Optional[ClientSession] = None
+_SESSION_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+log = logging.getLogger("compman")
+
+
+class RangeMismatchError(ClientPayloadError):
+    """Partial response does not continue the partially downloaded file"""
+
+
+def get_session() -> ClientSession:
+    """Return shared HTTP client session.
+
+    Session is created lazily on first use and is bound to the running event
+    loop. All requests share the same connection pool, so connections to the
+    same host are kept alive and reused between screens.
+    """
+    global _SESSION, _SESSION_LOOP
+    loop = asyncio.get_running_loop()
+    if _SESSION is None or _SESSION.closed or _SESSION_LOOP is not loop:
+        connector = TCPConnector(
+            limit=CONNECTION_LIMIT,
+            limit_per_host=CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        timeout = ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        _SESSION = ClientSession(connector=connector, timeout=timeout)
+        _SESSION_LOOP = loop
+        log.debug("HTTP session created")
+    return _SESSION
+
+
+async def close() -> None:
+    global _SESSION, _SESSION_LOOP
+    session = _SESSION
+    _SESSION = None
+    _SESSION_LOOP = None
+    if session is not None and not session.closed:
+        await session.close()
+        log.debug("HTTP session closed")
+
+
+async def fetch_cached(url: str, parse: Callable[[str], Any]) -> Any:
+    """Fetch the page and return the result of parsing it.
+
+    Parsed result is cached on disk along with page validators and can be
+    retrieved later with `get_cached()`, even without network. When the page
+    has not changed since it was last fetched, server responds with
+    "304 Not Modified" and cached result is returned without transferring
+    or parsing the page again. Cached result is also returned without
+    making a request when device is offline or the server is known to be
+    down. Parsed result must be JSON-serializable.
+    """
+    entry = httpcache.load(url)
+    headers = entry.conditional_headers() if entry is not None else {}
+
+    session = get_session()
+
+    async def fetch() -> Tuple[ClientResponse, Optional[str]]:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                return response, None
+            if response.status >= 500:
+                response.raise_for_status()
+            return response, await response.text()
+
+    try:
+        response, text = await get_policy().call(
+            url, fetch, deadline=PAGE_DEADLINE, priority=Priority.PAGE
+        )
+    except (connectivity.OfflineError, CircuitOpenError) as e:
+        if entry is None:
+            raise
+        # Server cannot be reached, last known result is better than nothing
+        log.info(f"Using cached {url}: {e}")
+        return entry.data
+    if text is None:
+        assert entry is not None
+        log.debug(f"Not modified: {url}")
+        return entry.data
+
+    data = parse(text)
+    if response.status == 200:
+        httpcache.save(httpcache.CacheEntry.from_response(url, response, data))
+    return data
+
+
+class ChunkParser(Protocol):
+    """Incremental parser, returning items as soon as they are parsed"""
+
+    def feed(self, chunk: bytes) -> List[Any]: ...
+
+    def close(self) -> List[Any]: ...
+
+
+async def iter_cached(
+    url: str, make_parser: Callable[[Optional[str]], ChunkParser]
+) -> AsyncIterator[List[Any]]:
+    """Fetch the page, yielding batches of items while it is being parsed.
+
+    Streaming counterpart of `fetch_cached()`. Parser is created with the
+    charset of the response and is fed with chunks as they arrive. List of
+    all parsed items is cached. When the page is not modified or cannot be
+    reached, cached items are yielded in a single batch.
+    """
+    entry = httpcache.load(url)
+    headers = entry.conditional_headers() if entry is not None else {}
+
+    session = get_session()
+    items: List[Any] = []
+    batches: "asyncio.Queue[List[Any]]" = asyncio.Queue()
+
+    async def fetch() -> Optional[ClientResponse]:
+        # Retried request starts over, skip the items we already have
+        skip = len(items)
+
+        def emit(parsed: List[Any]) -> None:
+            nonlocal skip
+            fresh = parsed[skip:]
+            skip = max(skip - len(parsed), 0)
+            if fresh:
+                items.extend(fresh)
+                batches.put_nowait(fresh)
+
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                return None
+            if response.status >= 500:
+                response.raise_for_status()
+            parser = make_parser(response.charset)
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                emit(parser.feed(chunk))
+            emit(parser.close())
+            return response
+
+    fetching = asyncio.ensure_future(
+        get_policy().call(url, fetch, deadline=PAGE_DEADLINE, priority=Priority.PAGE)
+    )
+    try:
+        while not fetching.done() or not batches.empty():
+            if batches.empty():
+                getter = asyncio.ensure_future(batches.get())
+                await asyncio.wait(
+                    [getter, fetching], return_when=asyncio.FIRST_COMPLETED
+                )
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                yield getter.result()
+            else:
+                yield batches.get_nowait()
+        response = fetching.result()
+    except (connectivity.OfflineError, CircuitOpenError) as e:
+        if entry is None or items:
+            raise
+        log.info(f"Using cached {url}: {e}")
+        yield entry.data
+        return
+    finally:
+        fetching.cancel()
+
+    if response is None:
+        assert entry is not None
+        log.debug(f"Not modified: {url}")
+        yield entry.data
+    elif response.status == 200:
+        httpcache.save(httpcache.CacheEntry.from_response(url, response, items))
+
+
+def get_cached(url: str) -> Any:
+    """Return last parsed result of `fetch_cached()` for the url, if any"""
+    entry = httpcache.load(url)
+    return entry.data if entry is not None else None
+
+
+async def download_file(
+    file_url: str,
+    dest: str,
+    priority: Priority = Priority.BACKGROUND,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Download file from given url and atomically store it as `dest`.
+
+    Response body is streamed in chunks to a `.part` file next to
+    destination, so memory usage does not depend on file size. Destination
+    file is replaced only when the download completes successfully.
+
+    If `dest` already exists and was previously downloaded from the same url,
+    conditional request is made and file is not transferred again unless it
+    was changed on the server.
+
+    If download is interrupted, partially downloaded file is kept along with
+    its validators (ETag or Last-Modified), and the next download of the same
+    url resumes from where it stopped using Range/If-Range request.
+
+    Download waits for a free connection slot according to its priority and
+    reports its progress to `progress` callback periodically. Failed
+    download is retried, continuing from partially downloaded file. If the
+    server responds with a range other than requested, or cannot serve it,
+    partial file is discarded and the whole file is requested again.
+
+    Returns size of downloaded file.
+    """
+
+    async def download() -> int:
+        try:
+            return await _download_once(file_url, dest, progress)
+        except RangeMismatchError as e:
+            log.warning(f"{e}, downloading it again")
+            return await _download_once(file_url, dest, progress)
+
+    return await get_policy().call(file_url, download, priority=priority)
+
+
+async def _download_once(
+    file_url: str, dest: str, progress: Optional[ProgressCallback]
+) -> int:
+    partname = f"{dest}.part"
+    metaname = f"{partname}.json"
+    partial = _load_partial(file_url, partname, metaname)
+
+    cached = httpcache.load(file_url) if os.path.exists(dest) else None
+
+    headers = {}
+    offset = 0
+    if partial is not None:
+        offset = os.path.getsize(partname)
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = partial.validator()
+    elif cached is not None:
+        headers.update(cached.conditional_headers())
+
+    session = get_session()
+    resumable = partial is not None
+    try:
+        async with session.get(file_url, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                log.debug(f"Not modified: {file_url}")
+                return os.path.getsize(dest)
+            if response.status == 416 and partial is not None:
+                # Partial file is larger than the server copy
+                resumable = False
+                raise RangeMismatchError(
+                    f"Requested {file_url} from {offset} bytes, "
+                    "range not satisfiable"
+                )
+            response.raise_for_status()
+            if response.status == 206:
+                start = _range_start(response)
+                if partial is None or start != offset:
+                    resumable = False
+                    raise RangeMismatchError(
+                        f"Requested {file_url} from {offset} bytes, "
+                        f"got range starting at {start}"
+                    )
+                log.info(f"Resuming download of {file_url} from {offset} bytes")
+                mode = "ab"
+            else:
+                partial = PartialDownload.from_response(file_url, response)
+                if partial is not None:
+                    partial.save(metaname)
+                resumable = partial is not None
+                offset = 0
+                mode = "wb"
+
+            total = response.content_length
+            tracker = ProgressTracker(
+                progress, total + offset if total is not None else None, offset
+            )
+            with open(partname, mode) as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    f.write(chunk)
+                    tracker.update(len(chunk))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            newentry = httpcache.CacheEntry.from_response(file_url, response)
+    except BaseException:
+        if resumable:
+            log.info(f"Download of {file_url} interrupted, keeping partial file")
+        else:
+            _discard_partial(partname, metaname)
+        raise
+
+    os.replace(partname, dest)
+    _discard_partial(partname, metaname)
+    if newentry.has_validators():
+        httpcache.save(newentry)
+    log.info(f"Downloaded {file_url} to {dest} ({size} bytes)")
+    return size
+
+
+@dataclass
+class PartialDownload:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @classmethod
+    def fromdict(cls, data: Dict[str, Any]) -> "PartialDownload":
+        return cls(
+            url=data["url"],
+            etag=data.get("etag"),
+            last_modified=data.get("last_modified"),
+        )
+
+    @classmethod
+    def from_response(
+        cls, url: str, response: ClientResponse
+    ) -> Optional["PartialDownload"]:
+        etag = response.headers.get("ETag")
+        if etag is not None and etag.startswith("W/"):
+            # Weak validators cannot be used with If-Range
+            etag = None
+        last_modified = response.headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return None
+        return cls(url=url, etag=etag, last_modified=last_modified)
+
+    def asdict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+        }
+
+    def validator(self) -> str:
+        validator = self.etag or self.last_modified
+        assert validator is not None
+        return validator
+
+    def save(self, metaname: str) -> None:
+        with open(metaname, "w") as f:
+            json.dump(self.asdict(), f)
+
+
+def _load_partial(url: str, partname: str, metaname: str) -> Optional[PartialDownload]:
+    if not os.path.exists(partname) or not os.path.exists(metaname):
+        _discard_partial(partname, metaname)
+        return None
+
+    try:
+        with open(metaname) as f:
+            partial = PartialDownload.fromdict(json.load(f))
+    except (ValueError, KeyError):
+        log.error(f"Cannot load partial download info: {metaname}")
+        partial = None
+
+    if partial is None or partial.url != url:
+        _discard_partial(partname, metaname)
+        return None
+    return partial
+
+
+def _discard_partial(partname: str, metaname: str) -> None:
+    for fname in (partname, metaname):
+        if os.path.exists(fname):
+            os.unlink(fname)
+
+
+def _range_start(response: ClientResponse) -> Optional[int]:
+    # Content-Range: bytes 500-999/1000
+    content_range = response.headers.get("Content-Range", "")
+    m = re.match(r"bytes (\d+)-", content_range)
+    return int(m.group(1)) if m else None
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientResponse
+
+from compman import storage
+
+log = logging.getLogger("compman")
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    data: Any = None
+
+    @classmethod
+    def fromdict(cls, data: Dict[str, Any]) -> "CacheEntry":
+        return cls(
+            url=data["url"],
+            etag=data.get("etag"),
+            last_modified=data.get("last_modified"),
+            data=data.get("data"),
+        )
+
+    @classmethod
+    def from_response(
+        cls, url: str, response: ClientResponse, data: Any = None
+    ) -> "CacheEntry":
+        return cls(
+            url=url,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            data=data,
+        )
+
+    def asdict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "data": self.data,
+        }
+
+    def has_validators(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def load(url: str) -> Optional[CacheEntry]:
+    fname = _get_entry_fname(url)
+    if fname is None or not os.path.exists(fname):
+        return None
+
+    with open(fname) as f:
+        try:
+            entry = CacheEntry.fromdict(json.load(f))
+        except (ValueError, KeyError):
+            log.error(f"Cannot load http cache entry: {fname}")
+            return None
+
+    if entry.url != url:
+        return None
+    return entry
+
+
+def save(entry: CacheEntry) -> None:
+    fname = _get_entry_fname(entry.url)
+    if fname is None:
+        return
+
+    os.makedirs(os.path.dirname(fname), mode=0o755, exist_ok=True)
+    tmpname = f"{fname}.tmp"
+    with open(tmpname, "w") as f:
+        json.dump(entry.asdict(), f)
+    os.replace(tmpname, fname)
+
+
+def invalidate(url: str) -> None:
+    fname = _get_entry_fname(url)
+    if fname is not None and os.path.exists(fname):
+        os.unlink(fname)
+
+
+def _get_entry_fname(url: str) -> Optional[str]:
+    cachedir = storage.get_cache_dir()
+    if cachedir is None:
+        # Storage is not initialized, caching is disabled
+        return None
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(cachedir, f"{key}.json")
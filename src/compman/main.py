@@ -6,29 +6,16 @@ import sys
 
 import urwid
 
-from compman import storage, xcsoar
+from compman import cli, http, soarscore, storage, xcsoar
 
 log = logging.getLogger("compman")
 
 
-parser = argparse.ArgumentParser(description="Competition manager for Openvario")
-parser.add_argument(
-    "--datadir",
-    default=os.environ.get("COMPMAN_DATADIR", storage.DEFAULT_DATADIR),
-    help=(
-        "Path to directory where compman stores data. By default "
-        "~/.compman. Also can be set with COMPMAN_DATADIR environment variable"
-    ),
+parser = argparse.ArgumentParser(
+    description="Competition manager for Openvario",
+    epilog="Run 'compman sync' to refresh stored competitions without the UI.",
 )
-parser.add_argument(
-    "--xcsoardir",
-    default=os.environ.get("COMPMAN_XCSOARDIR", None),
-    help=(
-        "Path to xcsoar home directory. By default ~/.xcsoar. Also can be set "
-        "with COMPMAN_XCSOARDIR environment variable"
-    ),
-)
-
+cli.add_location_arguments(parser)
 
 PALETTE = [
     ("text", "white", "black", ""),
@@ -125,6 +112,14 @@ def run(argv) -> None:
         log.info("Exiting normally")
     except KeyboardInterrupt:
         log.info("Killed")
+    finally:
+        shutdown(asyncioloop)
+
+
+def shutdown(asyncioloop: asyncio.AbstractEventLoop) -> None:
+    # Close pooled network connections cleanly before the loop goes away
+    asyncioloop.run_until_complete(http.close())
+    asyncioloop.run_until_complete(soarscore.close())
 
 
 def main():
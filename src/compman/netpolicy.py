@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+from urllib.parse import urlsplit
+
+from aiohttp import (
+    ClientConnectionError,
+    ClientPayloadError,
+    ClientResponseError,
+    ServerTimeoutError,
+)
+
+from compman import connectivity
+from compman.scheduler import Priority, get_scheduler
+
+log = logging.getLogger("compman")
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(ClientConnectionError):
+    """Host is known to be unreachable, request is not even attempted"""
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 10.0
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered exponential delay before given retry attempt (1-based)"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker.
+
+    After `failure_threshold` consecutive failures circuit opens, and all
+    requests to the host fail immediately for `reset_timeout` seconds. After
+    that, single trial request is let through ("half-open" state). If it
+    succeeds, circuit closes again, otherwise it stays open for another
+    `reset_timeout` seconds.
+    """
+
+    def __init__(
+        self, host: str, failure_threshold: int = 3, reset_timeout: float = 60.0
+    ) -> None:
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self._trial:
+            return False
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            log.info(f"Circuit for {self.host} is half-open, trying again")
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            log.info(f"Circuit for {self.host} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def release_trial(self) -> None:
+        """Trial request ended without a verdict, let another one through"""
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial or (
+            self.opened_at is None and self.failures >= self.failure_threshold
+        ):
+            log.warning(
+                f"Circuit for {self.host} opened after {self.failures} failures"
+            )
+            self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class NetworkPolicy:
+    """Deadlines, retries with backoff and circuit breaking for requests"""
+
+    def __init__(
+        self,
+        retry: Optional[RetryPolicy] = None,
+        failure_threshold: int = 3,
+        reset_timeout: float = 60.0,
+    ) -> None:
+        self.retry = retry or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get_breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(
+                host, self.failure_threshold, self.reset_timeout
+            )
+        return self._breakers[host]
+
+    def reset(self) -> None:
+        """Forget all known host failures"""
+        self._breakers.clear()
+
+    async def call(
+        self,
+        url: str,
+        func: Callable[[], Awaitable[T]],
+        retry_on: Tuple[Type[BaseException], ...] = (),
+        deadline: Optional[float] = None,
+        priority: Optional[Priority] = None,
+    ) -> T:
+        """Call `func` to request the url, retrying on network errors.
+
+        `retry_on` lists errors, that are considered network failures, in
+        addition to aiohttp connection, payload and server errors. `deadline` limits
+        total time spent on all attempts.
+
+        With `priority` given, every attempt waits for a connection slot of
+        the scheduler first. Time spent waiting does not count towards the
+        deadline.
+
+        Raises `connectivity.OfflineError` right away if device is offline.
+        """
+        connectivity.check(url)
+        breaker = self.get_breaker(url)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                log.info(f"Not requesting {url}: {breaker.host} is unreachable")
+                raise CircuitOpenError(f"{breaker.host} is unreachable")
+
+            attempt += 1
+            timeout = None
+            try:
+                async with AsyncExitStack() as stack:
+                    if priority is not None:
+                        queued_at = time.monotonic()
+                        slot = get_scheduler().slot(url, priority)
+                        await stack.enter_async_context(slot)
+                        started += time.monotonic() - queued_at
+                    if deadline is not None:
+                        timeout = deadline - (time.monotonic() - started)
+                    result = await asyncio.wait_for(func(), timeout)
+            except asyncio.TimeoutError as e:
+                error: BaseException = ServerTimeoutError(f"Timed out requesting {url}")
+                error.__cause__ = e
+            except ClientResponseError as e:
+                if e.status < 500:
+                    # Server is fine, it's the request that is wrong
+                    breaker.record_success()
+                    raise
+                error = e
+            except (ClientConnectionError, ClientPayloadError) + retry_on as e:
+                error = e
+            except BaseException:
+                # Cancelled, or failed not because of the network
+                breaker.release_trial()
+                raise
+            else:
+                breaker.record_success()
+                return result
+
+            breaker.record_failure()
+            delay = self.retry.backoff(attempt)
+            elapsed = time.monotonic() - started
+            out_of_time = deadline is not None and elapsed + delay >= deadline
+            if attempt >= self.retry.attempts or out_of_time or breaker.is_open:
+                log.warning(f"Giving up on {url} after {attempt} attempts: {error}")
+                raise error
+
+            log.warning(
+                f"Retrying {url} in {delay:.1f}s "
+                f"(attempt {attempt}/{self.retry.attempts}): {error}"
+            )
+            await asyncio.sleep(delay)
+
+
+_POLICY = NetworkPolicy()
+
+
+def get_policy() -> NetworkPolicy:
+    return _POLICY
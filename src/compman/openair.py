@@ -0,0 +1,386 @@
+import logging
+import math
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Arcs and circles are approximated by polygon with vertex every ARC_STEP degrees
+ARC_STEP = 10.0
+MAX_ERRORS = 10
+# Files with a few broken records are still usable, XCSoar skips them too
+MAX_ERROR_RATIO = 0.1
+KM_PER_DEGREE = 111.2
+
+COORD_RE = re.compile(
+    r"(\d+):(\d+(?:\.\d+)?)(?::(\d+(?:\.\d+)?))?\s*([NS])\s*,?\s*"
+    r"(\d+):(\d+(?:\.\d+)?)(?::(\d+(?:\.\d+)?))?\s*([EW])",
+    re.IGNORECASE,
+)
+ALTITUDE_RE = re.compile(r"(FL)?\s*(\d+(?:\.\d+)?)\s*(FT|F|M)?\b", re.IGNORECASE)
+# Altitudes meaning ground or sea level, reference is ignored anyway
+GROUND_ALTITUDES = {"GND", "SFC", "GROUND", "SURFACE", "AGL", "MSL", "AMSL"}
+
+_SUMMARIES: Dict[str, "Summary"] = {}
+
+log = logging.getLogger("compman")
+
+Bounds = Tuple[float, float, float, float]
+
+
+class OpenAirError(ValueError):
+    def __init__(self, message: str, line_no: Optional[int] = None) -> None:
+        if line_no is not None:
+            message = f"line {line_no}: {message}"
+        super().__init__(message)
+        self.line_no = line_no
+
+
+class Airspace:
+    """Single airspace zone.
+
+    Vertices are kept in a flat array of (lat, lon) pairs, so even big
+    national files take little memory.
+    """
+
+    __slots__ = ("cls", "name", "floor", "ceiling", "points", "line_no")
+
+    def __init__(self, cls: str, line_no: int) -> None:
+        self.cls = cls
+        self.name = ""
+        self.floor = 0.0
+        self.ceiling = math.inf
+        self.points = array("d")
+        self.line_no = line_no
+
+    def __len__(self) -> int:
+        return len(self.points) // 2
+
+    def bounds(self) -> Bounds:
+        """Return (min_lat, min_lon, max_lat, max_lon) of the zone"""
+        lats = self.points[0::2]
+        lons = self.points[1::2]
+        return min(lats), min(lons), max(lats), max(lons)
+
+
+@dataclass
+class Summary:
+    counts: Dict[str, int] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    error_count: int = 0
+
+    @property
+    def zones(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def valid(self) -> bool:
+        """File has zones and only a few broken records, if any"""
+        return self.zones > 0 and self.error_count <= self.zones * MAX_ERROR_RATIO
+
+    def format(self) -> str:
+        if not self.zones:
+            return "no airspace zones"
+        classes = ", ".join(f"{n} {cls}" for cls, n in sorted(self.counts.items()))
+        zones = "zone" if self.zones == 1 else "zones"
+        return f"{self.zones} {zones}: {classes}"
+
+
+def parse(
+    lines: Iterable[str], on_error: Optional[Callable[[OpenAirError], None]] = None
+) -> Iterator[Airspace]:
+    """Parse OpenAir lines, yielding airspaces one by one.
+
+    Malformed records and zones are skipped and passed to `on_error`, if
+    given. Otherwise the first error is raised.
+    """
+    parser = _Parser()
+    for line_no, line in enumerate(lines, 1):
+        try:
+            done = parser.feed(line_no, line)
+        except OpenAirError as e:
+            if on_error is None:
+                raise
+            on_error(e)
+            continue
+        if done is not None:
+            yield done
+
+    try:
+        done = parser.finish()
+    except OpenAirError as e:
+        if on_error is None:
+            raise
+        on_error(e)
+        return
+    if done is not None:
+        yield done
+
+
+def summarize(f: IO[str], max_errors: int = MAX_ERRORS) -> Summary:
+    """Count zones by class and collect errors, without keeping any zones"""
+    summary = Summary()
+
+    def on_error(e: OpenAirError) -> None:
+        summary.error_count += 1
+        if len(summary.errors) < max_errors:
+            summary.errors.append(str(e))
+
+    for airspace in parse(f, on_error):
+        summary.counts[airspace.cls] = summary.counts.get(airspace.cls, 0) + 1
+    return summary
+
+
+def summarize_file(path: str, digest: Optional[str] = None) -> Summary:
+    """Summarize airspace file. Summaries are cached by file content hash."""
+    if digest is not None and digest in _SUMMARIES:
+        return _SUMMARIES[digest]
+    with open(path, "r", encoding="latin-1") as f:
+        summary = summarize(f)
+    if digest is not None:
+        _SUMMARIES[digest] = summary
+    return summary
+
+
+def validate_file(path: str, digest: Optional[str] = None) -> Summary:
+    """Raise OpenAirError if file is not a usable airspace file.
+
+    Files with only a few errors are accepted, errors are logged.
+    """
+    summary = summarize_file(path, digest)
+    if not summary.zones:
+        raise OpenAirError("no airspace zones found")
+    if not summary.valid:
+        raise OpenAirError(f"{summary.error_count} errors, {summary.errors[0]}")
+    if summary.errors:
+        log.warning(
+            f"{path}: {summary.error_count} errors ignored, {summary.errors[0]}"
+        )
+    return summary
+
+
+@dataclass
+class TrimStats:
+    kept: int = 0
+    dropped: int = 0
+
+
+def trim(lines: Iterable[str], area: Bounds, out: IO[str]) -> TrimStats:
+    """Copy zones, that may overlap the area, to `out` and drop the rest.
+
+    Zones are compared by their bounding boxes. Comments and zones that
+    cannot be parsed are kept as they are.
+    """
+    parser = _Parser()
+    stats = TrimStats()
+    block: List[str] = []
+    broken = False
+
+    def flush(zone: Optional[Airspace]) -> None:
+        if zone is None or broken or _overlaps(zone.bounds(), area):
+            out.writelines(block)
+            stats.kept += zone is not None
+        else:
+            stats.dropped += 1
+
+    for line_no, line in enumerate(lines, 1):
+        is_ac = line.strip().partition(" ")[0].upper() == "AC"
+        try:
+            done = parser.feed(line_no, line)
+            error = False
+        except OpenAirError:
+            done = None
+            error = True
+
+        if is_ac:
+            # Error on AC line is about the previous zone
+            broken = broken or error
+            flush(done if block else None)
+            block = []
+            broken = False
+        elif error:
+            broken = True
+        block.append(line)
+
+    try:
+        done = parser.finish()
+    except OpenAirError:
+        done = None
+        broken = True
+    flush(done)
+    return stats
+
+
+def expand_bounds(bounds: Bounds, margin_km: float) -> Bounds:
+    min_lat, min_lon, max_lat, max_lon = bounds
+    dlat = margin_km / KM_PER_DEGREE
+    coslat = max(math.cos(math.radians(max(abs(min_lat), abs(max_lat)))), 1e-6)
+    dlon = dlat / coslat
+    return (min_lat - dlat, min_lon - dlon, max_lat + dlat, max_lon + dlon)
+
+
+def parse_coord(text: str) -> Tuple[float, float]:
+    m = COORD_RE.search(text)
+    if m is None:
+        raise ValueError(f"invalid coordinate: {text.strip()}")
+    lat = _to_degrees(m.group(1), m.group(2), m.group(3), m.group(4) in "Ss")
+    lon = _to_degrees(m.group(5), m.group(6), m.group(7), m.group(8) in "Ww")
+    if abs(lat) > 90 or abs(lon) > 180:
+        raise ValueError(f"coordinate out of range: {text.strip()}")
+    return lat, lon
+
+
+def parse_altitude(text: str) -> float:
+    """Return altitude in feet. Altitude reference (AGL/AMSL) is ignored."""
+    value = text.strip().upper()
+    if not value or value.split()[0] in GROUND_ALTITUDES:
+        return 0.0
+    if value.startswith("UNL"):
+        return math.inf
+    m = ALTITUDE_RE.match(value)
+    if m is None:
+        raise ValueError(f"invalid altitude: {text.strip()}")
+    alt = float(m.group(2))
+    if m.group(1):
+        return alt * 100
+    if m.group(3) == "M":
+        return alt / 0.3048
+    return alt
+
+
+def _overlaps(a: Bounds, b: Bounds) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _to_degrees(deg: str, mins: str, secs: Optional[str], negative: bool) -> float:
+    value = int(deg) + float(mins) / 60 + float(secs or 0) / 3600
+    return -value if negative else value
+
+
+class _Parser:
+    def __init__(self) -> None:
+        self.current: Optional[Airspace] = None
+        self.center: Optional[Tuple[float, float]] = None
+        self.clockwise = True
+
+    def feed(self, line_no: int, line: str) -> Optional[Airspace]:
+        line = line.strip()
+        if not line or line[0] == "*":
+            return None
+        record, _, value = line.partition(" ")
+        record = record.upper()
+        try:
+            return self._handle(line_no, record, value)
+        except OpenAirError:
+            raise
+        except ValueError as e:
+            raise OpenAirError(str(e), line_no) from e
+
+    def finish(self) -> Optional[Airspace]:
+        done = self.current
+        self.current = None
+        if done is not None:
+            self._check(done)
+        return done
+
+    def _handle(self, line_no: int, record: str, value: str) -> Optional[Airspace]:
+        if record == "AC":
+            done = self.current
+            self.current = Airspace(value.strip().upper(), line_no)
+            self.center = None
+            self.clockwise = True
+            if done is not None:
+                self._check(done)
+            return done
+
+        if record == "V":
+            key, _, arg = value.partition("=")
+            key = key.strip().upper()
+            if key == "X":
+                self.center = parse_coord(arg)
+            elif key == "D":
+                self.clockwise = arg.strip() != "-"
+            return None
+
+        if record not in ("AN", "AL", "AH", "DP", "DC", "DA", "DB"):
+            # Labels, styles and other records that do not matter
+            return None
+
+        cur = self.current
+        if cur is None:
+            raise OpenAirError(f"{record} outside of airspace", line_no)
+
+        if record == "AN":
+            cur.name = value.strip()
+        elif record == "AL":
+            cur.floor = parse_altitude(value)
+        elif record == "AH":
+            cur.ceiling = parse_altitude(value)
+        elif record == "DP":
+            cur.points.extend(parse_coord(value))
+        elif record == "DC":
+            center = self._get_center(line_no)
+            self._add_arc(cur, center, float(value), 0.0, 360.0, True)
+        elif record == "DA":
+            center = self._get_center(line_no)
+            radius, start, end = (float(v) for v in value.split(","))
+            self._add_arc(cur, center, radius, start, end, self.clockwise)
+        elif record == "DB":
+            center = self._get_center(line_no)
+            first, _, second = value.partition(",")
+            start_pt, end_pt = parse_coord(first), parse_coord(second)
+            radius = _distance(center, start_pt)
+            start, end = _bearing(center, start_pt), _bearing(center, end_pt)
+            self._add_arc(cur, center, radius, start, end, self.clockwise)
+        return None
+
+    def _get_center(self, line_no: int) -> Tuple[float, float]:
+        if self.center is None:
+            raise OpenAirError("arc without center (V X=)", line_no)
+        return self.center
+
+    def _add_arc(
+        self,
+        airspace: Airspace,
+        center: Tuple[float, float],
+        radius: float,
+        start: float,
+        end: float,
+        clockwise: bool,
+    ) -> None:
+        sweep = (end - start) % 360 if clockwise else -((start - end) % 360)
+        if sweep == 0:
+            sweep = 360.0 if clockwise else -360.0
+        steps = max(int(abs(sweep) / ARC_STEP), 1)
+        for n in range(steps + 1):
+            airspace.points.extend(_project(center, radius, start + sweep * n / steps))
+
+    def _check(self, airspace: Airspace) -> None:
+        if len(airspace) < 3:
+            raise OpenAirError(
+                f"airspace {airspace.name!r} has no area", airspace.line_no
+            )
+
+
+def _project(
+    center: Tuple[float, float], radius: float, bearing: float
+) -> Tuple[float, float]:
+    """Point at given distance (nautical miles) and bearing from center"""
+    # One nautical mile is one minute of latitude, good enough for airspaces
+    lat, lon = center
+    rad = math.radians(bearing)
+    dlat = radius * math.cos(rad) / 60
+    dlon = radius * math.sin(rad) / (60 * max(math.cos(math.radians(lat)), 1e-6))
+    return lat + dlat, lon + dlon
+
+
+def _distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    dlat = (b[0] - a[0]) * 60
+    dlon = (b[1] - a[1]) * 60 * math.cos(math.radians(a[0]))
+    return math.hypot(dlat, dlon)
+
+
+def _bearing(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    dlat = b[0] - a[0]
+    dlon = (b[1] - a[1]) * math.cos(math.radians(a[0]))
+    return math.degrees(math.atan2(dlon, dlat)) % 360
@@ -1,12 +1,24 @@
+import asyncio
+import logging
 import os
 from typing import Sequence
 
 import urwid
 from ovshell import api
 
-from compman import main, storage, xcsoar
+from compman import http, main, soarscore, storage, sync, xcsoar
 from compman.ui.mainmenu import MainMenuScreen
 
+# Let the shell and XCSoar start up before competing with them for resources
+BACKGROUND_SYNC_DELAY = 30.0
+
+log = logging.getLogger("compman")
+
+# Network clients are shared by the app and the background sync, and the
+# shell has no shutdown hook. They are closed when neither of them uses them
+# anymore, and created again when needed.
+_CLIENT_USERS = 0
+
 
 def extension(id: str, shell: api.OpenVarioShell) -> api.Extension:
     return CompmanExtension(id, shell)
@@ -22,6 +34,27 @@ class CompmanExtension(api.Extension):
     def list_apps(self) -> Sequence[api.App]:
         return [CompmanShellApp(self.shell)]
 
+    def start(self) -> None:
+        self.shell.processes.start(self._sync_in_background())
+
+    async def _sync_in_background(self) -> None:
+        await asyncio.sleep(BACKGROUND_SYNC_DELAY)
+        try:
+            setup()
+        except Exception as e:
+            # Shell keeps running, compman reports the problem when launched
+            log.warning(f"Skipping background sync, cannot set up compman: {e}")
+            return
+        if storage.get_settings().current_competition_id is None:
+            return
+        acquire_clients()
+        try:
+            await sync.sync_current(background=True)
+        except Exception:
+            log.exception("Background sync failed")
+        finally:
+            await release_clients()
+
 
 class CompmanShellApp(api.App):
     name = "compman"
@@ -33,13 +66,7 @@ class CompmanShellApp(api.App):
         self.shell = shell
 
     def launch(self) -> None:
-        datadir = os.environ.get("COMPMAN_DATADIR", storage.DEFAULT_DATADIR)
-        datadir = os.path.expanduser(datadir)
-        storage.init(datadir)
-        xcsoardir = os.environ.get("COMPMAN_XCSOARDIR", None)
-        xcsoar.init(xcsoardir)
-        main.setup_logging(datadir)
-
+        setup()
         act = CompmanShellActivity(self.shell)
         self.shell.screen.push_activity(act, palette=main.PALETTE)
 
@@ -49,11 +76,39 @@ class CompmanShellActivity(api.Activity):
         self.shell = shell
 
     def create(self) -> urwid.Widget:
+        acquire_clients()
         container = urwid.WidgetPlaceholder(urwid.SolidFill(" "))
         screen = MainMenuScreen(container)
         screen.on_exit(self._exit)
         screen.show()
         return container
 
+    def destroy(self) -> None:
+        self.shell.processes.start(release_clients())
+
     def _exit(self) -> None:
         self.shell.screen.pop_activity()
+
+
+def acquire_clients() -> None:
+    global _CLIENT_USERS
+    _CLIENT_USERS += 1
+
+
+async def release_clients() -> None:
+    """Close network clients, unless they are still used by someone else"""
+    global _CLIENT_USERS
+    _CLIENT_USERS -= 1
+    if _CLIENT_USERS > 0:
+        return
+    await http.close()
+    await soarscore.close()
+
+
+def setup() -> None:
+    datadir = os.environ.get("COMPMAN_DATADIR", storage.DEFAULT_DATADIR)
+    datadir = os.path.expanduser(datadir)
+    storage.init(datadir)
+    xcsoardir = os.environ.get("COMPMAN_XCSOARDIR", None)
+    xcsoar.init(xcsoardir)
+    main.setup_logging(datadir)
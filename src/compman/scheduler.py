@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+MAX_CONNECTIONS_PER_HOST = 2
+PROGRESS_INTERVAL = 0.5
+
+log = logging.getLogger("compman")
+
+
+class Priority(IntEnum):
+    """Download priority classes, lower value is served first"""
+
+    PAGE = 0
+    TASK = 1
+    WAYPOINT = 2
+    AIRSPACE = 3
+    BACKGROUND = 4
+
+
+@dataclass
+class Progress:
+    received: int
+    total: Optional[int]
+    rate: float  # bytes per second
+
+    @property
+    def eta(self) -> Optional[float]:
+        if self.total is None or self.rate <= 0:
+            return None
+        return max(self.total - self.received, 0) / self.rate
+
+    @property
+    def percent(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return self.received * 100.0 / self.total
+
+
+ProgressCallback = Callable[[Progress], None]
+
+
+class ProgressTracker:
+    def __init__(
+        self,
+        callback: Optional[ProgressCallback],
+        total: Optional[int],
+        received: int = 0,
+    ) -> None:
+        self.callback = callback
+        self.total = total
+        self.received = received
+        self._started = time.monotonic()
+        self._start_received = received
+        self._reported = 0.0
+
+    def update(self, nbytes: int) -> None:
+        self.received += nbytes
+        now = time.monotonic()
+        if self.callback is None or now - self._reported < PROGRESS_INTERVAL:
+            return
+        self._reported = now
+        self.callback(self.progress(now))
+
+    def progress(self, now: Optional[float] = None) -> Progress:
+        elapsed = (now or time.monotonic()) - self._started
+        transferred = self.received - self._start_received
+        rate = transferred / elapsed if elapsed > 0 else 0.0
+        return Progress(received=self.received, total=self.total, rate=rate)
+
+
+_Waiter = Tuple[int, int, "asyncio.Future[None]"]
+
+
+class DownloadScheduler:
+    """Limits concurrent requests per host and serves them by priority.
+
+    Requests wait for a free slot of their host. When slot gets released, it
+    is given to the waiting request with the highest priority (lowest
+    `Priority` value), and among equal priorities - to the oldest one.
+    """
+
+    def __init__(self, max_per_host: int = MAX_CONNECTIONS_PER_HOST) -> None:
+        self.max_per_host = max_per_host
+        self._active: Dict[str, int] = {}
+        self._waiting: Dict[str, List[_Waiter]] = {}
+        self._counter = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, url: str, priority: Priority) -> AsyncIterator[None]:
+        host = urlsplit(url).netloc
+        await self._acquire(host, priority)
+        try:
+            yield
+        finally:
+            self._release(host)
+
+    async def _acquire(self, host: str, priority: Priority) -> None:
+        fut: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        waiting = self._waiting.setdefault(host, [])
+        heapq.heappush(waiting, (priority, next(self._counter), fut))
+        self._dispatch(host)
+        if not fut.done():
+            log.debug(f"Waiting for connection slot to {host} ({priority.name})")
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Slot was given to us just before cancellation
+                self._release(host)
+            raise
+
+    def _release(self, host: str) -> None:
+        self._active[host] -= 1
+        self._dispatch(host)
+
+    def _dispatch(self, host: str) -> None:
+        waiting = self._waiting.get(host, [])
+        while waiting and self._active.get(host, 0) < self.max_per_host:
+            _, _, fut = heapq.heappop(waiting)
+            if fut.done():
+                # Cancelled while waiting
+                continue
+            self._active[host] = self._active.get(host, 0) + 1
+            fut.set_result(None)
+
+
+_SCHEDULER = DownloadScheduler()
+
+
+def get_scheduler() -> DownloadScheduler:
+    return _SCHEDULER
+
+
+def format_progress(progress: Progress) -> str:
+    parts = []
+    if progress.percent is not None:
+        parts.append(f"{progress.percent:.0f}%")
+    parts.append(f"{_format_rate(progress.rate)}")
+    eta = progress.eta
+    if eta is not None:
+        parts.append(f"ETA {eta:.0f}s")
+    return " ".join(parts)
+
+
+def _format_rate(rate: float) -> str:
+    for unit in ["B", "KiB", "MiB"]:
+        if rate < 1024.0:
+            return f"{rate:.1f}{unit}/s"
+        rate /= 1024.0
+    return f"{rate:.1f}GiB/s"
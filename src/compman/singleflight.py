@@ -0,0 +1,49 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Share one in-flight call between concurrent callers with the same key.
+
+    Cancelling one of the callers does not affect the others. The shared call
+    itself is cancelled only when all of its callers are cancelled.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, "asyncio.Future[T]"] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        fut = self._calls.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(func())
+            self._calls[key] = fut
+            self._waiters[key] = 0
+            fut.add_done_callback(lambda f: self._forget(key, f))
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            if self._calls.get(key) is fut:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0:
+                    # Forget it right away, so that a caller coming in the
+                    # meantime starts a new call instead of joining this one
+                    del self._calls[key]
+                    del self._waiters[key]
+                    fut.cancel()
+            raise
+
+    def _forget(self, key: Hashable, fut: "asyncio.Future[T]") -> None:
+        if self._calls.get(key) is fut:
+            del self._calls[key]
+            del self._waiters[key]
+        if not fut.cancelled():
+            # Mark exception as retrieved, in case nobody waits for it anymore
+            fut.exception()
@@ -2,11 +2,13 @@ import io
 import re
 from dataclasses import dataclass
 from enum import Enum
-from typing import List
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
-from aiohttp import ClientError, ClientSession
+from aiohttp import ClientError
 from lxml import etree
 
+from compman import http
+
 SOARINGSPOT_URL = "https://www.soaringspot.com"
 
 
@@ -22,6 +24,17 @@ class SoaringSpotDownloadableFile:
     href: str
     kind: DownloadableFileType = DownloadableFileType.UNKNOWN
 
+    @classmethod
+    def fromdict(cls, data: Dict[str, Any]) -> "SoaringSpotDownloadableFile":
+        return cls(
+            filename=data["filename"],
+            href=data["href"],
+            kind=DownloadableFileType(data["kind"]),
+        )
+
+    def asdict(self) -> Dict[str, Any]:
+        return {"filename": self.filename, "href": self.href, "kind": self.kind.value}
+
 
 @dataclass
 class SoaringSpotContest:
@@ -30,48 +43,103 @@ class SoaringSpotContest:
     title: str
     description: str
 
+    @classmethod
+    def fromdict(cls, data: Dict[str, Any]) -> "SoaringSpotContest":
+        return cls(
+            id=data["id"],
+            href=data["href"],
+            title=data["title"],
+            description=data["description"],
+        )
+
+    def asdict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "href": self.href,
+            "title": self.title,
+            "description": self.description,
+        }
+
 
 class SoaringSpotClientError(Exception):
     pass
 
 
 async def fetch_competitions() -> List[SoaringSpotContest]:
+    competitions = []
+    async for batch in iter_competitions():
+        competitions.extend(batch)
+    return competitions
+
+
+async def iter_competitions() -> AsyncIterator[List[SoaringSpotContest]]:
+    """Yield batches of competitions as the list is being downloaded"""
     try:
-        async with ClientSession() as session:
-            async with session.get(SOARINGSPOT_URL) as response:
-                html = await response.text()
+        async for batch in http.iter_cached(SOARINGSPOT_URL, ContestParser):
+            yield [SoaringSpotContest.fromdict(d) for d in batch]
     except ClientError as e:
         raise SoaringSpotClientError(str(e)) from e
 
-    # Parse html
-    parser = etree.HTMLParser()
-    root = etree.parse(io.StringIO(html), parser)
-    contests = []
-    for contestelem in root.xpath("//*[@class='contest']"):
-        linkel = contestelem.xpath("h3//a")[0]
-        title = linkel.text
-        href = linkel.attrib["href"]
-        descr = _extract_text(contestelem.xpath("*[@class='info']"))
-        cid = href.strip(" /").split("/")[-1]
-
-        contests.append(
-            SoaringSpotContest(
-                id=cid, href=f"{SOARINGSPOT_URL}{href}", title=title, description=descr
-            )
-        )
 
-    return contests
+def get_cached_competitions() -> Optional[List[SoaringSpotContest]]:
+    data = http.get_cached(SOARINGSPOT_URL)
+    if data is None:
+        return None
+    return [SoaringSpotContest.fromdict(d) for d in data]
 
 
 async def fetch_classes(comp_url: str) -> List[str]:
     results_url = f"{_sanitize_url(comp_url)}/results"
-    try:
-        async with ClientSession() as session:
-            async with session.get(results_url) as response:
-                html = await response.text()
-    except ClientError as e:
-        raise SoaringSpotClientError(str(e)) from e
+    return await _fetch_parsed(results_url, _parse_classes)
+
+
+async def fetch_downloads(comp_url: str) -> List[SoaringSpotDownloadableFile]:
+    dl_url = f"{_sanitize_url(comp_url)}/downloads"
+    data = await _fetch_parsed(dl_url, _parse_downloads)
+    return [SoaringSpotDownloadableFile.fromdict(d) for d in data]
+
 
+class ContestParser:
+    """Incremental parser of Soaring Spot competition list"""
+
+    def __init__(self, encoding: Optional[str] = None) -> None:
+        self._parser = etree.HTMLPullParser(events=("end",), encoding=encoding)
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        self._parser.feed(chunk)
+        return self._read_events()
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._parser.close()
+        return self._read_events()
+
+    def _read_events(self) -> List[Dict[str, Any]]:
+        contests = []
+        for _, el in self._parser.read_events():
+            if el.get("class") != "contest":
+                continue
+            contests.append(_parse_contest(el))
+            # Contest is parsed, free the memory
+            el.clear()
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+        return contests
+
+
+def _parse_contest(contestelem) -> Dict[str, Any]:
+    linkel = contestelem.xpath("h3//a")[0]
+    title = linkel.text
+    href = linkel.attrib["href"]
+    descr = _extract_text(contestelem.xpath("*[@class='info']"))
+    cid = href.strip(" /").split("/")[-1]
+
+    contest = SoaringSpotContest(
+        id=cid, href=f"{SOARINGSPOT_URL}{href}", title=title, description=descr
+    )
+    return contest.asdict()
+
+
+def _parse_classes(html: str) -> List[str]:
     parser = etree.HTMLParser()
     root = etree.parse(io.StringIO(html), parser)
 
@@ -82,15 +150,7 @@ async def fetch_classes(comp_url: str) -> List[str]:
     return classes
 
 
-async def fetch_downloads(comp_url: str) -> List[SoaringSpotDownloadableFile]:
-    dl_url = f"{_sanitize_url(comp_url)}/downloads"
-    try:
-        async with ClientSession() as session:
-            async with session.get(dl_url) as response:
-                html = await response.text()
-    except ClientError as e:
-        raise SoaringSpotClientError(str(e)) from e
-
+def _parse_downloads(html: str) -> List[Dict[str, Any]]:
     parser = etree.HTMLParser()
     root = etree.parse(io.StringIO(html), parser)
 
@@ -107,11 +167,18 @@ async def fetch_downloads(comp_url: str) -> List[SoaringSpotDownloadableFile]:
             dl.kind = DownloadableFileType.WAYPOINT
 
         if dl.kind != DownloadableFileType.UNKNOWN:
-            dls.append(dl)
+            dls.append(dl.asdict())
 
     return dls
 
 
+async def _fetch_parsed(url: str, parse: Callable[[str], Any]) -> Any:
+    try:
+        return await http.fetch_cached(url, parse)
+    except ClientError as e:
+        raise SoaringSpotClientError(str(e)) from e
+
+
 def _extract_text(els) -> str:
     texts: List[str] = []
     for el in els:
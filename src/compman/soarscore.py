@@ -1,16 +1,57 @@
 import asyncio
-import io
+import logging
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 import requests
+from aiohttp import ClientError
 from lxml import etree
+from requests.adapters import HTTPAdapter
+
+from compman.netpolicy import get_policy
+from compman.scheduler import Priority
+from compman.singleflight import SingleFlight
+
+try:
+    # Optional, provides async HTTP/2 client (install with "http2" extra)
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
 
 SOARSCORE_URL = "https://soarscore.com"
 
+REQUEST_TIMEOUT = 30.0
+REQUEST_DEADLINE = 60.0
+# Openvario board has two cores, and soarscore requests are rare anyway
+MAX_WORKERS = 2
+STREAM_CHUNK_SIZE = 4 * 1024
+# Rest of the page after the task links is read without parsing, up to this
+# size, so the connection is not closed and can be reused
+MAX_DRAIN_SIZE = 256 * 1024
+# After HTTP/2 transport fails, requests go through worker threads for this
+# many seconds before HTTP/2 is tried again
+HTTP2_RETRY_AFTER = 300.0
+
 SOARSCORE_TASK_DESC_RE = r"(.*) Day([0-9]+) Task([0-9]+) (.*) \.tsk generated: (.*)"
 
+log = logging.getLogger("compman")
+
+T = TypeVar("T")
+
 
 @dataclass
 class SoarScoreTaskInfo:
@@ -26,39 +67,336 @@ class SoarScoreClientError(Exception):
     pass
 
 
+_SESSION: Optional[requests.Session] = None
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_ASYNC_CLIENT: Any = None
+_ASYNC_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_HTTP2_UNAVAILABLE = httpx is None
+_HTTP2_DISABLED_UNTIL = 0.0
+_LATEST_TASKS: SingleFlight[List[SoarScoreTaskInfo]] = SingleFlight()
+# Responses, which are read to the end after their task links are parsed,
+# and clients, that are being closed
+_BACKGROUND: Set["asyncio.Future[None]"] = set()
+
+
+def get_session() -> requests.Session:
+    """Return shared requests session, keeping connections to soarscore alive"""
+    global _SESSION
+    if _SESSION is None:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS)
+        _SESSION = requests.Session()
+        _SESSION.mount("https://", adapter)
+        _SESSION.mount("http://", adapter)
+    return _SESSION
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return thread pool for blocking soarscore requests"""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=MAX_WORKERS, thread_name_prefix="soarscore"
+        )
+    return _EXECUTOR
+
+
+def get_async_client() -> Any:
+    """Return shared HTTP/2 client, or None if it is not available.
+
+    Soarscore serves on HTTP/2 and aiohttp cannot handle that. With httpx
+    installed, all requests to soarscore are multiplexed over a single
+    connection right in the event loop. Otherwise blocking requests are run
+    in worker threads.
+    """
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_LOOP, _HTTP2_UNAVAILABLE
+    if _HTTP2_UNAVAILABLE or time.monotonic() < _HTTP2_DISABLED_UNTIL:
+        return None
+    loop = asyncio.get_running_loop()
+    if _ASYNC_CLIENT is None or _ASYNC_CLIENT_LOOP is not loop:
+        if _ASYNC_CLIENT is not None:
+            # Left over from a previous event loop
+            _run_in_background(asyncio.ensure_future(_ASYNC_CLIENT.aclose()))
+            _ASYNC_CLIENT = None
+        try:
+            _ASYNC_CLIENT = httpx.AsyncClient(
+                http2=True, timeout=REQUEST_TIMEOUT, follow_redirects=True
+            )
+        except ImportError as e:
+            # httpx is installed without h2
+            log.info(f"HTTP/2 client is not available: {e}")
+            _HTTP2_UNAVAILABLE = True
+            return None
+        _ASYNC_CLIENT_LOOP = loop
+    return _ASYNC_CLIENT
+
+
+def _disable_http2(e: Exception) -> None:
+    global _HTTP2_DISABLED_UNTIL
+    log.warning(f"HTTP/2 request failed, falling back to HTTP/1.1: {e}")
+    _HTTP2_DISABLED_UNTIL = time.monotonic() + HTTP2_RETRY_AFTER
+
+
+async def close() -> None:
+    """Stop worker threads and close pooled connections"""
+    global _SESSION, _EXECUTOR, _ASYNC_CLIENT, _ASYNC_CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    for fut in list(_BACKGROUND):
+        if fut.get_loop() is loop:
+            fut.cancel()
+    _BACKGROUND.clear()
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _EXECUTOR = None
+    if _SESSION is not None:
+        _SESSION.close()
+        _SESSION = None
+    client = _ASYNC_CLIENT
+    _ASYNC_CLIENT = None
+    _ASYNC_CLIENT_LOOP = None
+    if client is not None:
+        await client.aclose()
+
+
 def _fetch_url(url) -> bytes:
-    resp = requests.get(url)
+    resp = get_session().get(url, timeout=REQUEST_TIMEOUT)
     return resp.content
 
 
-async def fetch_url(url) -> bytes:
-    loop = asyncio.get_running_loop()
+def _network_errors() -> Tuple[Type[Exception], ...]:
+    if httpx is None:
+        return (requests.RequestException,)
+    return (requests.RequestException, httpx.TransportError)
+
+
+def _client_errors() -> Tuple[Type[Exception], ...]:
+    if httpx is None:
+        return (requests.RequestException, ClientError)
+    # Bad status, broken encoding, redirect loop...
+    return (requests.RequestException, ClientError, httpx.HTTPError)
+
+
+async def _call(
+    url: str, fetch: Callable[[], Awaitable[T]], priority: Priority = Priority.PAGE
+) -> T:
     try:
-        return await loop.run_in_executor(None, _fetch_url, url)
-    except requests.RequestException as e:
+        return await get_policy().call(
+            url,
+            fetch,
+            retry_on=_network_errors(),
+            deadline=REQUEST_DEADLINE,
+            priority=priority,
+        )
+    except _client_errors() as e:
         raise SoarScoreClientError(str(e)) from e
 
 
+async def fetch_url(url, priority: Priority = Priority.PAGE) -> bytes:
+    loop = asyncio.get_running_loop()
+
+    async def fetch() -> bytes:
+        client = get_async_client()
+        if client is not None:
+            try:
+                resp = await client.get(url)
+                resp.raise_for_status()
+                return resp.content
+            except httpx.TransportError as e:
+                _disable_http2(e)
+        return await loop.run_in_executor(get_executor(), _fetch_url, url)
+
+    return await _call(url, fetch, priority)
+
+
+class TaskLinkParser:
+    """Incremental parser of task links on soarscore competition page.
+
+    Page is fed in chunks as they arrive. Tasks are returned as soon as their
+    links are parsed, and `done` is set when Downloads section is over, so
+    the rest of the page doesn't have to be read. Elements outside of the
+    Downloads section are discarded as soon as they are parsed.
+    """
+
+    def __init__(self) -> None:
+        self.done = False
+        self._parser = etree.HTMLPullParser(events=("start", "end"))
+        self._downloads: Optional[etree._Element] = None
+
+    def feed(self, chunk: bytes) -> List[SoarScoreTaskInfo]:
+        if self.done:
+            return []
+        self._parser.feed(chunk)
+        return self._read_events()
+
+    def close(self) -> List[SoarScoreTaskInfo]:
+        if self.done:
+            return []
+        self._parser.close()
+        tasks = self._read_events()
+        self.done = True
+        return tasks
+
+    def _read_events(self) -> List[SoarScoreTaskInfo]:
+        tasks = []
+        for event, el in self._parser.read_events():
+            if self.done:
+                break
+            if event == "start":
+                if self._downloads is None and el.get("id") == "Downloads":
+                    self._downloads = el
+            elif self._downloads is None:
+                _discard_element(el)
+            elif el is self._downloads:
+                self.done = True
+            elif el.tag == "a" and "download" in el.attrib:
+                raw_descr = " ".join(list(el.itertext())).strip()
+                task_info = parse_soarscore_description(el.attrib["href"], raw_descr)
+                if task_info is not None:
+                    tasks.append(task_info)
+        return tasks
+
+
+def _discard_element(el: etree._Element) -> None:
+    el.clear()
+    parent = el.getparent()
+    if parent is not None:
+        while el.getprevious() is not None:
+            del parent[0]
+
+
+def _stream_tasks(
+    url: str,
+    parser: TaskLinkParser,
+    on_tasks: Callable[[List[SoarScoreTaskInfo]], None],
+    on_parsed: Callable[[], None],
+) -> None:
+    with get_session().get(url, timeout=REQUEST_TIMEOUT, stream=True) as resp:
+        drained = 0
+        for chunk in resp.iter_content(STREAM_CHUNK_SIZE):
+            if parser.done:
+                drained += len(chunk)
+                if drained > MAX_DRAIN_SIZE:
+                    return
+                continue
+            on_tasks(parser.feed(chunk))
+            if parser.done:
+                on_parsed()
+    if not parser.done:
+        on_tasks(parser.close())
+
+
+async def _stream_tasks_http2(
+    client: Any,
+    url: str,
+    parser: TaskLinkParser,
+    on_tasks: Callable[[List[SoarScoreTaskInfo]], None],
+    on_parsed: Callable[[], None],
+) -> None:
+    async with client.stream("GET", url) as resp:
+        resp.raise_for_status()
+        drained = 0
+        async for chunk in resp.aiter_bytes(STREAM_CHUNK_SIZE):
+            if parser.done:
+                drained += len(chunk)
+                if drained > MAX_DRAIN_SIZE:
+                    return
+                continue
+            on_tasks(parser.feed(chunk))
+            if parser.done:
+                on_parsed()
+    if not parser.done:
+        on_tasks(parser.close())
+
+
+async def _until_parsed(
+    streaming: "asyncio.Future[None]", parsed: "asyncio.Future[None]"
+) -> None:
+    """Wait until the page is read or task links on it are parsed.
+
+    In the latter case the rest of the page is drained in background, so the
+    connection can be reused.
+    """
+    try:
+        await asyncio.wait([streaming, parsed], return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        streaming.cancel()
+        raise
+    if streaming.done():
+        streaming.result()
+        return
+    _run_in_background(streaming)
+
+
+def _run_in_background(fut: "asyncio.Future[None]") -> None:
+    _BACKGROUND.add(fut)
+    fut.add_done_callback(_background_done)
+
+
+def _background_done(fut: "asyncio.Future[None]") -> None:
+    _BACKGROUND.discard(fut)
+    if not fut.cancelled() and fut.exception() is not None:
+        log.debug(f"Background soarscore request failed: {fut.exception()}")
+
+
 async def fetch_latest_tasks(comp_id: str) -> List[SoarScoreTaskInfo]:
-    # Soarscore serves on HTTP/2 and aiohttp cannot handle that. Run synchronous
-    # requests
-    # instead.
+    """Return tasks available for download on soarscore competition page.
+
+    Page is parsed while it is being downloaded, and tasks are returned as
+    soon as Downloads section is parsed. Concurrent calls share a single
+    request.
+    """
+    return await _LATEST_TASKS.do(comp_id, lambda: _fetch_latest_tasks(comp_id))
+
+
+async def _fetch_latest_tasks(comp_id: str) -> List[SoarScoreTaskInfo]:
     comp_url = f"{SOARSCORE_URL}/competitions/{comp_id}/"
-    html = await fetch_url(comp_url)
+    loop = asyncio.get_running_loop()
+    found: Dict[str, SoarScoreTaskInfo] = {}
+
+    def emit(tasks: List[SoarScoreTaskInfo]) -> None:
+        for ti in tasks:
+            # Retried request may find the same tasks again
+            found.setdefault(ti.task_url, ti)
+
+    def emit_threadsafe(tasks: List[SoarScoreTaskInfo]) -> None:
+        if tasks:
+            loop.call_soon_threadsafe(emit, tasks)
+
+    async def fetch() -> None:
+        parsed: "asyncio.Future[None]" = loop.create_future()
+
+        def set_parsed() -> None:
+            if not parsed.done():
+                parsed.set_result(None)
 
-    parser = etree.HTMLParser()
-    root = etree.parse(io.BytesIO(html), parser)
+        def set_parsed_threadsafe() -> None:
+            loop.call_soon_threadsafe(set_parsed)
 
-    task_links = root.xpath('//*[@id="Downloads"]//a[@download]')
-    tasks = []
-    for link in task_links:
-        href = link.attrib["href"]
-        raw_descr = " ".join(list(link.itertext())).strip()
-        task_info = parse_soarscore_description(href, raw_descr)
-        if task_info is not None:
-            tasks.append(task_info)
+        client = get_async_client()
+        if client is not None:
+            streaming = asyncio.ensure_future(
+                _stream_tasks_http2(
+                    client, comp_url, TaskLinkParser(), emit, set_parsed
+                )
+            )
+            try:
+                await _until_parsed(streaming, parsed)
+                return
+            except httpx.TransportError as e:
+                _disable_http2(e)
+        await _until_parsed(
+            loop.run_in_executor(
+                get_executor(),
+                _stream_tasks,
+                comp_url,
+                TaskLinkParser(),
+                emit_threadsafe,
+                set_parsed_threadsafe,
+            ),
+            parsed,
+        )
 
-    return tasks
+    await _call(comp_url, fetch)
+    return list(found.values())
 
 
 def parse_soarscore_description(
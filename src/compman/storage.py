@@ -1,13 +1,16 @@
+import hashlib
 import json
 import logging
 import os
+import shutil
 from dataclasses import dataclass, field
-from typing import IO, Any, Dict, List, Optional
+from typing import IO, Any, Dict, List, Optional, Set, Tuple
 
 DEFAULT_DATADIR = "~/.compman"
 
-_DATADIR: Optional[str]
+_DATADIR: Optional[str] = None
 _SETTINGS: Optional["Settings"] = None
+_TASKS: Dict[str, Dict["TaskKey", "StoredTask"]] = {}
 
 log = logging.getLogger("compman")
 
@@ -34,6 +37,10 @@ class StoredCompetition:
     profiles: List[str] = field(default_factory=list)
     classes: List[str] = field(default_factory=list)
     selected_class: Optional[str] = None
+    synced_at: Optional[float] = None
+    watch_tasks: bool = False
+    autoinstall_tasks: bool = False
+    trim_airspace: bool = False
 
     @classmethod
     def fromdict(cls, id: str, data: Dict[str, Any]) -> "StoredCompetition":
@@ -46,6 +53,10 @@ class StoredCompetition:
             profiles=data.get("profiles") or [],
             classes=data.get("classes") or [],
             selected_class=data.get("selected_class"),
+            synced_at=data.get("synced_at"),
+            watch_tasks=data.get("watch_tasks", False),
+            autoinstall_tasks=data.get("autoinstall_tasks", False),
+            trim_airspace=data.get("trim_airspace", False),
         )
 
     def asdict(self) -> Dict[str, Any]:
@@ -57,6 +68,10 @@ class StoredCompetition:
             "profiles": self.profiles,
             "classes": self.classes,
             "selected_class": self.selected_class,
+            "synced_at": self.synced_at,
+            "watch_tasks": self.watch_tasks,
+            "autoinstall_tasks": self.autoinstall_tasks,
+            "trim_airspace": self.trim_airspace,
             "version": 1,
         }
 
@@ -69,20 +84,60 @@ class StoredCompetition:
             self.profiles.remove(profile)
 
 
+TaskKey = Tuple[str, int, int, str]
+
+
+@dataclass
+class StoredTask:
+    comp_class: str
+    day_no: int
+    task_no: int
+    timestamp: str
+    title: str
+    sha256: str
+
+    @classmethod
+    def fromdict(cls, data: Dict[str, Any]) -> "StoredTask":
+        return cls(
+            comp_class=data["comp_class"],
+            day_no=data["day_no"],
+            task_no=data["task_no"],
+            timestamp=data["timestamp"],
+            title=data["title"],
+            sha256=data["sha256"],
+        )
+
+    def asdict(self) -> Dict[str, Any]:
+        return {
+            "comp_class": self.comp_class,
+            "day_no": self.day_no,
+            "task_no": self.task_no,
+            "timestamp": self.timestamp,
+            "title": self.title,
+            "sha256": self.sha256,
+        }
+
+    @property
+    def key(self) -> TaskKey:
+        return (self.comp_class, self.day_no, self.task_no, self.timestamp)
+
+
 @dataclass
 class StoredFile:
     name: str
     size: Optional[int]
+    sha256: Optional[str] = None
 
     def format_size(self):
         if self.size is None:
             return "?"
+        size = float(self.size)
         suffix = "B"
         for unit in ["", "Ki", "Mi", "Gi"]:
-            if abs(self.size) < 1024.0:
-                return "%3.1f%s%s" % (self.size, unit, suffix)
-            self.size /= 1024.0
-        return "%.1f%s%s" % (self.size, "Ti", suffix)
+            if abs(size) < 1024.0:
+                return "%3.1f%s%s" % (size, unit, suffix)
+            size /= 1024.0
+        return "%.1f%s%s" % (size, "Ti", suffix)
 
 
 def init(datadir: str) -> None:
@@ -90,12 +145,14 @@ def init(datadir: str) -> None:
     _DATADIR = datadir
     os.makedirs(datadir, mode=0o755, exist_ok=True)
     _SETTINGS = None
+    _TASKS.clear()
 
 
 def deinit() -> None:
     global _DATADIR, _SETTINGS
     _DATADIR = None
     _SETTINGS = None
+    _TASKS.clear()
 
 
 def get_settings() -> Settings:
@@ -161,6 +218,12 @@ def delete_competition(cid: str) -> None:
     fname = _get_compconfigname(cid)
     os.unlink(fname)
 
+    for indexname in [_get_fileindexname(cid), _get_taskindexname(cid)]:
+        if os.path.exists(indexname):
+            os.unlink(indexname)
+    _TASKS.pop(cid, None)
+    collect_garbage()
+
 
 def list_competitions() -> List[StoredCompetition]:
     competitions = []
@@ -174,11 +237,173 @@ def list_competitions() -> List[StoredCompetition]:
 
 
 def store_file(cid: str, filename: str, contents: IO[bytes]) -> StoredFile:
-    cdir = _get_compdir(cid)
-    fullname = os.path.join(cdir, filename)
-    with open(fullname, "wb") as f:
-        f.write(contents.read())
-    return StoredFile(name=filename, size=os.path.getsize(fullname))
+    tmpname = os.path.join(_get_objectsdir(), "tmp", f"{cid}-{filename}.part")
+    os.makedirs(os.path.dirname(tmpname), mode=0o755, exist_ok=True)
+    try:
+        with open(tmpname, "wb") as f:
+            shutil.copyfileobj(contents, f)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+    return import_file(cid, filename, tmpname)
+
+
+def import_file(
+    cid: str, filename: str, path: str, url: Optional[str] = None
+) -> StoredFile:
+    """Move file at given path into the object store and link it to competition.
+
+    Objects are named by the hash of their content, so identical files,
+    referenced by several competitions, are stored only once. If `url` is
+    given, it is remembered, so the same url need not be downloaded again.
+    """
+    digest = _store_object(path)
+    if url is not None:
+        urls = _load_json(_get_urlindexname())
+        urls[url] = digest
+        _save_json(_get_urlindexname(), urls)
+
+    return _link_object(cid, filename, digest)
+
+
+def link_url(cid: str, filename: str, url: str) -> Optional[StoredFile]:
+    """Link file, previously downloaded from given url, to competition.
+
+    Returns None if the url was never downloaded before.
+    """
+    digest = _load_json(_get_urlindexname()).get(url)
+    if digest is None or not os.path.exists(_get_objectname(digest)):
+        return None
+    log.info(f"Reusing stored {url} for {cid}/{filename}")
+    return _link_object(cid, filename, digest)
+
+
+def get_download_path(url: str) -> str:
+    """Return path for downloading the file before importing it"""
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    tmpdir = os.path.join(_get_objectsdir(), "tmp")
+    os.makedirs(tmpdir, mode=0o755, exist_ok=True)
+    return os.path.join(tmpdir, key)
+
+
+def store_task(
+    cid: str,
+    comp_class: str,
+    day_no: int,
+    task_no: int,
+    timestamp: str,
+    title: str,
+    content: bytes,
+) -> StoredTask:
+    """Add task to the competition task archive"""
+    tmpname = os.path.join(_get_objectsdir(), "tmp", f"{cid}-task.part")
+    os.makedirs(os.path.dirname(tmpname), mode=0o755, exist_ok=True)
+    with open(tmpname, "wb") as f:
+        f.write(content)
+    digest = _store_object(tmpname)
+
+    task = StoredTask(comp_class, day_no, task_no, timestamp, title, digest)
+    tasks = _get_task_index(cid)
+    tasks[task.key] = task
+    _save_json(
+        _get_taskindexname(cid),
+        {"tasks": [t.asdict() for t in tasks.values()]},
+    )
+    return task
+
+
+def find_task(
+    cid: str, comp_class: str, day_no: int, task_no: int, timestamp: str
+) -> Optional[StoredTask]:
+    """Return archived task, if it was stored before"""
+    task = _get_task_index(cid).get((comp_class, day_no, task_no, timestamp))
+    if task is None or not os.path.exists(_get_objectname(task.sha256)):
+        return None
+    return task
+
+
+def list_tasks(cid: str, comp_class: Optional[str] = None) -> List[StoredTask]:
+    """Return archived tasks, latest first"""
+    tasks = [
+        t
+        for t in _get_task_index(cid).values()
+        if comp_class is None or t.comp_class == comp_class
+    ]
+    return sorted(tasks, key=lambda t: (t.day_no, t.task_no, t.timestamp), reverse=True)
+
+
+def read_task(task: StoredTask) -> bytes:
+    with open(_get_objectname(task.sha256), "rb") as f:
+        return f.read()
+
+
+def collect_garbage() -> None:
+    """Remove objects no longer referenced by any competition"""
+    objdir = _get_objectsdir()
+    if not os.path.exists(objdir):
+        return
+
+    referenced: Set[str] = set()
+    for comp in list_competitions():
+        index = _load_json(_get_fileindexname(comp.id))
+        referenced.update(f["sha256"] for f in index.values())
+        referenced.update(t.sha256 for t in _get_task_index(comp.id).values())
+
+    # Files derived from referenced objects are kept too
+    derived = _load_json(_get_derivedindexname())
+    derived = {k: e for k, e in derived.items() if referenced.issuperset(e["sources"])}
+    referenced.update(e["sha256"] for e in derived.values())
+
+    urls = _load_json(_get_urlindexname())
+    for prefix in os.listdir(objdir):
+        if len(prefix) != 2:
+            continue
+        for digest in os.listdir(os.path.join(objdir, prefix)):
+            if digest in referenced:
+                continue
+            log.info(f"Removing unreferenced object {digest}")
+            os.unlink(os.path.join(objdir, prefix, digest))
+
+    urls = {u: d for u, d in urls.items() if d in referenced}
+    _save_json(_get_urlindexname(), urls)
+    _save_json(_get_derivedindexname(), derived)
+
+
+def find_derived_file(kind: str, sources: List[str]) -> Optional[StoredFile]:
+    """Find file of given kind, previously derived from given source objects"""
+    entry = _load_json(_get_derivedindexname()).get(_derived_key(kind, sources))
+    if entry is None or not os.path.exists(_get_objectname(entry["sha256"])):
+        return None
+    return StoredFile(name=kind, size=entry["size"], sha256=entry["sha256"])
+
+
+def store_derived_file(kind: str, sources: List[str], path: str) -> StoredFile:
+    """Move file derived from source objects into the object store.
+
+    Derived file is kept as long as all its sources are.
+    """
+    digest = _store_object(path)
+    size = os.path.getsize(_get_objectname(digest))
+    indexname = _get_derivedindexname()
+    index = _load_json(indexname)
+    index[_derived_key(kind, sources)] = {
+        "sha256": digest,
+        "size": size,
+        "sources": sources,
+    }
+    _save_json(indexname, index)
+    return StoredFile(name=kind, size=size, sha256=digest)
+
+
+def get_object_path(digest: str) -> str:
+    return _get_objectname(digest)
+
+
+def get_temp_path(name: str) -> str:
+    """Return path for creating a file before storing it"""
+    tmpdir = os.path.join(_get_objectsdir(), "tmp")
+    os.makedirs(tmpdir, mode=0o755, exist_ok=True)
+    return os.path.join(tmpdir, name)
 
 
 def get_airspace_files(cid: str) -> List[StoredFile]:
@@ -193,18 +418,41 @@ def _get_files(cid: str, ext: str) -> List[StoredFile]:
     cdir = _get_compdir(cid)
 
     files = []
-    for entry in os.scandir(cdir):
-        if entry.is_dir():
+    index = _load_json(_get_fileindexname(cid))
+    for name, entry in index.items():
+        if not name.endswith(ext):
+            continue
+        files.append(StoredFile(name=name, size=entry["size"], sha256=entry["sha256"]))
+
+    # Files stored before object store was introduced
+    for direntry in os.scandir(cdir):
+        if direntry.is_dir():
             continue
-        if not entry.name.endswith(ext):
+        if not direntry.name.endswith(ext) or direntry.name in index:
             continue
-        stat = entry.stat()
-        files.append(StoredFile(name=entry.name, size=stat.st_size))
+        stat = direntry.stat()
+        files.append(StoredFile(name=direntry.name, size=stat.st_size))
     return files
 
 
 def get_full_file_path(cid: str, fname: str) -> str:
-    return os.path.abspath(os.path.join(_get_compdir(cid), fname.strip()))
+    fname = fname.strip()
+    entry = _load_json(_get_fileindexname(cid)).get(fname)
+    if entry is not None:
+        return _get_objectname(entry["sha256"])
+    return os.path.abspath(os.path.join(_get_compdir(cid), fname))
+
+
+def get_file_digest(cid: str, fname: str) -> Optional[str]:
+    """Return content hash of stored file, if it is known"""
+    entry = _load_json(_get_fileindexname(cid)).get(fname.strip())
+    return entry["sha256"] if entry is not None else None
+
+
+def get_cache_dir() -> Optional[str]:
+    if _DATADIR is None:
+        return None
+    return os.path.join(_DATADIR, "cache")
 
 
 def exists(cid: str) -> bool:
@@ -222,6 +470,98 @@ def _get_compconfigname(cid: str) -> str:
     return os.path.join(compdir, "competition.json")
 
 
+def _get_fileindexname(cid: str) -> str:
+    compdir = _get_compdir(cid)
+    return os.path.join(compdir, "files.json")
+
+
+def _get_taskindexname(cid: str) -> str:
+    compdir = _get_compdir(cid)
+    return os.path.join(compdir, "tasks.json")
+
+
+def _get_task_index(cid: str) -> Dict[TaskKey, StoredTask]:
+    if cid not in _TASKS:
+        data = _load_json(_get_taskindexname(cid))
+        tasks = [StoredTask.fromdict(t) for t in data.get("tasks", [])]
+        _TASKS[cid] = {t.key: t for t in tasks}
+    return _TASKS[cid]
+
+
+def _get_objectsdir() -> str:
+    assert _DATADIR
+    return os.path.abspath(os.path.join(_DATADIR, "objects"))
+
+
+def _get_objectname(digest: str) -> str:
+    return os.path.join(_get_objectsdir(), digest[:2], digest)
+
+
+def _get_urlindexname() -> str:
+    return os.path.join(_get_objectsdir(), "urls.json")
+
+
+def _get_derivedindexname() -> str:
+    return os.path.join(_get_objectsdir(), "derived.json")
+
+
+def _derived_key(kind: str, sources: List[str]) -> str:
+    return ":".join([kind] + sources)
+
+
+def _store_object(path: str) -> str:
+    """Move file into the object store, return its content hash"""
+    digest = _hash_file(path)
+    objname = _get_objectname(digest)
+    if os.path.exists(objname):
+        os.unlink(path)
+    else:
+        os.makedirs(os.path.dirname(objname), mode=0o755, exist_ok=True)
+        with open(path, "rb") as f:
+            os.fsync(f.fileno())
+        # Objects are shared between competitions and never change
+        os.chmod(path, 0o444)
+        os.replace(path, objname)
+    return digest
+
+
+def _link_object(cid: str, filename: str, digest: str) -> StoredFile:
+    size = os.path.getsize(_get_objectname(digest))
+    indexname = _get_fileindexname(cid)
+    index = _load_json(indexname)
+    index[filename] = {"sha256": digest, "size": size}
+    _save_json(indexname, index)
+    return StoredFile(name=filename, size=size, sha256=digest)
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_json(fname: str) -> Dict[str, Any]:
+    if not os.path.exists(fname):
+        return {}
+    with open(fname) as f:
+        try:
+            return json.load(f)
+        except json.decoder.JSONDecodeError:
+            log.error(f"Cannot load {fname}")
+            return {}
+
+
+def _save_json(fname: str, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(fname), mode=0o755, exist_ok=True)
+    tmpname = f"{fname}.tmp"
+    with open(tmpname, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmpname, fname)
+
+
 def _get_settings_fname() -> str:
     assert _DATADIR
     return os.path.join(_DATADIR, "settings.json")
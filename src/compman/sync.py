@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import ClientError
+
+from compman import (
+    activation,
+    cli,
+    http,
+    openair,
+    soaringspot,
+    soarscore,
+    storage,
+    xcsoar,
+)
+from compman.scheduler import Priority, ProgressCallback
+
+MAX_PARALLEL_COMPETITIONS = 4
+SYNC_MAX_AGE = 15 * 60.0
+
+log = logging.getLogger("compman")
+
+_DOWNLOAD_LOCKS: Dict[str, asyncio.Lock] = {}
+
+parser = argparse.ArgumentParser(
+    prog="compman sync",
+    description="Refresh files, classes and task of all stored competitions",
+)
+cli.add_location_arguments(parser)
+parser.add_argument(
+    "--parallel",
+    type=cli.positive_int,
+    default=MAX_PARALLEL_COMPETITIONS,
+    help="Maximum number of competitions to refresh at the same time",
+)
+parser.add_argument(
+    "--install-task",
+    action="store_true",
+    help="Install today's task of the current competition into XCSoar, even "
+    "if automatic task installation is not enabled for it",
+)
+
+
+@dataclass
+class SyncResult:
+    competition: storage.StoredCompetition
+    new_files: List[str] = field(default_factory=list)
+    task: Optional[str] = None
+    stored_task: Optional[storage.StoredTask] = None
+    errors: List[str] = field(default_factory=list)
+
+    def format(self) -> str:
+        parts = []
+        if self.new_files:
+            parts.append(f"new files: {', '.join(sorted(self.new_files))}")
+        if self.task:
+            parts.append(f"task installed: {self.task}")
+        elif self.stored_task:
+            st = self.stored_task
+            parts.append(f"task downloaded: {st.title} day {st.day_no}")
+        parts.extend(f"error: {e}" for e in self.errors)
+        return f"{self.competition.title}: {'; '.join(parts) or 'up to date'}"
+
+
+def detect_new_files(
+    cid: str, downloads: List[soaringspot.SoaringSpotDownloadableFile]
+) -> Tuple[
+    List[soaringspot.SoaringSpotDownloadableFile],
+    List[soaringspot.SoaringSpotDownloadableFile],
+]:
+    """Return airspace and waypoint downloads that are not stored yet"""
+    DFT = soaringspot.DownloadableFileType
+    airspace_files = {f.name for f in storage.get_airspace_files(cid)}
+    waypoint_files = {f.name for f in storage.get_waypoint_files(cid)}
+    new_airspaces = [
+        d
+        for d in downloads
+        if d.kind == DFT.AIRSPACE and d.filename not in airspace_files
+    ]
+    new_waypoints = [
+        d
+        for d in downloads
+        if d.kind == DFT.WAYPOINT and d.filename not in waypoint_files
+    ]
+    return new_airspaces, new_waypoints
+
+
+async def download_file(
+    cid: str,
+    filename: str,
+    url: str,
+    priority: Priority,
+    progress: Optional[ProgressCallback] = None,
+) -> storage.StoredFile:
+    """Download the file and store it in competition.
+
+    File is not downloaded at all when the same url is already stored for
+    some other competition. Raises `ClientError` on network failure.
+    """
+    # Competitions often share files, make sure the same url is never
+    # downloaded twice at the same time.
+    lock = _DOWNLOAD_LOCKS.setdefault(url, asyncio.Lock())
+    try:
+        async with lock:
+            stored = storage.link_url(cid, filename, url)
+            if stored is not None:
+                return stored
+            dlpath = storage.get_download_path(url)
+            await http.download_file(url, dlpath, priority, progress)
+            return storage.import_file(cid, filename, dlpath, url)
+    finally:
+        if not lock.locked():
+            _DOWNLOAD_LOCKS.pop(url, None)
+
+
+async def fetch_task(
+    cid: str, taskinfo: soarscore.SoarScoreTaskInfo, priority: Priority = Priority.TASK
+) -> storage.StoredTask:
+    """Return task from competition task archive, downloading it if needed"""
+    ti = taskinfo
+    stored = storage.find_task(cid, ti.comp_class, ti.day_no, ti.task_no, ti.timestamp)
+    if stored is not None:
+        log.info(f"Task {ti.task_url} is already downloaded")
+        return stored
+    content = await soarscore.fetch_url(ti.task_url, priority)
+    return storage.store_task(
+        cid, ti.comp_class, ti.day_no, ti.task_no, ti.timestamp, ti.title, content
+    )
+
+
+def install_task(task: storage.StoredTask) -> str:
+    return xcsoar.install_default_task(storage.read_task(task))
+
+
+async def sync_competition(
+    comp: storage.StoredCompetition,
+    current: bool = False,
+    background: bool = False,
+    install_tasks: bool = False,
+) -> SyncResult:
+    """Refresh files and classes of competition from Soaring Spot.
+
+    For the `current` competition, today's task of selected class is
+    downloaded into the task archive and XCSoar profiles are updated as
+    well. The task is installed only if it is enabled for the competition
+    or `install_tasks` is set, never replacing the task pilot has declared
+    otherwise. `background` sync downloads everything with the lowest
+    priority, yielding to the UI.
+    """
+    result = SyncResult(comp)
+    compurl = comp.soaringspot_url
+    if compurl is None:
+        return result
+
+    downloads, classes, task = await asyncio.gather(
+        soaringspot.fetch_downloads(compurl),
+        soaringspot.fetch_classes(compurl),
+        _fetch_task(comp, background) if current else _no_task(),
+        return_exceptions=True,
+    )
+
+    if isinstance(classes, BaseException):
+        log.error(f"Error fetching classes of {comp.id}: {classes}")
+        result.errors.append(f"Cannot fetch classes: {classes}")
+    elif classes != comp.classes:
+        comp.classes = classes
+        _update_stored(comp.id, classes=classes)
+
+    if isinstance(downloads, BaseException):
+        log.error(f"Error fetching downloads of {comp.id}: {downloads}")
+        result.errors.append(f"Cannot fetch file list: {downloads}")
+    else:
+        await _download_new_files(comp, downloads, result, background)
+
+    if isinstance(task, BaseException):
+        log.error(f"Error fetching task of {comp.id}: {task}")
+        result.errors.append(f"Cannot fetch task: {task}")
+    elif task is not None:
+        result.stored_task = task
+        if install_tasks or comp.autoinstall_tasks:
+            result.task = install_task(task)
+
+    if current and comp.profiles:
+        try:
+            await activation.activate(comp)
+        except (OSError, openair.OpenAirError) as e:
+            log.error(f"Error updating XCSoar profiles: {e}")
+            result.errors.append(f"Cannot update XCSoar profiles: {e}")
+    if not result.errors:
+        comp.synced_at = time.time()
+        _update_stored(comp.id, synced_at=comp.synced_at)
+    return result
+
+
+async def sync_current(background: bool = True) -> Optional[SyncResult]:
+    """Refresh the current competition, if there is one"""
+    cid = storage.get_settings().current_competition_id
+    comp = storage.load_competition(cid) if cid is not None else None
+    if comp is None:
+        return None
+    log.info(f"Synchronizing current competition {comp.id}")
+    result = await sync_competition(comp, current=True, background=background)
+    log.info(f"Synchronized {result.format()}")
+    return result
+
+
+def is_recently_synced(
+    comp: storage.StoredCompetition, max_age: float = SYNC_MAX_AGE
+) -> bool:
+    """Return True if competition was synced without errors recently"""
+    return comp.synced_at is not None and time.time() - comp.synced_at < max_age
+
+
+async def sync_all(
+    parallel: int = MAX_PARALLEL_COMPETITIONS, install_tasks: bool = False
+) -> List[SyncResult]:
+    current_id = storage.get_settings().current_competition_id
+    comps = [c for c in storage.list_competitions() if c.soaringspot_url]
+    sem = asyncio.Semaphore(parallel)
+
+    async def sync_bounded(comp: storage.StoredCompetition) -> SyncResult:
+        async with sem:
+            return await sync_competition(
+                comp, comp.id == current_id, install_tasks=install_tasks
+            )
+
+    return await asyncio.gather(*[sync_bounded(c) for c in comps])
+
+
+async def _download_new_files(
+    comp: storage.StoredCompetition,
+    downloads: List[soaringspot.SoaringSpotDownloadableFile],
+    result: SyncResult,
+    background: bool,
+) -> None:
+    new_airspaces, new_waypoints = detect_new_files(comp.id, downloads)
+    airspace_priority = Priority.BACKGROUND if background else Priority.AIRSPACE
+    waypoint_priority = Priority.BACKGROUND if background else Priority.WAYPOINT
+    new_files = [(d, airspace_priority) for d in new_airspaces]
+    new_files.extend((d, waypoint_priority) for d in new_waypoints)
+
+    async def download(sspotfile, priority: Priority) -> None:
+        try:
+            await download_file(comp.id, sspotfile.filename, sspotfile.href, priority)
+        except ClientError as e:
+            log.error(f"Error downloading {sspotfile.href}: {e}")
+            result.errors.append(f"Cannot download {sspotfile.filename}: {e}")
+        except OSError as e:
+            # Storage is full or broken, other competitions may still fit
+            log.error(f"Error storing {sspotfile.href}: {e}")
+            result.errors.append(f"Cannot store {sspotfile.filename}: {e}")
+        else:
+            result.new_files.append(sspotfile.filename)
+
+    await asyncio.gather(*[download(d, p) for d, p in new_files])
+
+
+async def _fetch_task(
+    comp: storage.StoredCompetition, background: bool
+) -> Optional[storage.StoredTask]:
+    if comp.selected_class is None:
+        return None
+    tasks = await soarscore.fetch_latest_tasks(comp.id)
+    priority = Priority.BACKGROUND if background else Priority.TASK
+    for ti in tasks:
+        if ti.comp_class == comp.selected_class:
+            return await fetch_task(comp.id, ti, priority)
+    return None
+
+
+def _update_stored(cid: str, **changes: Any) -> None:
+    # Competition might have been changed in the UI while we were downloading,
+    # so only update given fields of the stored one.
+    comp = storage.load_competition(cid)
+    if comp is None:
+        return
+    for name, value in changes.items():
+        setattr(comp, name, value)
+    storage.save_competition(comp)
+
+
+async def _no_task() -> Optional[storage.StoredTask]:
+    return None
+
+
+async def _run(parallel: int, install_tasks: bool) -> List[SyncResult]:
+    try:
+        return await sync_all(parallel, install_tasks)
+    finally:
+        await http.close()
+        await soarscore.close()
+
+
+def setup_logging(datadir: str) -> None:
+    logfname = os.path.join(datadir, "compman.log")
+    logging.basicConfig(filename=logfname, level=logging.INFO)
+    log.info(f"Starting compman sync with data dir in '{datadir}'")
+
+
+def run(argv: List[str]) -> int:
+    args = parser.parse_args(argv)
+    datadir = os.path.expanduser(args.datadir)
+
+    storage.init(datadir)
+    xcsoar.init(args.xcsoardir)
+    setup_logging(datadir)
+
+    results = asyncio.run(_run(args.parallel, args.install_task))
+    for result in results:
+        print(result.format())
+    return 1 if any(r.errors for r in results) else 0
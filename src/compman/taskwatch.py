@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional, Tuple
+
+from compman import soarscore
+
+# Tasks are usually published in the morning, before the briefing. Poll often
+# during that time and rarely otherwise.
+BRIEFING_HOURS = (7, 12)
+FAST_INTERVAL = 60.0
+SLOW_INTERVAL = 600.0
+MAX_BACKOFF_STEPS = 3
+
+TasksFingerprint = Tuple[Tuple[str, int, int, str], ...]
+
+log = logging.getLogger("compman")
+
+
+def fingerprint(tasks: List[soarscore.SoarScoreTaskInfo]) -> TasksFingerprint:
+    return tuple(
+        sorted((t.comp_class, t.day_no, t.task_no, t.timestamp) for t in tasks)
+    )
+
+
+class TaskWatcher:
+    """Poll SoarScore for newly published tasks.
+
+    Every poll that fails or brings no change doubles the poll interval (up to
+    `MAX_BACKOFF_STEPS` times), and a detected change resets it. `on_change` is
+    called only when the list of published tasks is different from the last
+    seen one.
+    """
+
+    def __init__(
+        self,
+        comp_id: str,
+        on_change: Callable[[List[soarscore.SoarScoreTaskInfo]], None],
+    ) -> None:
+        self.comp_id = comp_id
+        self.on_change = on_change
+        self.misses = 0
+        self._fingerprint: Optional[TasksFingerprint] = None
+
+    def reset(self, tasks: List[soarscore.SoarScoreTaskInfo]) -> None:
+        """Remember tasks, that were fetched elsewhere, as the last seen ones"""
+        self._fingerprint = fingerprint(tasks)
+        self.misses = 0
+
+    def next_interval(self, now: Optional[float] = None) -> float:
+        hour = time.localtime(now).tm_hour
+        start, end = BRIEFING_HOURS
+        base = FAST_INTERVAL if start <= hour < end else SLOW_INTERVAL
+        return base * 2 ** min(self.misses, MAX_BACKOFF_STEPS)
+
+    async def poll(self) -> bool:
+        try:
+            tasks = await soarscore.fetch_latest_tasks(self.comp_id)
+        except soarscore.SoarScoreClientError as e:
+            log.warning(f"Error checking for new tasks: {e}")
+            self.misses += 1
+            return False
+
+        fp = fingerprint(tasks)
+        if fp == self._fingerprint:
+            self.misses += 1
+            return False
+
+        log.info(f"New tasks published for {self.comp_id}")
+        self.reset(tasks)
+        self.on_change(tasks)
+        return True
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.next_interval())
+            await self.poll()
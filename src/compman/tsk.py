@@ -0,0 +1,149 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from lxml import etree
+
+from compman.cup import EARTH_RADIUS_KM
+
+TASK_TYPES = {
+    "RT": "Racing task",
+    "AAT": "Assigned area task",
+    "MAT": "Modified area task",
+    "FAIGeneral": "FAI task",
+    "FAITriangle": "FAI triangle",
+}
+
+_SUMMARIES: Dict[str, "TaskSummary"] = {}
+
+
+class TaskError(ValueError):
+    pass
+
+
+@dataclass
+class ObservationZone:
+    type: str
+    radius: Optional[float] = None
+    length: Optional[float] = None
+
+
+@dataclass
+class Turnpoint:
+    type: str
+    name: str
+    lat: float
+    lon: float
+    zone: Optional[ObservationZone] = None
+
+
+@dataclass
+class TaskSummary:
+    type: str
+    min_time: Optional[int] = None
+    points: List[Turnpoint] = field(default_factory=list)
+    legs: List[float] = field(default_factory=list)
+
+    @property
+    def distance(self) -> float:
+        """Nominal task distance, through turnpoint centers, in km"""
+        return sum(self.legs)
+
+    @property
+    def turnpoints(self) -> int:
+        """Number of points between start and finish"""
+        return max(len(self.points) - 2, 0)
+
+    def format(self) -> str:
+        parts = [TASK_TYPES.get(self.type, self.type or "Task")]
+        if self.min_time:
+            hours, minutes = divmod(self.min_time // 60, 60)
+            parts.append(f"min. time {hours}:{minutes:02d}")
+        tps = "turnpoint" if self.turnpoints == 1 else "turnpoints"
+        parts.append(f"{self.turnpoints} {tps}")
+        parts.append(f"{self.distance:.1f} km")
+        return ", ".join(parts)
+
+    def format_route(self) -> str:
+        return " - ".join(tp.name for tp in self.points)
+
+
+def parse(content: bytes) -> TaskSummary:
+    """Parse XCSoar task file"""
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    try:
+        root = etree.fromstring(content, parser)
+    except etree.XMLSyntaxError as e:
+        raise TaskError(f"not a task file: {e}") from e
+    if root.tag != "Task":
+        raise TaskError(f"not a task file: unexpected <{root.tag}>")
+
+    summary = TaskSummary(type=root.get("type", ""))
+    min_time = _get_float(root, "aat_min_time")
+    if min_time:
+        summary.min_time = int(min_time)
+
+    for n, point in enumerate(root.iterfind("Point"), 1):
+        wp = point.find("Waypoint")
+        loc = wp.find("Location") if wp is not None else None
+        if wp is None or loc is None:
+            raise TaskError(f"point {n} has no location")
+        try:
+            lat, lon = float(loc.get("latitude")), float(loc.get("longitude"))
+        except (TypeError, ValueError) as e:
+            raise TaskError(f"point {n} has invalid location") from e
+        tp = Turnpoint(point.get("type", ""), wp.get("name", ""), lat, lon)
+        oz = point.find("ObservationZone")
+        if oz is not None:
+            tp.zone = ObservationZone(
+                oz.get("type", ""), _get_float(oz, "radius"), _get_float(oz, "length")
+            )
+        summary.points.append(tp)
+
+    if len(summary.points) < 2:
+        raise TaskError("task has less than two points")
+    summary.legs = leg_distances(
+        [tp.lat for tp in summary.points], [tp.lon for tp in summary.points]
+    )
+    return summary
+
+
+def summarize_file(path: str, digest: Optional[str] = None) -> TaskSummary:
+    """Parse task file. Results are cached by file content hash."""
+    if digest is not None and digest in _SUMMARIES:
+        return _SUMMARIES[digest]
+    with open(path, "rb") as f:
+        summary = parse(f.read())
+    if digest is not None:
+        _SUMMARIES[digest] = summary
+    return summary
+
+
+def leg_distances(lats: Sequence[float], lons: Sequence[float]) -> List[float]:
+    """Great circle distances between consecutive points, in km.
+
+    Trigonometry of every point is computed once and shared by both legs it
+    belongs to.
+    """
+    phis = [math.radians(lat) for lat in lats]
+    lambdas = [math.radians(lon) for lon in lons]
+    cosphis = [math.cos(phi) for phi in phis]
+    legs = []
+    for i in range(1, len(phis)):
+        dphi = phis[i] - phis[i - 1]
+        dlambda = lambdas[i] - lambdas[i - 1]
+        a = math.sin(dphi / 2) ** 2 + (
+            cosphis[i - 1] * cosphis[i] * math.sin(dlambda / 2) ** 2
+        )
+        legs.append(2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(a), 1.0)))
+    return legs
+
+
+def _get_float(el: etree._Element, attr: str) -> Optional[float]:
+    value = el.get(attr)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError as e:
+        raise TaskError(f"invalid {attr}: {value}") from e
@@ -3,7 +3,7 @@ from typing import List
 
 import urwid
 
-from compman import soaringspot, storage
+from compman import connectivity, soaringspot, storage
 from compman.ui import widget
 from compman.ui.activity import Activity
 
@@ -69,6 +69,14 @@ class CompetitionClassSelectorWidget(urwid.WidgetWrap):
     async def _update_classes(self) -> None:
         if self._comp.soaringspot_url is None:
             return
+        if not connectivity.is_online():
+            if self._comp.classes:
+                self.status.set_text("Offline. Pick your competition class:")
+            else:
+                self.status.set_text(
+                    ("remark", "Offline, cannot fetch competition classes")
+                )
+            return
         self.status.set_text(("progress", "Fetching competition classes..."))
         try:
             classes = await soaringspot.fetch_classes(self._comp.soaringspot_url)
@@ -1,10 +1,22 @@
 import asyncio
 import logging
-from typing import List, Optional, cast
+from typing import List, Optional, Tuple, Union, cast
 
 import urwid
-
-from compman import http, soaringspot, soarscore, storage, xcsoar
+from aiohttp import ClientError
+
+from compman import (
+    activation,
+    connectivity,
+    cup,
+    openair,
+    soaringspot,
+    soarscore,
+    storage,
+    sync,
+    xcsoar,
+)
+from compman.scheduler import Priority, Progress, format_progress
 from compman.ui import widget
 from compman.ui.activity import Activity
 from compman.ui.classselector import CompetitionClassSelectorWidget
@@ -30,6 +42,8 @@ class CompetitionDetailsScreen(Activity):
         super().show()
         self._flashtask = None
         self.async_task(self._update_competition_files())
+        self.async_task(self._summarize_airspaces())
+        self.async_task(self._summarize_waypoints())
 
     def create_view(self) -> urwid.Widget:
         p2 = lambda w: urwid.Padding(w, left=2)
@@ -39,37 +53,41 @@ class CompetitionDetailsScreen(Activity):
 
         self.task_widget = TaskDownloadWidget(self, self.competition)
         urwid.connect_signal(self.task_widget, "download", self._on_download_task)
+        urwid.connect_signal(self.task_widget, "install", self._on_install_task)
 
         self.airspace_group: List[urwid.Widget] = []
-        self.airspace_pile = urwid.Pile(
-            [
-                self._make_file_radio(
-                    sf,
-                    self.airspace_group,
-                    sf.name == self.competition.airspace,
-                    self._on_airspace_changed,
-                )
-                for sf in self.airspaces
-            ]
-        )
+        self.airspace_radios = [
+            self._make_file_radio(
+                sf,
+                self.airspace_group,
+                sf.name == self.competition.airspace,
+                self._on_airspace_changed,
+            )
+            for sf in self.airspaces
+        ]
+        self.airspace_pile = urwid.Pile(self.airspace_radios)
 
         self.waypoint_group: List[urwid.Widget] = []
-        self.waypoint_pile = urwid.Pile(
-            [
-                self._make_file_radio(
-                    sf,
-                    self.waypoint_group,
-                    sf.name == self.competition.waypoints,
-                    self._on_waypoint_changed,
-                )
-                for sf in self.waypoints
-            ]
-        )
+        self.waypoint_radios = [
+            self._make_file_radio(
+                sf,
+                self.waypoint_group,
+                sf.name == self.competition.waypoints,
+                self._on_waypoint_changed,
+            )
+            for sf in self.waypoints
+        ]
+        self.waypoint_pile = urwid.Pile(self.waypoint_radios)
 
         self.profile_pile = urwid.Pile(
             [self._make_profile_checkbox(prf) for prf in self.profiles]
         )
 
+        trim_cb = urwid.CheckBox(
+            "Trim airspace to contest area", self.competition.trim_airspace
+        )
+        urwid.connect_signal(trim_cb, "change", self._on_trim_changed)
+
         self.download_status = urwid.Text("")
 
         form = urwid.Pile(
@@ -89,6 +107,8 @@ class CompetitionDetailsScreen(Activity):
                 urwid.Text("XCSoar profiles"),
                 p2(self.profile_pile),
                 urwid.Divider(),
+                urwid.AttrMap(trim_cb, "li normal", "li focus"),
+                urwid.Divider(),
                 self._create_buttons(),
                 urwid.Divider(),
                 self._create_credits(),
@@ -126,16 +146,14 @@ class CompetitionDetailsScreen(Activity):
             return
         self.competition.airspace = selected
         storage.save_competition(self.competition)
-        self._udpate_xcsoar_config(self.competition)
-        self.status.flash(f"Airspace changed to: {selected}")
+        self.async_task(self._activate(f"Airspace changed to: {selected}"))
 
     def _on_waypoint_changed(self, ev, new_state, selected):
         if not new_state:
             return
         self.competition.waypoints = selected
         storage.save_competition(self.competition)
-        self._udpate_xcsoar_config(self.competition)
-        self.status.flash(f"Waypoint changed to: {selected}")
+        self.async_task(self._activate(f"Waypoint changed to: {selected}"))
 
     def _on_profile_changed(self, ev, selected, profile: str) -> None:
         if selected:
@@ -144,16 +162,27 @@ class CompetitionDetailsScreen(Activity):
             self.competition.remove_profile(profile)
         storage.save_competition(self.competition)
 
+    def _on_trim_changed(self, ev, new_state: bool) -> None:
+        self.competition.trim_airspace = new_state
+        storage.save_competition(self.competition)
+        state = "trimmed to contest area" if new_state else "not trimmed"
+        self.async_task(self._activate(f"Airspace is {state}"))
+
     def _on_download_task(self, ev, task):
         self.async_task(self._download_task(task))
 
     def _on_class_changed(self, ev, new_class):
         self.task_widget.refresh()
 
+    def _on_install_task(self, ev, task: storage.StoredTask) -> None:
+        taskfname = sync.install_task(task)
+        self.status.flash(("success message", f"Task installed: {taskfname}"))
+
     async def _download_task(self, taskinfo: soarscore.SoarScoreTaskInfo) -> None:
         self.status.set(("progress", f"Downloading {taskinfo.title}..."))
-        task = await soarscore.fetch_url(taskinfo.task_url)
-        taskfname = xcsoar.install_default_task(task)
+        task = await sync.fetch_task(self.competition.id, taskinfo, Priority.TASK)
+        taskfname = sync.install_task(task)
+        self.task_widget.update_archive()
         self.status.flash(
             ("success message", f"Task downloaded and installed: {taskfname}")
         )
@@ -166,8 +195,17 @@ class CompetitionDetailsScreen(Activity):
             return
 
         profiles = ", ".join(self.competition.profiles)
-        self._udpate_xcsoar_config(self.competition)
-        self.status.flash(("success message", f"XCSoar profiles updated: {profiles}"))
+        self.async_task(
+            self._activate(("success message", f"XCSoar profiles updated: {profiles}"))
+        )
+
+    async def _activate(self, message: widget.UrwidMarkup) -> None:
+        try:
+            await activation.activate(self.competition)
+        except (OSError, openair.OpenAirError) as e:
+            self.status.flash(("error message", f"Error updating XCSoar profiles: {e}"))
+            return
+        self.status.flash(message)
 
     async def _on_remove(self) -> None:
         screen = CompetitionRemoveConfirmationScreen(self.container, self.competition)
@@ -179,24 +217,24 @@ class CompetitionDetailsScreen(Activity):
             storage.save_settings()
             self.finish(None)
 
-    def _udpate_xcsoar_config(self, comp: storage.StoredCompetition) -> None:
-        for prf in self.competition.profiles:
-            xcprofile = xcsoar.get_xcsoar_profile(prf)
-            if comp.airspace:
-                xcprofile.set_airspace(
-                    storage.get_full_file_path(comp.id, comp.airspace)
-                )
-            if comp.waypoints:
-                xcprofile.set_waypoint(
-                    storage.get_full_file_path(comp.id, comp.waypoints)
-                )
-            xcprofile.save()
-
     async def _update_competition_files(self) -> None:
         compurl = self.competition.soaringspot_url
         if compurl is None:
             return
 
+        if not connectivity.is_online():
+            self.download_status.set_text(
+                ("remark", "Offline, using stored competition files")
+            )
+            return
+
+        if sync.is_recently_synced(self.competition):
+            # Files were just refreshed in background, no need to do it again
+            self.download_status.set_text(
+                ("remark", "Competition files are up to date")
+            )
+            return
+
         self.download_status.set_text(("progress", "Refreshing file list..."))
         try:
             downloads = await soaringspot.fetch_downloads(compurl)
@@ -207,7 +245,9 @@ class CompetitionDetailsScreen(Activity):
             log.exception("Error refreshing soaringspot downloads")
             return
 
-        new_airspaces, new_waypoints = self._detect_new_files(downloads)
+        new_airspaces, new_waypoints = sync.detect_new_files(
+            self.competition.id, downloads
+        )
 
         if not new_airspaces and not new_waypoints:
             self.download_status.set_text(("remark", "No updates to competition files"))
@@ -224,6 +264,7 @@ class CompetitionDetailsScreen(Activity):
                 self.airspace_pile,
                 self.airspace_group,
                 self._on_airspace_changed,
+                Priority.AIRSPACE,
             )
         )
         tasks.extend(
@@ -232,41 +273,113 @@ class CompetitionDetailsScreen(Activity):
                 self.waypoint_pile,
                 self.waypoint_group,
                 self._on_waypoint_changed,
+                Priority.WAYPOINT,
             )
         )
         await asyncio.gather(*tasks)
 
-    def _detect_new_files(self, downloads):
-        DFT = soaringspot.DownloadableFileType
-        airspace_files = {f.name for f in self.airspaces}
-        dl_airspaces = {d.filename for d in downloads if d.kind == DFT.AIRSPACE}
-        new_airspaces = dl_airspaces - airspace_files
-
-        waypoint_files = {f.name for f in self.waypoints}
-        dl_waypoints = {d.filename for d in downloads if d.kind == DFT.WAYPOINT}
-        new_waypoints = dl_waypoints - waypoint_files
-
-        dl_idx = {d.filename: d for d in downloads}
-        return ([dl_idx[f] for f in new_airspaces], [dl_idx[f] for f in new_waypoints])
-
-    def _download_new_files(self, new_files, checkbox_pile, group, select_handler):
+    def _download_new_files(
+        self, new_files, checkbox_pile, group, select_handler, priority: Priority
+    ):
         tasks = []
         for sspotfile in new_files:
             sf = storage.StoredFile(name=sspotfile.filename, size=None)
             radio = self._make_file_radio(sf, group, False, select_handler)
             checkbox_pile.contents.insert(0, (radio, ("pack", None)))
-            tasks.append(self._download_file(sf, sspotfile.href, radio))
+            tasks.append(self._download_file(sf, sspotfile.href, radio, priority))
 
         return tasks
 
     async def _download_file(
-        self, sf: storage.StoredFile, url: str, radio: urwid.RadioButton
+        self,
+        sf: storage.StoredFile,
+        url: str,
+        radio: urwid.RadioButton,
+        priority: Priority,
     ) -> None:
         orig_radio = radio.original_widget
         orig_radio.set_label(self._make_label(sf, [("progress", "Downloading...")]))
-        dlcontents = await http.fetch_file(url)
-        stored = storage.store_file(self.competition.id, sf.name, dlcontents)
+
+        def on_progress(progress: Progress) -> None:
+            status = f"Downloading... {format_progress(progress)}"
+            orig_radio.set_label(self._make_label(sf, [("progress", status)]))
+
+        cid = self.competition.id
+        try:
+            stored = await sync.download_file(cid, sf.name, url, priority, on_progress)
+        except (ClientError, OSError) as e:
+            orig_radio.set_label(
+                self._make_label(sf, [("error message", f"Download failed: {e}")])
+            )
+            log.exception(f"Error downloading {url}")
+            return
         orig_radio.set_label(self._make_label(stored, [("success banner", " New! ")]))
+        if orig_radio in self.airspace_group:
+            await self._summarize_airspace(stored, radio, new=True)
+        else:
+            await self._summarize_waypoint(stored, radio, new=True)
+
+    async def _summarize_airspaces(self) -> None:
+        for sf, radio in zip(self.airspaces, self.airspace_radios):
+            await self._summarize_airspace(sf, radio)
+
+    async def _summarize_airspace(
+        self,
+        sf: storage.StoredFile,
+        radio: urwid.AttrMap,
+        new: bool = False,
+    ) -> None:
+        path = storage.get_full_file_path(self.competition.id, sf.name)
+        loop = asyncio.get_running_loop()
+        try:
+            summary = await loop.run_in_executor(
+                None, openair.summarize_file, path, sf.sha256
+            )
+        except OSError as e:
+            log.error(f"Cannot read airspace file {path}: {e}")
+            return
+
+        markup: List[Union[str, Tuple[str, str]]] = []
+        if new:
+            markup.extend([("success banner", " New! "), " "])
+        if summary.valid:
+            markup.append(("remark", summary.format()))
+            if summary.errors:
+                errors = "error" if summary.error_count == 1 else "errors"
+                warning = f"{summary.error_count} {errors} ignored, {summary.errors[0]}"
+                markup.extend([" ", ("highlight", warning)])
+        elif not summary.zones:
+            markup.append(("error message", "Invalid: no airspace zones"))
+        else:
+            markup.append(("error message", f"Invalid: {summary.errors[0]}"))
+        radio.original_widget.set_label(self._make_label(sf, markup))
+
+    async def _summarize_waypoints(self) -> None:
+        for sf, radio in zip(self.waypoints, self.waypoint_radios):
+            await self._summarize_waypoint(sf, radio)
+
+    async def _summarize_waypoint(
+        self,
+        sf: storage.StoredFile,
+        radio: urwid.AttrMap,
+        new: bool = False,
+    ) -> None:
+        path = storage.get_full_file_path(self.competition.id, sf.name)
+        loop = asyncio.get_running_loop()
+        try:
+            wps = await loop.run_in_executor(None, cup.read_file, path, sf.sha256)
+        except OSError as e:
+            log.error(f"Cannot read waypoint file {path}: {e}")
+            return
+
+        markup: List[Union[str, Tuple[str, str]]] = []
+        if new:
+            markup.extend([("success banner", " New! "), " "])
+        if len(wps):
+            markup.append(("remark", wps.format()))
+        else:
+            markup.append(("error message", "Invalid: no waypoints"))
+        radio.original_widget.set_label(self._make_label(sf, markup))
 
     def _make_file_radio(
         self, sf: storage.StoredFile, group, selected: bool, select_handler
@@ -1,9 +1,9 @@
 import logging
-from typing import List
+from typing import List, Optional
 
 import urwid
 
-from compman import soaringspot, storage
+from compman import connectivity, soaringspot, storage
 from compman.ui import widget
 from compman.ui.activity import Activity
 
@@ -17,34 +17,74 @@ class SoaringSpotPicker(urwid.ListBox):
         self._items = urwid.SimpleListWalker([])
         super().__init__(self._items)
         self.activity = activity
+        self.competitions: List[soaringspot.SoaringSpotContest] = []
+        urwid.connect_signal(self._items, "modified", self._on_focus_changed)
         activity.async_task(self._download_competitions())
 
     def set_competitions(
         self, competitions: List[soaringspot.SoaringSpotContest]
     ) -> None:
-        del self._items[:]
+        # Keep focus on the same competition when list is refreshed
+        focused_id = None
+        focused = self._get_focused_competition()
+        if focused is not None:
+            focused_id = focused.id
+
+        self.competitions = list(competitions)
+        self._items[:] = [self._make_button(comp) for comp in competitions]
         if not competitions:
             return
 
-        self.competitions = competitions
-        for comp in competitions:
-            btn = widget.CMSelectableListItem(comp.title)
-            urwid.connect_signal(btn, "click", self._on_competition_selected, comp)
-            self._items.extend([btn])
-        urwid.connect_signal(self._items, "modified", self._on_focus_changed)
-        self._emit("focus", competitions[0])
+        ids = [c.id for c in competitions]
+        focus_idx = ids.index(focused_id) if focused_id in ids else 0
+        self._items.set_focus(focus_idx)
+        self._emit("focus", competitions[focus_idx])
+
+    def append_competitions(
+        self, competitions: List[soaringspot.SoaringSpotContest]
+    ) -> None:
+        # Buttons go before any status items at the end of the list
+        pos = len(self.competitions)
+        self.competitions.extend(competitions)
+        self._items[pos:pos] = [self._make_button(comp) for comp in competitions]
+        if pos == 0 and competitions:
+            self._items.set_focus(0)
+
+    def _make_button(self, comp: soaringspot.SoaringSpotContest) -> urwid.Widget:
+        btn = widget.CMSelectableListItem(comp.title)
+        urwid.connect_signal(btn, "click", self._on_competition_selected, comp)
+        return btn
+
+    async def _download_competitions(self) -> None:
+        cached = soaringspot.get_cached_competitions()
+        if cached:
+            # Show last known list right away and revalidate it in background
+            self.set_competitions(cached)
+            statusitem = None
+        else:
+            statusitem = urwid.Text(("progress", "Downloading..."))
+            self._items[:] = [statusitem]
+
+        if not connectivity.is_online():
+            if statusitem is not None:
+                statusitem.set_text(
+                    ("remark", "Offline, cannot download competition list")
+                )
+            return
 
-    async def _download_competitions(self):
-        del self._items[:]
-        statusitem = urwid.Text(("progress", "Downloading..."))
-        self._items.append(statusitem)
+        comps: List[soaringspot.SoaringSpotContest] = []
         try:
-            comps = await soaringspot.fetch_competitions()
+            async for batch in soaringspot.iter_competitions():
+                comps.extend(batch)
+                if statusitem is not None:
+                    # Nothing to show yet, let user pick while downloading
+                    self.append_competitions(batch)
         except soaringspot.SoaringSpotClientError as e:
-            statusitem.set_text(
-                ("error message", f"Error downloading competition list: {e}")
-            )
             log.exception("Error downloading competition list")
+            if statusitem is not None:
+                statusitem.set_text(
+                    ("error message", f"Error downloading competition list: {e}")
+                )
             return
         self.set_competitions(comps)
 
@@ -63,9 +103,17 @@ class SoaringSpotPicker(urwid.ListBox):
         self._emit("select", comp)
 
     def _on_focus_changed(self):
-        focused, idx = self.get_focus()
-        selected = self.competitions[idx]
-        self._emit("focus", selected)
+        selected = self._get_focused_competition()
+        if selected is not None:
+            self._emit("focus", selected)
+
+    def _get_focused_competition(
+        self,
+    ) -> Optional[soaringspot.SoaringSpotContest]:
+        idx = self._items.focus
+        if idx is None or idx >= len(self.competitions):
+            return None
+        return self.competitions[idx]
 
 
 class SoaringSpotPickerScreen(Activity):
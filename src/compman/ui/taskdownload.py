@@ -1,45 +1,98 @@
-from typing import List, Optional
+import asyncio
+from typing import Dict, List, Optional
 
 import urwid
 
-from compman import soarscore, storage
+from compman import connectivity, soarscore, storage, sync, taskwatch, tsk
 from compman.ui import widget
 from compman.ui.activity import Activity
 
+MAX_PREVIOUS_TASKS = 5
+
 
 class TaskDownloadWidget(urwid.WidgetWrap):
-    signals = ["download"]
+    signals = ["download", "install"]
 
     def __init__(self, activity: Activity, comp: storage.StoredCompetition) -> None:
         self._activity = activity
         self._comp = comp
-        self._tasks: List[soarscore.SoarScoreTaskInfo] = []
-
-        self._activity.async_task(self._fetch_tasks())
+        self._tasks: Dict[str, soarscore.SoarScoreTaskInfo] = {}
+        self._fetched = False
+        self._watcher = taskwatch.TaskWatcher(comp.id, self._on_tasks_changed)
+        self._watch_task: Optional[asyncio.Task] = None
+        self._fetch_task: Optional[asyncio.Task] = None
+        self._summary_task: Optional[asyncio.Task] = None
+
+        self._start_fetch()
         super().__init__(urwid.Pile([]))
 
     def refresh(self) -> None:
-        self._activity.async_task(self._fetch_tasks())
+        self._start_fetch()
+
+    def update_archive(self) -> None:
+        """Redraw the list of previous tasks after task archive has changed"""
+        if self._fetched:
+            self._create_task_view()
+
+    def _start_fetch(self) -> None:
+        if self._fetch_task is not None and not self._fetch_task.done():
+            # Results of superseded request would overwrite the newer ones
+            self._fetch_task.cancel()
+        self._fetch_task = self._activity.async_task(self._fetch_tasks())
 
     async def _fetch_tasks(self) -> None:
         if self._comp.soaringspot_url is None:
             return
 
+        if not connectivity.is_online():
+            refresh_btn = widget.CMButton(" Refresh ")
+            urwid.connect_signal(refresh_btn, "click", self._on_refresh)
+            offline = urwid.Columns(
+                [
+                    ("pack", urwid.Text(("remark", "Offline, cannot fetch task"))),
+                    ("pack", refresh_btn),
+                ],
+                dividechars=1,
+            )
+            self._w = self._with_archive(offline)
+            return
+
         self._w = urwid.Text(("progress", "Fetching today's task..."))
 
         try:
-            self._tasks = await soarscore.fetch_latest_tasks(self._comp.id)
+            tasks = await soarscore.fetch_latest_tasks(self._comp.id)
         except soarscore.SoarScoreClientError as e:
-            self._w = urwid.Text(("error message", f"Error fetching today's task: {e}"))
+            error = urwid.Text(("error message", f"Error fetching today's task: {e}"))
+            self._w = self._with_archive(error)
             return
 
+        self._tasks = {ti.comp_class: ti for ti in tasks}
+        self._fetched = True
+        self._watcher.reset(tasks)
         self._create_task_view()
+        self._update_watch()
+
+    def _on_tasks_changed(self, tasks: List[soarscore.SoarScoreTaskInfo]) -> None:
+        prevtask = self._get_task()
+        self._tasks = {ti.comp_class: ti for ti in tasks}
+        self._create_task_view()
+
+        curtask = self._get_task()
+        if self._comp.autoinstall_tasks and curtask is not None and curtask != prevtask:
+            self._emit("download", curtask)
+
+    def _update_watch(self) -> None:
+        watching = self._watch_task is not None and not self._watch_task.done()
+        if self._comp.watch_tasks and not watching:
+            self._watch_task = self._activity.async_task(self._watcher.run())
+        elif not self._comp.watch_tasks and self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
 
     def _get_task(self) -> Optional[soarscore.SoarScoreTaskInfo]:
-        for ti in self._tasks:
-            if ti.comp_class == self._comp.selected_class:
-                return ti
-        return None
+        if self._comp.selected_class is None:
+            return None
+        return self._tasks.get(self._comp.selected_class)
 
     def _create_task_view(self) -> None:
         if self._comp.selected_class is None:
@@ -53,13 +106,15 @@ class TaskDownloadWidget(urwid.WidgetWrap):
 
         curtask = self._get_task()
         if curtask is None:
-            self._w = urwid.Columns(
+            notask = urwid.Columns(
                 [
                     ("pack", urwid.Text(("remark", "No task for today"))),
                     ("pack", refresh_btn),
                 ],
                 dividechars=1,
             )
+            notask_view = urwid.Pile([notask, self._create_watch_controls()])
+            self._w = self._with_archive(notask_view)
             return
 
         task_title = urwid.Text(
@@ -72,22 +127,123 @@ class TaskDownloadWidget(urwid.WidgetWrap):
             ]
         )
         task_timestamp = urwid.Text(["Generated on ", curtask.timestamp])
+        task_summary = urwid.Text(("progress", "Loading task details..."))
+        self._start_summary(curtask, task_summary)
 
         self.download_btn = widget.CMButton("Download")
         urwid.connect_signal(self.download_btn, "click", self._on_download, curtask)
 
-        self._w = urwid.Pile(
+        curview = urwid.Pile(
             [
                 urwid.Text("Today's task"),
                 urwid.Padding(task_title, left=2),
                 urwid.Padding(task_timestamp, left=2),
+                urwid.Padding(task_summary, left=2),
                 urwid.Divider(),
                 widget.ButtonRow([self.download_btn, refresh_btn]),
+                self._create_watch_controls(),
             ]
         )
+        self._w = self._with_archive(curview, curtask)
+
+    def _start_summary(
+        self, taskinfo: soarscore.SoarScoreTaskInfo, text: urwid.Text
+    ) -> None:
+        if self._summary_task is not None and not self._summary_task.done():
+            self._summary_task.cancel()
+        self._summary_task = self._activity.async_task(
+            self._summarize_task(taskinfo, text)
+        )
+
+    async def _summarize_task(
+        self, taskinfo: soarscore.SoarScoreTaskInfo, text: urwid.Text
+    ) -> None:
+        # Task is small, fetch it into the archive to show it before it is
+        # installed. Installing it later will not download it again.
+        try:
+            task = await sync.fetch_task(self._comp.id, taskinfo)
+        except soarscore.SoarScoreClientError as e:
+            text.set_text(("error message", f"Cannot fetch task details: {e}"))
+            return
+
+        path = storage.get_object_path(task.sha256)
+        loop = asyncio.get_running_loop()
+        try:
+            summary = await loop.run_in_executor(
+                None, tsk.summarize_file, path, task.sha256
+            )
+        except (OSError, tsk.TaskError) as e:
+            text.set_text(("error message", f"Invalid task: {e}"))
+            return
+        text.set_text([("remark", summary.format()), "\n", summary.format_route()])
+
+    def _create_watch_controls(self) -> urwid.Widget:
+        watch_cb = urwid.CheckBox("Watch for new tasks", self._comp.watch_tasks)
+        urwid.connect_signal(watch_cb, "change", self._on_watch_changed)
+        install_cb = urwid.CheckBox(
+            "Install automatically", self._comp.autoinstall_tasks
+        )
+        urwid.connect_signal(install_cb, "change", self._on_autoinstall_changed)
+        return urwid.Columns(
+            [
+                ("pack", urwid.AttrMap(watch_cb, "li normal", "li focus")),
+                ("pack", urwid.AttrMap(install_cb, "li normal", "li focus")),
+            ],
+            dividechars=2,
+        )
+
+    def _with_archive(
+        self,
+        view: urwid.Widget,
+        curtask: Optional[soarscore.SoarScoreTaskInfo] = None,
+    ) -> urwid.Widget:
+        previous = self._get_previous_tasks(curtask)
+        if not previous:
+            return view
+
+        items: List[urwid.Widget] = [
+            view,
+            urwid.Divider(),
+            urwid.Text("Previous tasks"),
+        ]
+        for task in previous:
+            label = f"{task.title} day {task.day_no} task {task.task_no}"
+            btn = widget.CMSelectableListItem(label)
+            urwid.connect_signal(btn, "click", self._on_install, task)
+            items.append(urwid.Padding(btn, left=2))
+        return urwid.Pile(items)
+
+    def _get_previous_tasks(
+        self, curtask: Optional[soarscore.SoarScoreTaskInfo]
+    ) -> List[storage.StoredTask]:
+        if self._comp.selected_class is None:
+            return []
+        tasks = storage.list_tasks(self._comp.id, self._comp.selected_class)
+        if curtask is not None:
+            curkey = (
+                curtask.comp_class,
+                curtask.day_no,
+                curtask.task_no,
+                curtask.timestamp,
+            )
+            tasks = [t for t in tasks if t.key != curkey]
+        return tasks[:MAX_PREVIOUS_TASKS]
 
     def _on_refresh(self, btn):
-        self._activity.async_task(self._fetch_tasks())
+        connectivity.invalidate()
+        self._start_fetch()
+
+    def _on_watch_changed(self, cb, new_state: bool) -> None:
+        self._comp.watch_tasks = new_state
+        storage.save_competition(self._comp)
+        self._update_watch()
+
+    def _on_autoinstall_changed(self, cb, new_state: bool) -> None:
+        self._comp.autoinstall_tasks = new_state
+        storage.save_competition(self._comp)
 
     def _on_download(self, btn, taskinfo: soarscore.SoarScoreTaskInfo):
         self._emit("download", taskinfo)
+
+    def _on_install(self, btn, task: storage.StoredTask):
+        self._emit("install", task)
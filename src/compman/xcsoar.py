@@ -1,41 +1,84 @@
+import hashlib
+import json
+import logging
 import os
+from dataclasses import dataclass
 from shutil import copyfile
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
 
 XCSOAR_DIR: Optional[str] = None
 
+# Hashes of files installed into XCSoar directory
+INSTALL_RECORD = ".compman-installed.json"
+# ioctl to share file data between files on copy-on-write filesystems
+FICLONE = 0x40049409
+
+log = logging.getLogger("compman")
+
+AIRSPACE_FILE = "compman-airspace.txt"
+WAYPOINT_FILE = "compman-waypoints.cup"
+
 
 class XCSoarProfile:
+    """XCSoar profile file, that keeps all the lines it doesn't touch intact"""
+
     def __init__(self, filename):
         self.filename = filename
         self.xcsoardir = os.path.dirname(filename)
+        self.modified = False
 
         with open(filename, "rt") as f:
             self.lines = f.readlines()
+        self._loaded = "".join(self.lines)
 
-    def save(self):
-        with open(self.filename, "wt") as f:
-            f.write("".join(self.lines))
+        # Line number of every option. XCSoar uses the last value, if the
+        # option is repeated.
+        self._index: Dict[str, int] = {}
+        for n, line in enumerate(self.lines):
+            key, sep, _ = line.partition("=")
+            if sep:
+                self._index[key.strip()] = n
 
-    def set_airspace(self, filename: str) -> None:
-        fname = "compman-airspace.txt"
-        copyfile(filename, os.path.join(self.xcsoardir, fname))
-        self._set_option("AirspaceFile", f"%LOCAL_PATH%\\{fname}")
+    def save(self) -> bool:
+        """Write profile, if it was modified. Return True if it was."""
+        if not self.modified:
+            return False
+        _write_atomic(self.filename, "".join(self.lines).encode())
+        self.modified = False
+        return True
 
-    def set_waypoint(self, filename: str) -> None:
-        fname = "compman-waypoints.cup"
-        copyfile(filename, os.path.join(self.xcsoardir, fname))
-        self._set_option("WPFile", f"%LOCAL_PATH%\\{fname}")
+    def revert(self) -> None:
+        """Write profile back as it was when loaded"""
+        _write_atomic(self.filename, self._loaded.encode())
 
-    def _set_option(self, key: str, value: str) -> None:
-        modified_line = f'{key}="{value}"\n'
-        for n, line in enumerate(self.lines):
-            k, v = line.split("=", maxsplit=1)
-            if k == key:
+    def get_option(self, key: str) -> Optional[str]:
+        n = self._index.get(key)
+        if n is None:
+            return None
+        value = self.lines[n].partition("=")[2].strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        return value
+
+    def set_options(self, options: Dict[str, str]) -> None:
+        for key, value in options.items():
+            modified_line = f'{key}="{value}"\n'
+            n = self._index.get(key)
+            if n is not None:
+                if self.lines[n] == modified_line:
+                    continue
                 self.lines[n] = modified_line
-                break
-        else:
-            self.lines.append(modified_line)
+            else:
+                if self.lines and not self.lines[-1].endswith("\n"):
+                    self.lines[-1] += "\n"
+                self._index[key] = len(self.lines)
+                self.lines.append(modified_line)
+            self.modified = True
 
 
 def init(xcsoar_dir: Optional[str] = None) -> None:
@@ -72,12 +115,88 @@ def list_xcsoar_profiles() -> List[str]:
 def install_default_task(task: bytes) -> str:
     assert XCSOAR_DIR is not None
     taskfname = os.path.join(XCSOAR_DIR, "Default.tsk")
-    with open(taskfname, "wb") as f:
-        f.write(task)
-
+    _write_atomic(taskfname, task)
     return taskfname
 
 
+def get_local_path(fname: str) -> str:
+    """Return path to the file in XCSoar directory, as used in profiles"""
+    return f"%LOCAL_PATH%\\{fname}"
+
+
+def is_installed(fname: str, digest: str) -> bool:
+    """Return True if file with given content hash is installed"""
+    assert XCSOAR_DIR is not None
+    dest = os.path.join(XCSOAR_DIR, fname)
+    return _is_installed(dest, _load_install_record().get(fname), digest)
+
+
+@dataclass
+class InstalledFile:
+    fname: str
+    backup: Optional[str]
+
+
+def install_file(
+    src: str, fname: str, digest: Optional[str] = None
+) -> Optional[InstalledFile]:
+    """Install file into XCSoar directory, replacing it atomically.
+
+    File is reflinked on filesystems that support it, or copied otherwise.
+    It is never hard linked, so editing the installed file cannot change the
+    source. Content hash of every installed file is recorded, so files that
+    did not change are not touched. Returns None in that case.
+
+    Previous version of the file is kept, so the installation can be undone
+    with `restore_file()`.
+    """
+    assert XCSOAR_DIR is not None
+    dest = os.path.join(XCSOAR_DIR, fname)
+    if digest is None:
+        digest = hash_file(src)
+
+    record = _load_install_record()
+    if _is_installed(dest, record.get(fname), digest):
+        log.debug(f"{fname} is up to date")
+        return None
+    tmpname = f"{dest}.tmp"
+    if os.path.exists(tmpname):
+        os.unlink(tmpname)
+    method = _clone_file(src, tmpname)
+
+    backup = None
+    if os.path.exists(dest):
+        backup = f"{dest}.bak"
+        if os.path.exists(backup):
+            os.unlink(backup)
+        try:
+            os.link(dest, backup)
+        except OSError:
+            # Filesystem without hard links
+            copyfile(dest, backup)
+    os.replace(tmpname, dest)
+    _fsync_dir(XCSOAR_DIR)
+    log.info(f"Installed {fname} ({method})")
+
+    _save_install_record(record, fname, dest, digest)
+    return InstalledFile(fname, backup)
+
+
+def restore_file(installed: InstalledFile) -> None:
+    """Undo `install_file()`"""
+    assert XCSOAR_DIR is not None
+    dest = os.path.join(XCSOAR_DIR, installed.fname)
+    if installed.backup is None:
+        os.unlink(dest)
+    else:
+        os.replace(installed.backup, dest)
+
+
+def discard_backup(installed: InstalledFile) -> None:
+    if installed.backup is not None:
+        os.unlink(installed.backup)
+
+
 def get_xcsoar_profile_filename(profile_fname: str) -> str:
     assert XCSOAR_DIR is not None
     return os.path.join(XCSOAR_DIR, profile_fname)
@@ -86,3 +205,104 @@ def get_xcsoar_profile_filename(profile_fname: str) -> str:
 def get_xcsoar_profile(profile_fname: str) -> XCSoarProfile:
     profile_fullname = get_xcsoar_profile_filename(profile_fname)
     return XCSoarProfile(profile_fullname)
+
+
+def _write_atomic(fname: str, data: bytes) -> None:
+    """Replace file contents, so it is never left half written.
+
+    Data is flushed to disk before the file is renamed into place, so the
+    file survives sudden power loss either old or new, but never truncated.
+    """
+    tmpname = f"{fname}.tmp"
+    with open(tmpname, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpname, fname)
+    _fsync_dir(os.path.dirname(fname))
+
+
+def _fsync_dir(dirname: str) -> None:
+    dirfd = os.open(dirname or ".", os.O_RDONLY)
+    try:
+        os.fsync(dirfd)
+    finally:
+        os.close(dirfd)
+
+
+def _get_install_record_name() -> str:
+    assert XCSOAR_DIR is not None
+    return os.path.join(XCSOAR_DIR, INSTALL_RECORD)
+
+
+def _load_install_record() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(_get_install_record_name(), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_install_record(
+    record: Dict[str, Dict[str, Any]], fname: str, dest: str, digest: str
+) -> None:
+    st = os.stat(dest)
+    record[fname] = {
+        "sha256": digest,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "ino": st.st_ino,
+    }
+    _write_atomic(_get_install_record_name(), json.dumps(record).encode())
+
+
+def _is_installed(dest: str, entry: Optional[Dict[str, Any]], digest: str) -> bool:
+    if entry is None or entry.get("sha256") != digest:
+        return False
+    try:
+        st = os.stat(dest)
+    except FileNotFoundError:
+        return False
+    if st.st_nlink > 1:
+        # Hard linked by older versions, shares its data with the stored file
+        return False
+    # File might have been replaced or modified by someone else
+    return (st.st_size, st.st_mtime_ns, st.st_ino) == (
+        entry.get("size"),
+        entry.get("mtime_ns"),
+        entry.get("ino"),
+    )
+
+
+def _clone_file(src: str, dest: str) -> str:
+    """Create dest with the same content as src, sharing data if possible.
+
+    Reflinked files share data only until one of them is modified, unlike
+    hard links. Returns the method that was used.
+    """
+    try:
+        _reflink(src, dest)
+        return "reflink"
+    except OSError:
+        if os.path.exists(dest):
+            os.unlink(dest)
+
+    copyfile(src, dest)
+    with open(dest, "rb") as f:
+        os.fsync(f.fileno())
+    return "copy"
+
+
+def _reflink(src: str, dest: str) -> None:
+    if fcntl is None:
+        raise OSError("Reflinks are not supported")
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
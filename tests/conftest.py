@@ -3,10 +3,14 @@ import os
 import shutil
 
 import pytest
+import pytest_asyncio
 
-from compman import storage, xcsoar
+from compman import http, storage, xcsoar
+from compman.netpolicy import get_policy
 
 from .fixtures.activitytestbed import ActivityTestbed
+from .fixtures.connectivity import ConnectivityFixture
+from .fixtures.httpserver import HttpServerFixture
 from .fixtures.soaringspot import SoaringSpotFixture
 from .fixtures.soarscore import SoarScoreFixture
 from .fixtures.widgettestbed import WidgetTestbedFactory
@@ -34,6 +38,34 @@ def soarscore():
         ssf.tearDown()
 
 
+@pytest.fixture(autouse=True)
+def network():
+    # Tests never depend on network state of the machine running them
+    cf = ConnectivityFixture()
+    cf.setUp()
+    try:
+        yield cf
+    finally:
+        cf.tearDown()
+
+
+@pytest.fixture(autouse=True)
+def network_policy():
+    yield get_policy()
+    get_policy().reset()
+
+
+@pytest_asyncio.fixture
+async def httpserver():
+    server = HttpServerFixture()
+    await server.start()
+    try:
+        yield server
+    finally:
+        await http.close()
+        await server.stop()
+
+
 @pytest.fixture
 def storage_dir(tmpdir):
     storage.init(tmpdir)
@@ -6,6 +6,9 @@ import urwid
 
 from compman.ui.activity import Activity
 
+# Tests often mock asyncio.sleep, keep the real one
+_realsleep = asyncio.sleep
+
 
 class ActivityStub(Activity):
     _result: Optional[object] = None
@@ -75,6 +78,15 @@ class ActivityTestbed:
         for t in self.activity._tasks:
             t.cancel()
 
+    async def wait_for_text(self, text: str, timeout: float = 1) -> None:
+        """Wait until text is rendered, e.g. after work done in a thread"""
+
+        async def poll() -> None:
+            while text not in self.render():
+                await _realsleep(0)
+
+        await asyncio.wait_for(poll(), timeout)
+
     async def gather_tasks(self):
         await asyncio.wait_for(asyncio.gather(*self.activity._tasks), 1)
 
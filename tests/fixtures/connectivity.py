@@ -0,0 +1,27 @@
+from unittest import mock
+
+from compman import connectivity
+
+
+class ConnectivityFixture:
+    online = True
+
+    def setUp(self) -> None:
+        self._patch = mock.patch("compman.connectivity.probe", self.probe)
+        self._patch.start()
+        connectivity.invalidate()
+
+    def tearDown(self) -> None:
+        self._patch.stop()
+        connectivity.invalidate()
+
+    def go_offline(self) -> None:
+        self.online = False
+        connectivity.invalidate()
+
+    def go_online(self) -> None:
+        self.online = True
+        connectivity.invalidate()
+
+    def probe(self) -> bool:
+        return self.online
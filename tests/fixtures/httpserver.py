@@ -0,0 +1,47 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+class HttpServerFixture:
+    """Local stand-in HTTP server for network tests"""
+
+    requests: List[web.Request]
+    peers: List[Tuple[str, int]]
+    _handlers: Dict[str, Handler]
+    _server: Optional[TestServer]
+
+    def __init__(self) -> None:
+        self.app = web.Application()
+        self.app.router.add_get("/{path:.*}", self._dispatch)
+        self.requests = []
+        self.peers = []
+        self._handlers = {}
+        self._server = None
+
+    def route(self, path: str, handler: Handler) -> None:
+        self._handlers[path] = handler
+
+    def url(self, path: str) -> str:
+        assert self._server is not None
+        return str(self._server.make_url(path))
+
+    async def start(self) -> None:
+        self._server = TestServer(self.app)
+        await self._server.start_server()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            await self._server.close()
+
+    async def _dispatch(self, request: web.Request) -> web.StreamResponse:
+        self.requests.append(request)
+        assert request.transport is not None
+        self.peers.append(request.transport.get_extra_info("peername"))
+        handler = self._handlers.get(request.path)
+        if handler is None:
+            raise web.HTTPNotFound()
+        return await handler(request)
@@ -1,8 +1,8 @@
 import asyncio
-import io
-from typing import IO, List, Optional
+from typing import AsyncIterator, List, Optional
 from unittest import mock
 
+from compman.scheduler import Priority, Progress, ProgressCallback
 from compman.soaringspot import SoaringSpotContest, SoaringSpotDownloadableFile
 
 
@@ -11,10 +11,13 @@ class SoaringSpotFixture:
     competitons: List[SoaringSpotContest]
     files: List[SoaringSpotDownloadableFile]
     file_contents: bytes
+    downloaded: List[str]
+    cached_competitions: Optional[List[SoaringSpotContest]]
 
     fetch_clases_exc: Optional[Exception] = None
     fetch_competitions_exc: Optional[Exception] = None
     fetch_downloads_exc: Optional[Exception] = None
+    download_file_exc: Optional[Exception] = None
 
     def setUp(self) -> None:
         self.reset()
@@ -23,11 +26,18 @@ class SoaringSpotFixture:
             mock.patch(
                 "compman.soaringspot.fetch_competitions", self.fetch_competitions_mock
             ),
+            mock.patch(
+                "compman.soaringspot.iter_competitions", self.iter_competitions_mock
+            ),
+            mock.patch(
+                "compman.soaringspot.get_cached_competitions",
+                self.get_cached_competitions_mock,
+            ),
             mock.patch("compman.soaringspot.fetch_classes", self.fetch_classes_mock),
             mock.patch(
                 "compman.soaringspot.fetch_downloads", self.fetch_downloads_mock
             ),
-            mock.patch("compman.http.fetch_file", self.fetch_file_mock),
+            mock.patch("compman.http.download_file", self.download_file_mock),
         ]
 
         for p in self._patches:
@@ -40,8 +50,10 @@ class SoaringSpotFixture:
     def reset(self):
         self.classes = []
         self.competitions = []
+        self.cached_competitions = None
         self.files = []
         self.file_contents = b""
+        self.downloaded = []
 
     async def fetch_competitions_mock(self) -> List[SoaringSpotContest]:
         # Downloading...
@@ -50,6 +62,21 @@ class SoaringSpotFixture:
             raise self.fetch_competitions_exc
         return self.competitions
 
+    async def iter_competitions_mock(self) -> AsyncIterator[List[SoaringSpotContest]]:
+        # Downloading...
+        await asyncio.sleep(0)
+        if self.fetch_competitions_exc is not None:
+            raise self.fetch_competitions_exc
+        # Competitions arrive in two batches
+        half = len(self.competitions) // 2
+        for batch in [self.competitions[:half], self.competitions[half:]]:
+            if batch:
+                yield batch
+                await asyncio.sleep(0)
+
+    def get_cached_competitions_mock(self) -> Optional[List[SoaringSpotContest]]:
+        return self.cached_competitions
+
     async def fetch_classes_mock(self, comp_url: str) -> List[str]:
         # Downloading...
         await asyncio.sleep(0)
@@ -66,7 +93,21 @@ class SoaringSpotFixture:
             raise self.fetch_downloads_exc
         return self.files
 
-    async def fetch_file_mock(self, file_url: str) -> IO[bytes]:
+    async def download_file_mock(
+        self,
+        file_url: str,
+        dest: str,
+        priority: Priority = Priority.BACKGROUND,
+        progress: Optional[ProgressCallback] = None,
+    ) -> int:
         # Downloading...
         await asyncio.sleep(0)
-        return io.BytesIO(self.file_contents)
+        if self.download_file_exc is not None:
+            raise self.download_file_exc
+        self.downloaded.append(file_url)
+        if progress is not None:
+            size = len(self.file_contents)
+            progress(Progress(received=size, total=size, rate=size))
+        with open(dest, "wb") as f:
+            f.write(self.file_contents)
+        return len(self.file_contents)
@@ -2,12 +2,14 @@ import asyncio
 from typing import List, Optional
 from unittest import mock
 
+from compman.scheduler import Priority
 from compman.soarscore import SoarScoreTaskInfo
 
 
 class SoarScoreFixture:
     tasks: List[SoarScoreTaskInfo]
     task_content = b""
+    fetched: List[str]
     fetch_latest_tasks_exc: Optional[Exception] = None
 
     def setUp(self) -> None:
@@ -27,6 +29,7 @@ class SoarScoreFixture:
 
     def reset(self):
         self.tasks = []
+        self.fetched = []
 
     async def fetch_latest_tasks(self, comp_id: str) -> List[SoarScoreTaskInfo]:
         # Downloading...
@@ -35,7 +38,8 @@ class SoarScoreFixture:
             raise self.fetch_latest_tasks_exc
         return self.tasks
 
-    async def fetch_url(self, url: str) -> bytes:
+    async def fetch_url(self, url: str, priority: Priority = Priority.PAGE) -> bytes:
         # Downloading...
         await asyncio.sleep(0)
+        self.fetched.append(url)
         return self.task_content
@@ -0,0 +1,177 @@
+import os
+
+import pytest
+
+from compman import activation, openair, storage, xcsoar
+
+AIRSPACE = "AC D\nDP 46:00:00 N 014:00:00 E\nDP 46:10:00 N 014:00:00 E\nDP 46:10:00 N 014:10:00 E\n"
+
+
+def _setup_comp(storage_dir, xcsoar_dir) -> storage.StoredCompetition:
+    for prf in ["first.prf", "second.prf"]:
+        with open(os.path.join(xcsoar_dir, prf), "w") as f:
+            f.write('PilotName="Test"\n')
+    comp = storage.StoredCompetition(
+        id="test",
+        title="Test",
+        airspace="airspace.txt",
+        waypoints="waypoints.cup",
+        profiles=["first.prf", "second.prf"],
+    )
+    storage.save_competition(comp)
+    with open(storage.get_full_file_path("test", "airspace.txt"), "w") as f:
+        f.write(AIRSPACE)
+    with open(storage.get_full_file_path("test", "waypoints.cup"), "w") as f:
+        f.write("name,code\n")
+    return comp
+
+
+def _read(xcsoar_dir: str, fname: str) -> str:
+    with open(os.path.join(xcsoar_dir, fname)) as f:
+        return f.read()
+
+
+@pytest.mark.asyncio
+async def test_activate(storage_dir, xcsoar_dir, mocker) -> None:
+    # GIVEN
+    comp = _setup_comp(storage_dir, xcsoar_dir)
+    clone_file = mocker.spy(xcsoar, "_clone_file")
+
+    # WHEN
+    await activation.activate(comp)
+
+    # THEN
+    # Each file is installed once, no matter how many profiles use it
+    assert clone_file.call_count == 2
+    assert _read(xcsoar_dir, xcsoar.AIRSPACE_FILE) == AIRSPACE
+    assert _read(xcsoar_dir, xcsoar.WAYPOINT_FILE) == "name,code\n"
+    for prf in ["first.prf", "second.prf"]:
+        profile = xcsoar.get_xcsoar_profile(prf)
+        assert profile.get_option("AirspaceFile") == (
+            "%LOCAL_PATH%\\compman-airspace.txt"
+        )
+        assert profile.get_option("WPFile") == "%LOCAL_PATH%\\compman-waypoints.cup"
+    # No backups are left behind
+    assert not [f for f in os.listdir(xcsoar_dir) if f.endswith((".bak", ".tmp"))]
+
+
+@pytest.mark.asyncio
+async def test_activate_unchanged(storage_dir, xcsoar_dir, mocker) -> None:
+    # GIVEN
+    comp = _setup_comp(storage_dir, xcsoar_dir)
+    await activation.activate(comp)
+    clone_file = mocker.spy(xcsoar, "_clone_file")
+    save = mocker.spy(xcsoar, "_write_atomic")
+
+    # WHEN
+    await activation.activate(comp)
+
+    # THEN
+    assert clone_file.call_count == 0
+    assert save.call_count == 0
+
+
+def test_apply_invalid_airspace(storage_dir, xcsoar_dir) -> None:
+    # GIVEN
+    comp = _setup_comp(storage_dir, xcsoar_dir)
+    with open(storage.get_full_file_path("test", "airspace.txt"), "w") as f:
+        f.write("<html>Not found</html>\n")
+
+    # WHEN
+    with pytest.raises(openair.OpenAirError, match="Invalid airspace file"):
+        activation.apply(activation.plan(comp))
+
+    # THEN
+    assert not os.path.exists(os.path.join(xcsoar_dir, xcsoar.WAYPOINT_FILE))
+    assert _read(xcsoar_dir, "first.prf") == 'PilotName="Test"\n'
+
+
+def test_apply_rollback(storage_dir, xcsoar_dir, mocker) -> None:
+    # GIVEN
+    comp = _setup_comp(storage_dir, xcsoar_dir)
+    with open(os.path.join(xcsoar_dir, xcsoar.AIRSPACE_FILE), "w") as f:
+        f.write("AC OLD\n")
+    act = activation.plan(comp)
+
+    orig_save = xcsoar.XCSoarProfile.save
+
+    def save(self) -> bool:
+        if self.filename.endswith("second.prf"):
+            raise OSError("Disk full")
+        return orig_save(self)
+
+    mocker.patch.object(xcsoar.XCSoarProfile, "save", save)
+
+    # WHEN
+    with pytest.raises(OSError):
+        activation.apply(act)
+
+    # THEN
+    assert _read(xcsoar_dir, "first.prf") == 'PilotName="Test"\n'
+    assert _read(xcsoar_dir, "second.prf") == 'PilotName="Test"\n'
+    assert _read(xcsoar_dir, xcsoar.AIRSPACE_FILE) == "AC OLD\n"
+    assert not os.path.exists(os.path.join(xcsoar_dir, xcsoar.WAYPOINT_FILE))
+
+
+WAYPOINTS = "name,code,country,lat,lon\nStart,S,SI,4600.000N,01400.000E\n"
+FAR_AIRSPACE = (
+    "AC R\nAN Far\nDP 50:00:00 N 020:00:00 E\n"
+    "DP 50:10:00 N 020:00:00 E\nDP 50:10:00 N 020:10:00 E\n"
+)
+
+
+@pytest.mark.asyncio
+async def test_activate_trim_airspace(storage_dir, xcsoar_dir, mocker) -> None:
+    # GIVEN
+    comp = _setup_comp(storage_dir, xcsoar_dir)
+    comp.trim_airspace = True
+    with open(storage.get_full_file_path("test", "airspace.txt"), "w") as f:
+        f.write(AIRSPACE + FAR_AIRSPACE)
+    with open(storage.get_full_file_path("test", "waypoints.cup"), "w") as f:
+        f.write(WAYPOINTS)
+    trim = mocker.spy(openair, "trim")
+
+    # WHEN
+    await activation.activate(comp)
+    await activation.activate(comp)
+
+    # THEN
+    # Zones far from waypoints are dropped, and trimming is done only once
+    assert _read(xcsoar_dir, xcsoar.AIRSPACE_FILE) == AIRSPACE
+    assert trim.call_count == 1
+    # Stored airspace is left intact
+    with open(storage.get_full_file_path("test", "airspace.txt")) as f:
+        assert f.read() == AIRSPACE + FAR_AIRSPACE
+
+
+@pytest.mark.asyncio
+async def test_activate_trim_no_airspace_nearby(storage_dir, xcsoar_dir) -> None:
+    # GIVEN
+    comp = _setup_comp(storage_dir, xcsoar_dir)
+    comp.trim_airspace = True
+    with open(storage.get_full_file_path("test", "airspace.txt"), "w") as f:
+        f.write(FAR_AIRSPACE)
+    with open(storage.get_full_file_path("test", "waypoints.cup"), "w") as f:
+        f.write(WAYPOINTS)
+
+    # WHEN
+    await activation.activate(comp)
+
+    # THEN
+    # Airspace is installed untrimmed, along with the rest of the files
+    assert _read(xcsoar_dir, xcsoar.AIRSPACE_FILE) == FAR_AIRSPACE
+    assert _read(xcsoar_dir, xcsoar.WAYPOINT_FILE) == WAYPOINTS
+    assert "AirspaceFile" in _read(xcsoar_dir, "first.prf")
+
+
+def test_plan_trim_needs_waypoints(storage_dir, xcsoar_dir) -> None:
+    # GIVEN
+    comp = _setup_comp(storage_dir, xcsoar_dir)
+    comp.trim_airspace = True
+    comp.waypoints = None
+
+    # WHEN
+    act = activation.plan(comp)
+
+    # THEN
+    assert not act.trim_airspace
@@ -0,0 +1,108 @@
+import pytest
+
+from compman import connectivity, http
+from compman.connectivity import OfflineError
+
+ROUTE_HEADER = (
+    "Iface\tDestination\tGateway\tFlags\tRefCnt\tUse\tMetric\tMask\tMTU\tWindow\tIRTT\n"
+)
+IPV6_DEFAULT_ROUTE = (
+    "00000000000000000000000000000000 00 00000000000000000000000000000000 00 "
+    "fd000000000000000000000000000001 00000400 00000001 00000000 00000003 eth0\n"
+)
+IPV6_UNREACHABLE_ROUTE = (
+    "00000000000000000000000000000000 00 00000000000000000000000000000000 00 "
+    "00000000000000000000000000000000 ffffffff 00000001 00000000 00200200 lo\n"
+)
+
+
+@pytest.fixture
+def routes(tmp_path, monkeypatch):
+    ipv4 = tmp_path / "route"
+    ipv6 = tmp_path / "ipv6_route"
+    ipv4.write_text(ROUTE_HEADER)
+    ipv6.write_text(IPV6_UNREACHABLE_ROUTE)
+    monkeypatch.setattr(connectivity, "IPV4_ROUTES", str(ipv4))
+    monkeypatch.setattr(connectivity, "IPV6_ROUTES", str(ipv6))
+    yield ipv4, ipv6
+
+
+def test_probe_no_routes(routes) -> None:
+    assert connectivity._has_default_route() is False
+
+
+def test_probe_ipv4_default_route(routes) -> None:
+    ipv4, _ = routes
+    ipv4.write_text(
+        ROUTE_HEADER
+        + "eth0\t00000000\t010200C0\t0003\t0\t0\t0\t00000000\t0\t0\t0\n"
+        + "eth0\t000200C0\t00000000\t0001\t0\t0\t0\t00FFFFFF\t0\t0\t0\n"
+    )
+    assert connectivity._has_default_route() is True
+
+
+def test_probe_ipv4_local_routes_only(routes) -> None:
+    ipv4, _ = routes
+    ipv4.write_text(
+        ROUTE_HEADER
+        + "lo\t00000000\t00000000\t0001\t0\t0\t0\t00000000\t0\t0\t0\n"
+        + "eth0\t000200C0\t00000000\t0001\t0\t0\t0\t00FFFFFF\t0\t0\t0\n"
+    )
+    assert connectivity._has_default_route() is False
+
+
+def test_probe_ipv6_default_route(routes) -> None:
+    _, ipv6 = routes
+    ipv6.write_text(IPV6_DEFAULT_ROUTE + IPV6_UNREACHABLE_ROUTE)
+    assert connectivity._has_default_route() is True
+
+
+def test_probe_no_proc(tmp_path, monkeypatch) -> None:
+    # When routing table is not available, assume we are online
+    monkeypatch.setattr(connectivity, "IPV4_ROUTES", str(tmp_path / "missing"))
+    assert connectivity.probe() is True
+
+
+def test_is_online_cached(network, mocker) -> None:
+    # GIVEN
+    probe = mocker.spy(network, "probe")
+    mocker.patch("compman.connectivity.probe", probe)
+    connectivity.invalidate()
+
+    # WHEN
+    assert connectivity.is_online() is True
+    network.online = False
+    online = connectivity.is_online()
+
+    # THEN
+    # Result of the probe is reused for a while
+    assert online is True
+    assert probe.call_count == 1
+
+    connectivity.invalidate()
+    assert connectivity.is_online() is False
+
+
+def test_check_offline(network) -> None:
+    network.go_offline()
+    with pytest.raises(OfflineError):
+        connectivity.check("http://soaringspot.com/en_gb/")
+
+    # Local servers are reachable without network
+    connectivity.check("http://localhost:8080/")
+    connectivity.check("http://127.0.0.1:8080/")
+
+
+@pytest.mark.asyncio
+async def test_fetch_offline(network, httpserver, monkeypatch, tmp_path) -> None:
+    # GIVEN
+    monkeypatch.setattr(connectivity, "LOCAL_HOSTS", set())
+    network.go_offline()
+
+    # WHEN
+    with pytest.raises(OfflineError):
+        await http.download_file(httpserver.url("/page"), str(tmp_path / "page"))
+
+    # THEN
+    # Request fails right away, without even trying to connect
+    assert httpserver.requests == []
@@ -0,0 +1,85 @@
+import io
+import random
+
+import pytest
+
+from compman import cup
+
+WAYPOINTS = """name,code,country,lat,lon,elev,style,rwdir,rwlen,freq,desc
+"Lesce",LESCE,SI,4621.467N,01410.417E,505.0m,5,130,1140.0m,123.500,
+"Ptuj",PTUJ,SI,4624.000N,01551.000E,224.0m,5,,,,
+"Bad",BAD,SI,xxx,01551.000E,224.0m,1,,,,
+-----Related Tasks-----
+"Task","Lesce","Ptuj"
+"""
+
+
+def test_parse_lat_lon() -> None:
+    assert cup.parse_lat("4621.467N") == pytest.approx(46 + 21.467 / 60)
+    assert cup.parse_lat("3330.000S") == pytest.approx(-33.5)
+    assert cup.parse_lon("01410.417E") == pytest.approx(14 + 10.417 / 60)
+    assert cup.parse_lon("07030.000W") == pytest.approx(-70.5)
+    with pytest.raises(ValueError):
+        cup.parse_lat("46.5")
+
+
+def test_read() -> None:
+    # WHEN
+    wps = cup.read(io.StringIO(WAYPOINTS))
+
+    # THEN
+    assert len(wps) == 2
+    assert wps[1] == cup.Waypoint("Ptuj", "PTUJ", 46.4, 15.85)
+    assert wps.format() == "2 waypoints, 129 x 5 km"
+
+
+def test_find() -> None:
+    # GIVEN
+    wps = cup.WaypointSet()
+    for name in ["Lesce", "Ljubljana", "Bled", "LJ Tower", "Maribor"]:
+        wps.add(name, "", 46.0, 14.0)
+
+    # THEN
+    assert [wp.name for wp in wps.find("l")] == ["Lesce", "LJ Tower", "Ljubljana"]
+    assert [wp.name for wp in wps.find("LJU")] == ["Ljubljana"]
+    assert wps.find("x") == []
+
+
+def test_nearest() -> None:
+    # GIVEN
+    random.seed(3)
+    wps = cup.WaypointSet()
+    for n in range(2000):
+        wps.add(f"WP{n}", "", random.uniform(45, 48), random.uniform(12, 17))
+    points = [(46.5, 14.5), (44.0, 11.0), (48.2, 17.3), (60.0, -20.0)]
+
+    # THEN
+    # Same results as checking every waypoint
+    for lat, lon in points:
+        expected = min(
+            range(len(wps)),
+            key=lambda i: cup.distance_km(lat, lon, wps.lats[i], wps.lons[i]),
+        )
+        assert wps.nearest(lat, lon) == wps[expected]
+    assert cup.WaypointSet().nearest(46.0, 14.0) is None
+
+
+def test_read_file_cached(tmpdir, mocker) -> None:
+    # GIVEN
+    path = str(tmpdir.join("waypoints.cup"))
+    with open(path, "w") as f:
+        f.write(WAYPOINTS)
+    read = mocker.spy(cup, "read")
+
+    # WHEN
+    first = cup.read_file(path, "digest")
+    second = cup.read_file(path, "digest")
+
+    # THEN
+    assert first is second
+    assert read.call_count == 1
+
+
+def test_distance_km() -> None:
+    # One minute of latitude is one nautical mile
+    assert cup.distance_km(46.0, 14.0, 46 + 1 / 60, 14.0) == pytest.approx(1.853, 1e-3)
@@ -0,0 +1,423 @@
+import os
+from typing import List, Optional
+
+import mock
+import pytest
+from aiohttp import ClientError, web
+
+from compman import connectivity, http
+from compman.netpolicy import get_policy
+
+
+@pytest.mark.asyncio
+async def test_connection_reused(httpserver, tmp_path) -> None:
+    # GIVEN
+    async def handler(request: web.Request) -> web.Response:
+        return web.Response(body=b"data")
+
+    httpserver.route("/file.txt", handler)
+
+    # WHEN
+    for n in range(3):
+        await http.download_file(httpserver.url("/file.txt"), str(tmp_path / f"{n}"))
+
+    # THEN
+    # All requests are served over the same keep-alive connection
+    assert len(httpserver.requests) == 3
+    assert len(set(httpserver.peers)) == 1
+
+
+@pytest.mark.asyncio
+async def test_close_session() -> None:
+    # GIVEN
+    session = http.get_session()
+    assert http.get_session() is session
+
+    # WHEN
+    await http.close()
+
+    # THEN
+    assert session.closed
+    assert http.get_session() is not session
+    await http.close()
+
+
+@pytest.mark.asyncio
+async def test_download_file(httpserver, tmp_path) -> None:
+    # GIVEN
+    body = b"0123456789" * 100000
+
+    async def handler(request: web.Request) -> web.StreamResponse:
+        resp = web.StreamResponse()
+        resp.content_length = len(body)
+        await resp.prepare(request)
+        for pos in range(0, len(body), 4096):
+            await resp.write(body[pos : pos + 4096])
+        return resp
+
+    httpserver.route("/airspace.txt", handler)
+    dest = str(tmp_path / "airspace.txt")
+
+    # WHEN
+    size = await http.download_file(httpserver.url("/airspace.txt"), dest)
+
+    # THEN
+    assert size == len(body)
+    with open(dest, "rb") as f:
+        assert f.read() == body
+    assert os.listdir(tmp_path) == ["airspace.txt"]
+
+
+@pytest.mark.asyncio
+async def test_download_file_interrupted(httpserver, tmp_path, async_sleep) -> None:
+    # GIVEN
+    async def handler(request: web.Request) -> web.StreamResponse:
+        resp = web.StreamResponse()
+        resp.content_length = 1000
+        await resp.prepare(request)
+        await resp.write(b"x" * 500)
+        assert request.transport is not None
+        request.transport.close()
+        return resp
+
+    httpserver.route("/airspace.txt", handler)
+    dest = str(tmp_path / "airspace.txt")
+    with open(dest, "wb") as out:
+        out.write(b"old contents")
+
+    # WHEN
+    with pytest.raises(ClientError):
+        await http.download_file(httpserver.url("/airspace.txt"), dest)
+
+    # THEN
+    # Previous version of the file stays intact
+    with open(dest, "rb") as f:
+        assert f.read() == b"old contents"
+    assert os.listdir(tmp_path) == ["airspace.txt"]
+
+
+class FlakyFileServer:
+    """Serves a file with Range support, dropping connection mid-body.
+
+    First `cuts` responses are cut off after a quarter of the file is sent.
+    """
+
+    def __init__(
+        self, body: bytes, etag: Optional[str] = '"v1"', cuts: int = 1
+    ) -> None:
+        self.body = body
+        self.etag = etag
+        self.cuts = cuts
+
+    async def handler(self, request: web.Request) -> web.StreamResponse:
+        offset = 0
+        status = 200
+        rng = request.headers.get("Range")
+        if rng and request.headers.get("If-Range") == self.etag:
+            offset = int(rng[len("bytes=") : -1])
+            status = 206
+
+        resp = web.StreamResponse(status=status)
+        if self.etag is not None:
+            resp.headers["ETag"] = self.etag
+        if status == 206:
+            resp.headers["Content-Range"] = (
+                f"bytes {offset}-{len(self.body) - 1}/{len(self.body)}"
+            )
+        resp.content_length = len(self.body) - offset
+        await resp.prepare(request)
+
+        if self.cuts > 0:
+            self.cuts -= 1
+            await resp.write(self.body[offset : offset + len(self.body) // 4])
+            assert request.transport is not None
+            request.transport.close()
+            return resp
+
+        await resp.write(self.body[offset:])
+        return resp
+
+
+@pytest.mark.asyncio
+async def test_download_file_retry_resumes(httpserver, tmp_path, async_sleep) -> None:
+    # GIVEN
+    body = bytes(range(256)) * 400
+    server = FlakyFileServer(body, cuts=2)
+    httpserver.route("/airspace.txt", server.handler)
+    dest = str(tmp_path / "airspace.txt")
+
+    # WHEN
+    size = await http.download_file(httpserver.url("/airspace.txt"), dest)
+
+    # THEN
+    # Each retry continues where the previous attempt stopped
+    assert size == len(body)
+    with open(dest, "rb") as f:
+        assert f.read() == body
+    ranges = [r.headers.get("Range") for r in httpserver.requests]
+    assert ranges == [None, f"bytes={len(body) // 4}-", f"bytes={len(body) // 2}-"]
+
+
+@pytest.mark.asyncio
+async def test_download_file_resume(httpserver, tmp_path, async_sleep) -> None:
+    # GIVEN
+    body = bytes(range(256)) * 400
+    server = FlakyFileServer(body, cuts=3)
+    httpserver.route("/airspace.txt", server.handler)
+    url = httpserver.url("/airspace.txt")
+    dest = str(tmp_path / "airspace.txt")
+
+    with pytest.raises(ClientError):
+        await http.download_file(url, dest)
+    get_policy().reset()
+    assert sorted(os.listdir(tmp_path)) == [
+        "airspace.txt.part",
+        "airspace.txt.part.json",
+    ]
+
+    # WHEN
+    size = await http.download_file(url, dest)
+
+    # THEN
+    assert size == len(body)
+    with open(dest, "rb") as f:
+        assert f.read() == body
+    assert os.listdir(tmp_path) == ["airspace.txt"]
+
+    resumed = httpserver.requests[-1]
+    assert resumed.headers["Range"] == f"bytes={len(body) // 4 * 3}-"
+    assert resumed.headers["If-Range"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_download_file_resume_changed(httpserver, tmp_path, async_sleep) -> None:
+    # GIVEN
+    server = FlakyFileServer(b"a" * 1000, cuts=3)
+    httpserver.route("/airspace.txt", server.handler)
+    url = httpserver.url("/airspace.txt")
+    dest = str(tmp_path / "airspace.txt")
+
+    with pytest.raises(ClientError):
+        await http.download_file(url, dest)
+    get_policy().reset()
+
+    # WHEN
+    # File has changed on the server since partial download
+    server.body = b"b" * 800
+    server.etag = '"v2"'
+    size = await http.download_file(url, dest)
+
+    # THEN
+    assert size == 800
+    with open(dest, "rb") as f:
+        assert f.read() == b"b" * 800
+
+
+@pytest.mark.asyncio
+async def test_download_file_no_validators(httpserver, tmp_path, async_sleep) -> None:
+    # GIVEN
+    server = FlakyFileServer(b"a" * 1000, etag=None, cuts=3)
+    httpserver.route("/airspace.txt", server.handler)
+    url = httpserver.url("/airspace.txt")
+    dest = str(tmp_path / "airspace.txt")
+
+    # WHEN
+    with pytest.raises(ClientError):
+        await http.download_file(url, dest)
+
+    # THEN
+    # Partial file cannot be safely resumed without validators
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_download_file_resume_wrong_range(httpserver, tmp_path) -> None:
+    # GIVEN
+    body = b"0123456789" * 100
+
+    async def handler(request: web.Request) -> web.Response:
+        if request.headers.get("Range"):
+            # Server ignores the requested offset
+            return web.Response(
+                status=206,
+                body=body[100:],
+                headers={"ETag": '"v1"', "Content-Range": "bytes 100-999/1000"},
+            )
+        return web.Response(body=body, headers={"ETag": '"v1"'})
+
+    httpserver.route("/airspace.txt", handler)
+    url = httpserver.url("/airspace.txt")
+    dest = str(tmp_path / "airspace.txt")
+    with open(f"{dest}.part", "wb") as part:
+        part.write(body[:500])
+    http.PartialDownload(url, etag='"v1"').save(f"{dest}.part.json")
+
+    # WHEN
+    size = await http.download_file(url, dest)
+
+    # THEN
+    # Partial file is discarded and the whole file is downloaded again
+    assert size == len(body)
+    with open(dest, "rb") as f:
+        assert f.read() == body
+    assert os.listdir(tmp_path) == ["airspace.txt"]
+    ranges = [r.headers.get("Range") for r in httpserver.requests]
+    assert ranges == ["bytes=500-", None]
+
+
+@pytest.mark.asyncio
+async def test_download_file_resume_shrunk(httpserver, tmp_path) -> None:
+    # GIVEN
+    body = b"0123456789" * 10
+
+    async def handler(request: web.Request) -> web.Response:
+        if request.headers.get("Range"):
+            return web.Response(
+                status=416, headers={"Content-Range": f"bytes */{len(body)}"}
+            )
+        return web.Response(body=body, headers={"ETag": '"v1"'})
+
+    httpserver.route("/airspace.txt", handler)
+    url = httpserver.url("/airspace.txt")
+    dest = str(tmp_path / "airspace.txt")
+    with open(f"{dest}.part", "wb") as part:
+        part.write(body * 2)
+    http.PartialDownload(url, etag='"v1"').save(f"{dest}.part.json")
+
+    # WHEN
+    size = await http.download_file(url, dest)
+
+    # THEN
+    # Partial file is larger than the server copy, whole file is downloaded
+    assert size == len(body)
+    with open(dest, "rb") as f:
+        assert f.read() == body
+    assert os.listdir(tmp_path) == ["airspace.txt"]
+    ranges = [r.headers.get("Range") for r in httpserver.requests]
+    assert ranges == [f"bytes={len(body) * 2}-", None]
+
+
+class CachingPageServer:
+    """Serves a page with ETag, honoring If-None-Match"""
+
+    def __init__(self, body: str, etag: str = '"v1"') -> None:
+        self.body = body
+        self.etag = etag
+
+    async def handler(self, request: web.Request) -> web.Response:
+        if request.headers.get("If-None-Match") == self.etag:
+            return web.Response(status=304, headers={"ETag": self.etag})
+        return web.Response(text=self.body, headers={"ETag": self.etag})
+
+
+@pytest.mark.asyncio
+async def test_fetch_cached(httpserver, storage_dir) -> None:
+    # GIVEN
+    server = CachingPageServer("one,two")
+    httpserver.route("/page", server.handler)
+    url = httpserver.url("/page")
+    parse = mock.Mock(side_effect=lambda text: text.split(","))
+
+    # WHEN
+    first = await http.fetch_cached(url, parse)
+    second = await http.fetch_cached(url, parse)
+
+    # THEN
+    assert first == ["one", "two"]
+    assert second == ["one", "two"]
+    # Page is parsed only once, second time the server responds with 304
+    assert parse.call_count == 1
+    assert httpserver.requests[-1].headers["If-None-Match"] == '"v1"'
+    # Parsed result is available without network
+    assert http.get_cached(url) == ["one", "two"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_cached_modified(httpserver, storage_dir) -> None:
+    # GIVEN
+    server = CachingPageServer("one,two")
+    httpserver.route("/page", server.handler)
+    url = httpserver.url("/page")
+    parse = lambda text: text.split(",")
+    await http.fetch_cached(url, parse)
+
+    # WHEN
+    server.body = "three"
+    server.etag = '"v2"'
+    fetched = await http.fetch_cached(url, parse)
+
+    # THEN
+    assert fetched == ["three"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_cached_offline(
+    httpserver, storage_dir, network, monkeypatch
+) -> None:
+    # GIVEN
+    server = CachingPageServer("one,two")
+    httpserver.route("/page", server.handler)
+    url = httpserver.url("/page")
+    parse = lambda text: text.split(",")
+    await http.fetch_cached(url, parse)
+    monkeypatch.setattr(connectivity, "LOCAL_HOSTS", set())
+    network.go_offline()
+
+    # WHEN
+    fetched = await http.fetch_cached(url, parse)
+
+    # THEN
+    # Cached result is returned without a request
+    assert fetched == ["one", "two"]
+    assert len(httpserver.requests) == 1
+
+
+class LineParser:
+    def __init__(self, encoding: Optional[str]) -> None:
+        self.buffer = b""
+
+    def feed(self, chunk: bytes) -> List[str]:
+        *lines, self.buffer = (self.buffer + chunk).split(b"\n")
+        return [line.decode() for line in lines]
+
+    def close(self) -> List[str]:
+        return [self.buffer.decode()] if self.buffer else []
+
+
+@pytest.mark.asyncio
+async def test_iter_cached(httpserver, storage_dir, network, monkeypatch) -> None:
+    # GIVEN
+    server = CachingPageServer("one\ntwo\nthree")
+    httpserver.route("/page", server.handler)
+    url = httpserver.url("/page")
+
+    # WHEN
+    fetched = [batch async for batch in http.iter_cached(url, LineParser)]
+    not_modified = [batch async for batch in http.iter_cached(url, LineParser)]
+    monkeypatch.setattr(connectivity, "LOCAL_HOSTS", set())
+    network.go_offline()
+    offline = [batch async for batch in http.iter_cached(url, LineParser)]
+
+    # THEN
+    assert sum(fetched, []) == ["one", "two", "three"]
+    # Cached items come in a single batch
+    assert not_modified == [["one", "two", "three"]]
+    assert offline == [["one", "two", "three"]]
+    assert len(httpserver.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_download_file_not_modified(httpserver, storage_dir, tmp_path) -> None:
+    # GIVEN
+    server = CachingPageServer("airspace")
+    httpserver.route("/airspace.txt", server.handler)
+    url = httpserver.url("/airspace.txt")
+    dest = str(tmp_path / "airspace.txt")
+    await http.download_file(url, dest)
+
+    # WHEN
+    size = await http.download_file(url, dest)
+
+    # THEN
+    assert size == len("airspace")
+    assert httpserver.requests[-1].headers["If-None-Match"] == '"v1"'
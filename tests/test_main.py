@@ -1,6 +1,8 @@
+import asyncio
+
 import pytest
 
-from compman import main
+from compman import http, main
 
 
 @pytest.mark.asyncio
@@ -11,9 +13,29 @@ async def test_main(mocker, activity_testbed) -> None:
     mocker.patch("compman.main.logging")
     mocker.patch("compman.main.urwid")
     mocker.patch("compman.ui.mainmenu.MainMenuScreen")
+    shutdown = mocker.patch("compman.main.shutdown")
 
     main.run([])
 
+    shutdown.assert_called_once()
+
+
+def test_shutdown_closes_http_session() -> None:
+    # GIVEN
+    loop = asyncio.new_event_loop()
+
+    async def open_session():
+        return http.get_session()
+
+    session = loop.run_until_complete(open_session())
+
+    # WHEN
+    main.shutdown(loop)
+    loop.close()
+
+    # THEN
+    assert session.closed
+
 
 def test_debounce_esc() -> None:
     assert main.debounce_esc(["down"], []) == ["down"]
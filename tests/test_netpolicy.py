@@ -0,0 +1,210 @@
+import asyncio
+import logging
+
+import mock
+import pytest
+from aiohttp import ClientConnectionError, ClientResponseError, ServerTimeoutError
+
+from compman.netpolicy import CircuitOpenError, NetworkPolicy, RetryPolicy
+from compman.scheduler import DownloadScheduler, Priority
+
+URL = "http://soaringspot.local/page"
+
+
+class FlakyCall:
+    def __init__(self, failures: int, error: Exception) -> None:
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+@pytest.mark.asyncio
+async def test_retry_succeeds(async_sleep, caplog) -> None:
+    # GIVEN
+    policy = NetworkPolicy(RetryPolicy(attempts=3))
+    call = FlakyCall(2, ClientConnectionError("Connection reset"))
+
+    # WHEN
+    with caplog.at_level(logging.WARNING, logger="compman"):
+        result = await policy.call(URL, call)
+
+    # THEN
+    assert result == "ok"
+    assert call.calls == 3
+    assert "attempt 1/3" in caplog.text
+    assert "attempt 2/3" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_retry_gives_up(async_sleep) -> None:
+    # GIVEN
+    policy = NetworkPolicy(RetryPolicy(attempts=2), failure_threshold=10)
+    call = FlakyCall(5, ClientConnectionError("Connection reset"))
+
+    # WHEN
+    with pytest.raises(ClientConnectionError):
+        await policy.call(URL, call)
+
+    # THEN
+    assert call.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_client_error_not_retried(async_sleep) -> None:
+    # GIVEN
+    policy = NetworkPolicy()
+    error = ClientResponseError(mock.Mock(), (), status=404)
+    call = FlakyCall(1, error)
+
+    # WHEN
+    with pytest.raises(ClientResponseError):
+        await policy.call(URL, call)
+
+    # THEN
+    assert call.calls == 1
+    assert not policy.get_breaker(URL).is_open
+
+
+@pytest.mark.asyncio
+async def test_custom_retry_errors(async_sleep) -> None:
+    # GIVEN
+    policy = NetworkPolicy()
+    call = FlakyCall(1, IOError("Broken pipe"))
+
+    # WHEN
+    result = await policy.call(URL, call, retry_on=(IOError,))
+
+    # THEN
+    assert result == "ok"
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast(async_sleep, caplog) -> None:
+    # GIVEN
+    policy = NetworkPolicy(RetryPolicy(attempts=5), failure_threshold=3)
+    failing = FlakyCall(100, ClientConnectionError("No route to host"))
+    with caplog.at_level(logging.WARNING, logger="compman"):
+        with pytest.raises(ClientConnectionError):
+            await policy.call(URL, failing)
+    assert failing.calls == 3
+    assert "Circuit for soaringspot.local opened after 3 failures" in caplog.text
+
+    # WHEN
+    other = FlakyCall(0, ClientConnectionError())
+    with pytest.raises(CircuitOpenError):
+        await policy.call("http://soaringspot.local/other", other)
+
+    # THEN
+    # Request to the host is not even attempted
+    assert other.calls == 0
+
+    # Other hosts are not affected
+    result = await policy.call("http://soarscore.local/", other)
+    assert result == "ok"
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_half_open(async_sleep, mocker) -> None:
+    # GIVEN
+    policy = NetworkPolicy(RetryPolicy(attempts=1), failure_threshold=1)
+    with pytest.raises(ClientConnectionError):
+        await policy.call(URL, FlakyCall(1, ClientConnectionError()))
+    breaker = policy.get_breaker(URL)
+    assert breaker.is_open
+
+    # WHEN
+    assert breaker.opened_at is not None
+    breaker.opened_at -= policy.reset_timeout
+    result = await policy.call(URL, FlakyCall(0, ClientConnectionError()))
+
+    # THEN
+    assert result == "ok"
+    assert not breaker.is_open
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_half_open_cancelled(async_sleep) -> None:
+    # GIVEN
+    policy = NetworkPolicy(RetryPolicy(attempts=1), failure_threshold=1)
+    with pytest.raises(ClientConnectionError):
+        await policy.call(URL, FlakyCall(1, ClientConnectionError()))
+    breaker = policy.get_breaker(URL)
+    assert breaker.opened_at is not None
+    breaker.opened_at -= policy.reset_timeout
+
+    async def hanging() -> str:
+        await asyncio.Event().wait()
+        return "never"
+
+    trial = asyncio.ensure_future(policy.call(URL, hanging))
+    await asyncio.sleep(0)
+
+    # WHEN
+    # User leaves the screen while trial request is in progress
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    # THEN
+    # Next request is let through as a new trial
+    result = await policy.call(URL, FlakyCall(0, ClientConnectionError()))
+    assert result == "ok"
+    assert not breaker.is_open
+
+
+@pytest.mark.asyncio
+async def test_deadline() -> None:
+    # GIVEN
+    policy = NetworkPolicy()
+
+    async def hanging() -> str:
+        await asyncio.sleep(10)
+        return "never"
+
+    # WHEN
+    with pytest.raises(ServerTimeoutError):
+        await policy.call(URL, hanging, deadline=0.01)
+
+
+@pytest.mark.asyncio
+async def test_deadline_excludes_queueing(monkeypatch) -> None:
+    # GIVEN
+    scheduler = DownloadScheduler(1)
+    monkeypatch.setattr("compman.scheduler._SCHEDULER", scheduler)
+    policy = NetworkPolicy(failure_threshold=1)
+
+    async def download() -> None:
+        async with scheduler.slot(URL, Priority.BACKGROUND):
+            await asyncio.sleep(0.05)
+
+    # Slow download holds the only slot to the host
+    downloading = asyncio.ensure_future(download())
+    await asyncio.sleep(0)
+
+    # WHEN
+    result = await policy.call(
+        URL,
+        FlakyCall(0, ClientConnectionError()),
+        deadline=0.01,
+        priority=Priority.PAGE,
+    )
+
+    # THEN
+    # Waiting for the slot is not a host failure
+    assert result == "ok"
+    assert not policy.get_breaker(URL).is_open
+    await downloading
+
+
+def test_backoff_jitter() -> None:
+    retry = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for _ in range(20):
+        assert 0.5 <= retry.backoff(1) <= 1.0
+        assert 1.0 <= retry.backoff(2) <= 2.0
+        assert 2.5 <= retry.backoff(10) <= 5.0
@@ -0,0 +1,183 @@
+import io
+import math
+import os
+import tracemalloc
+
+import pytest
+
+from compman import openair
+
+HERE = os.path.dirname(__file__)
+SAMPLE = os.path.join(HERE, "fixtures", "openair", "sample.txt")
+
+ZONE = """AC D
+AN Zone {n}
+AL GND
+AH 3500ft
+DP 46:00:00 N 014:00:00 E
+DP 46:10:00 N 014:00:00 E
+DP 46:10:00 N 014:10:00 E
+"""
+
+
+def test_parse() -> None:
+    # WHEN
+    with open(SAMPLE) as f:
+        zones = list(openair.parse(f))
+
+    # THEN
+    assert [(z.cls, z.name) for z in zones] == [
+        ("D", "LJLJ CTR"),
+        ("R", "LJR1 Military"),
+        ("C", "TMA Sector"),
+        ("Q", "Danger zone"),
+    ]
+    ctr, circle, arc, danger = zones
+    assert (ctr.floor, ctr.ceiling) == (0.0, 4500.0)
+    assert ctr.bounds() == pytest.approx((46.15, 14.3, 46.3, 14.6))
+    assert (circle.floor, circle.ceiling) == (2000.0, 9500.0)
+    # 5 NM circle is 5 minutes of latitude each way
+    min_lat, _, max_lat, _ = circle.bounds()
+    assert (min_lat, max_lat) == pytest.approx((46 - 5 / 60, 46 + 5 / 60))
+    # Counter-clockwise arc from west to east goes through south
+    assert arc.bounds()[0] == pytest.approx(46.5 - 10 / 60)
+    assert danger.ceiling == math.inf
+
+
+def test_summarize_errors() -> None:
+    # GIVEN
+    content = (
+        "DP 46:00:00 N 014:00:00 E\n"
+        + ZONE.format(n=1)
+        + "DP 46:xx:00 N 014:00:00 E\n"
+        + "AC D\nAN Line\nDP 46:00:00 N 014:00:00 E\n"
+        + "AC D\nAN No center\nDC 5\n"
+    )
+
+    # WHEN
+    summary = openair.summarize(io.StringIO(content), max_errors=2)
+
+    # THEN
+    assert summary.counts == {"D": 1}
+    assert not summary.valid
+    assert summary.error_count == 5
+    assert summary.errors == [
+        "line 1: DP outside of airspace",
+        "line 9: invalid coordinate: 46:xx:00 N 014:00:00 E",
+    ]
+
+
+def test_validate_file(tmpdir) -> None:
+    # GIVEN
+    html = os.path.join(tmpdir, "airspace.txt")
+    with open(html, "w") as f:
+        f.write("<html><body>Not found</body></html>\n")
+
+    # THEN
+    assert openair.validate_file(SAMPLE).zones == 4
+    with pytest.raises(openair.OpenAirError, match="no airspace zones"):
+        openair.validate_file(html)
+
+
+def test_summarize_bounded_memory() -> None:
+    # GIVEN
+    def lines():
+        for n in range(5000):
+            yield from ZONE.format(n=n).splitlines()
+
+    # WHEN
+    tracemalloc.start()
+    try:
+        summary = openair.summarize(lines())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # THEN
+    assert summary.counts == {"D": 5000}
+    # Zones are not kept around
+    assert peak < 100 * 1024
+
+
+def test_trim() -> None:
+    # GIVEN
+    # Around the first zone only, but large enough to touch the R circle
+    area = (46.05, 14.3, 46.3, 14.95)
+    out = io.StringIO()
+
+    # WHEN
+    with open(SAMPLE) as f:
+        stats = openair.trim(f, area, out)
+
+    # THEN
+    assert stats == openair.TrimStats(kept=2, dropped=2)
+    trimmed = out.getvalue()
+    assert trimmed.startswith("* Sample OpenAir file\n")
+    assert [z.name for z in openair.parse(io.StringIO(trimmed))] == [
+        "LJLJ CTR",
+        "LJR1 Military",
+    ]
+
+
+def test_trim_keeps_broken_zones() -> None:
+    # GIVEN
+    content = ZONE.format(n=1) + "AC R\nAN Broken\nDP 99:00:00 N 014:00:00 E\n"
+    out = io.StringIO()
+
+    # WHEN
+    stats = openair.trim(io.StringIO(content), (0.0, 0.0, 1.0, 1.0), out)
+
+    # THEN
+    assert stats == openair.TrimStats(kept=0, dropped=1)
+    assert out.getvalue() == "AC R\nAN Broken\nDP 99:00:00 N 014:00:00 E\n"
+
+
+def test_expand_bounds() -> None:
+    # WHEN
+    bounds = openair.expand_bounds((46.0, 14.0, 46.0, 15.0), 111.2)
+
+    # THEN
+    assert bounds[0] == pytest.approx(45.0)
+    assert bounds[2] == pytest.approx(47.0)
+    # Degree of longitude is shorter away from equator
+    assert bounds[1] == pytest.approx(14.0 - 1 / math.cos(math.radians(46.0)))
+    assert bounds[3] == pytest.approx(15.0 + 1 / math.cos(math.radians(46.0)))
+
+
+@pytest.mark.parametrize(
+    "text, feet",
+    [
+        ("GND", 0.0),
+        ("GROUND", 0.0),
+        ("SFC", 0.0),
+        ("SURFACE", 0.0),
+        ("MSL", 0.0),
+        ("AGL", 0.0),
+        ("2000 MSL", 2000.0),
+        ("2000ft AMSL", 2000.0),
+        ("1500 AGL", 1500.0),
+        ("600M MSL", 600 / 0.3048),
+        ("FL95", 9500.0),
+        ("UNLIM", math.inf),
+    ],
+)
+def test_parse_altitude(text: str, feet: float) -> None:
+    assert openair.parse_altitude(text) == pytest.approx(feet)
+
+
+def test_validate_file_few_errors(tmpdir) -> None:
+    # GIVEN
+    path = os.path.join(tmpdir, "airspace.txt")
+    with open(path, "w") as f:
+        for n in range(20):
+            f.write(ZONE.format(n=n))
+        f.write("AC D\nAN Broken\nDP 46:xx:00 N 014:00:00 E\n")
+
+    # WHEN
+    summary = openair.validate_file(path)
+
+    # THEN
+    # XCSoar skips broken zones as well
+    assert summary.valid
+    assert summary.zones == 20
+    assert summary.error_count == 2
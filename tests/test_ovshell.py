@@ -3,7 +3,8 @@ import asyncio
 import pytest
 from ovshell.testing import OpenVarioShellStub
 
-from compman.ovshell import CompmanShellActivity, CompmanShellApp, extension
+from compman import storage
+from compman.ovshell import CompmanShellActivity, CompmanShellApp, extension, setup
 
 
 @pytest.fixture
@@ -29,6 +30,71 @@ def test_extension(ovshell: OpenVarioShellStub) -> None:
     assert len(apps) == 1
 
 
+@pytest.mark.asyncio
+async def test_extension_start_sync(
+    ovshell: OpenVarioShellStub, compman_app: CompmanShellApp, mocker
+) -> None:
+    # GIVEN
+    mocker.patch("compman.ovshell.BACKGROUND_SYNC_DELAY", 0)
+    sync_current = mocker.patch("compman.sync.sync_current")
+    setup()
+    storage.save_competition(storage.StoredCompetition("test", "Test"), True)
+    ext = extension("compman", ovshell)
+
+    # WHEN
+    ext.start()
+    for _ in range(2):
+        await asyncio.sleep(0)  # let background task to run
+
+    # THEN
+    # Current competition is refreshed in background
+    sync_current.assert_called_once_with(background=True)
+
+
+@pytest.mark.asyncio
+async def test_extension_start_no_competition(
+    ovshell: OpenVarioShellStub, compman_app: CompmanShellApp, mocker
+) -> None:
+    # GIVEN
+    mocker.patch("compman.ovshell.BACKGROUND_SYNC_DELAY", 0)
+    sync_current = mocker.patch("compman.sync.sync_current")
+    ext = extension("compman", ovshell)
+
+    # WHEN
+    ext.start()
+    for _ in range(2):
+        await asyncio.sleep(0)
+
+    # THEN
+    sync_current.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_extension_start_no_xcsoar(
+    ovshell: OpenVarioShellStub,
+    compman_app: CompmanShellApp,
+    tmp_path,
+    mocker,
+    monkeypatch,
+) -> None:
+    # GIVEN
+    mocker.patch("compman.ovshell.BACKGROUND_SYNC_DELAY", 0)
+    sync_current = mocker.patch("compman.sync.sync_current")
+    monkeypatch.delenv("COMPMAN_XCSOARDIR")
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    ext = extension("compman", ovshell)
+
+    # WHEN
+    # XCSoar was never started, its directory does not exist yet
+    ext.start()
+    for _ in range(2):
+        await asyncio.sleep(0)
+
+    # THEN
+    # Shell boots fine, background sync is skipped
+    sync_current.assert_not_called()
+
+
 def test_launch_app(ovshell: OpenVarioShellStub, compman_app: CompmanShellApp) -> None:
     # WHEN
     compman_app.launch()
@@ -81,3 +147,43 @@ async def test_ovshell_exit_app(
 
     # THEN
     assert ovshell.screen.stub_top_activity() is None
+
+
+@pytest.mark.asyncio
+async def test_exit_app_during_background_sync(
+    ovshell: OpenVarioShellStub, compman_app: CompmanShellApp, mocker
+) -> None:
+    # GIVEN
+    mocker.patch("compman.ovshell.BACKGROUND_SYNC_DELAY", 0)
+    mocker.patch("compman.ovshell._CLIENT_USERS", 0)
+    release = asyncio.Event()
+
+    async def sync_current(background: bool) -> None:
+        await release.wait()
+
+    mocker.patch("compman.sync.sync_current", sync_current)
+    http_close = mocker.patch("compman.http.close")
+    soarscore_close = mocker.patch("compman.soarscore.close")
+    setup()
+    storage.save_competition(storage.StoredCompetition("test", "Test"), True)
+    ext = extension("compman", ovshell)
+    ext.start()
+    await asyncio.sleep(0)
+    compman_app.launch()
+    act = ovshell.screen.stub_top_activity()
+    assert act is not None
+    act.create()
+    await asyncio.sleep(0)
+
+    # WHEN
+    act.destroy()
+    await asyncio.sleep(0)
+
+    # THEN
+    # Clients are still used by the background sync
+    http_close.assert_not_called()
+    release.set()
+    for _ in range(3):
+        await asyncio.sleep(0)
+    http_close.assert_called_once()
+    soarscore_close.assert_called_once()
@@ -0,0 +1,113 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from compman.scheduler import (
+    DownloadScheduler,
+    Priority,
+    Progress,
+    ProgressTracker,
+    format_progress,
+)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_priority() -> None:
+    # GIVEN
+    scheduler = DownloadScheduler(max_per_host=1)
+    started: List[str] = []
+    blocker = asyncio.Event()
+
+    async def fetch(name: str, url: str, priority: Priority) -> None:
+        async with scheduler.slot(url, priority):
+            started.append(name)
+            await blocker.wait()
+
+    first = asyncio.create_task(fetch("first", "http://ss/a", Priority.AIRSPACE))
+    await asyncio.sleep(0)
+
+    # WHEN
+    tasks = [
+        asyncio.create_task(fetch("airspace", "http://ss/b", Priority.AIRSPACE)),
+        asyncio.create_task(fetch("waypoint", "http://ss/c", Priority.WAYPOINT)),
+        asyncio.create_task(fetch("task", "http://ss/d", Priority.TASK)),
+    ]
+    await asyncio.sleep(0)
+    assert started == ["first"]
+    blocker.set()
+    await asyncio.gather(first, *tasks)
+
+    # THEN
+    assert started == ["first", "task", "waypoint", "airspace"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_per_host_limit() -> None:
+    # GIVEN
+    scheduler = DownloadScheduler(max_per_host=2)
+    active = {"ss": 0, "other": 0}
+    peak = {"ss": 0, "other": 0}
+
+    async def fetch(host: str) -> None:
+        async with scheduler.slot(f"http://{host}/file", Priority.BACKGROUND):
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+            await asyncio.sleep(0)
+            active[host] -= 1
+
+    # WHEN
+    await asyncio.gather(*[fetch("ss") for _ in range(5)], fetch("other"))
+
+    # THEN
+    assert peak == {"ss": 2, "other": 1}
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancel_waiting() -> None:
+    # GIVEN
+    scheduler = DownloadScheduler(max_per_host=1)
+    blocker = asyncio.Event()
+    done: List[str] = []
+
+    async def fetch(name: str) -> None:
+        async with scheduler.slot("http://ss/file", Priority.BACKGROUND):
+            await blocker.wait()
+            done.append(name)
+
+    first = asyncio.create_task(fetch("first"))
+    cancelled = asyncio.create_task(fetch("cancelled"))
+    last = asyncio.create_task(fetch("last"))
+    await asyncio.sleep(0)
+
+    # WHEN
+    cancelled.cancel()
+    blocker.set()
+    await asyncio.gather(first, last)
+
+    # THEN
+    assert done == ["first", "last"]
+    assert cancelled.cancelled()
+
+
+def test_progress_tracker() -> None:
+    # GIVEN
+    reports: List[Progress] = []
+    tracker = ProgressTracker(reports.append, total=1000, received=200)
+    tracker._started -= 2.0
+
+    # WHEN
+    tracker.update(400)
+
+    # THEN
+    assert len(reports) == 1
+    progress = reports[0]
+    assert progress.received == 600
+    assert progress.percent == 60.0
+    assert progress.rate == pytest.approx(200.0, rel=0.01)
+    assert progress.eta == pytest.approx(2.0, rel=0.01)
+
+
+def test_format_progress() -> None:
+    assert format_progress(Progress(512, 1024, 2048.0)) == "50% 2.0KiB/s ETA 0s"
+    assert format_progress(Progress(512, None, 100.0)) == "100.0B/s"
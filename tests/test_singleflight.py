@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from compman.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_result() -> None:
+    # GIVEN
+    flight: SingleFlight[int] = SingleFlight()
+    calls = []
+
+    async def compute(value: int) -> int:
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+
+    # WHEN
+    results = await asyncio.gather(
+        flight.do("key", lambda: compute(1)),
+        flight.do("key", lambda: compute(2)),
+        flight.do("other", lambda: compute(3)),
+    )
+
+    # THEN
+    assert results == [1, 1, 3]
+    assert calls == [1, 3]
+    assert not flight.in_flight("key")
+
+
+@pytest.mark.asyncio
+async def test_shared_error() -> None:
+    # GIVEN
+    flight: SingleFlight[int] = SingleFlight()
+
+    async def fail() -> int:
+        await asyncio.sleep(0)
+        raise ValueError("Boom")
+
+    # WHEN
+    results = await asyncio.gather(
+        flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+    )
+
+    # THEN
+    assert [str(r) for r in results] == ["Boom", "Boom"]
+    assert not flight.in_flight("key")
+
+
+@pytest.mark.asyncio
+async def test_cancel_one_caller() -> None:
+    # GIVEN
+    flight: SingleFlight[str] = SingleFlight()
+    release = asyncio.Event()
+
+    async def compute() -> str:
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", compute))
+    second = asyncio.create_task(flight.do("key", compute))
+    await asyncio.sleep(0)
+
+    # WHEN
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    # THEN
+    assert await second == "done"
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_cancel_all_callers() -> None:
+    # GIVEN
+    flight: SingleFlight[str] = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def compute() -> str:
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "done"
+
+    caller = asyncio.create_task(flight.do("key", compute))
+    await started.wait()
+
+    # WHEN
+    caller.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+    # THEN
+    await asyncio.sleep(0)
+    assert not flight.in_flight("key")
+
+
+@pytest.mark.asyncio
+async def test_cancel_and_call_again() -> None:
+    # GIVEN
+    flight: SingleFlight[str] = SingleFlight()
+    calls = []
+
+    async def compute(value: str) -> str:
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+
+    first = asyncio.create_task(flight.do("key", lambda: compute("first")))
+    await asyncio.sleep(0)
+
+    # WHEN
+    # Caller is superseded by a new one in the same loop iteration
+    first.cancel()
+    second = asyncio.create_task(flight.do("key", lambda: compute("second")))
+
+    # THEN
+    # New caller does not join the cancelled call
+    assert await second == "second"
+    assert first.cancelled()
+    assert calls == ["first", "second"]
+    assert not flight.in_flight("key")
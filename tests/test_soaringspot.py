@@ -0,0 +1,136 @@
+import asyncio
+
+import mock
+import pytest
+from aiohttp import ClientConnectionError, web
+
+from compman import soaringspot
+
+DOWNLOADS_HTML = """
+<html><body>
+<ul class="contest-downloads">
+  <li><a href="/files/airspace.txt">airspace.txt</a></li>
+  <li><a href="https://cdn.local/waypoints.cup">waypoints.cup</a></li>
+  <li><a href="/files/rules.pdf">rules.pdf</a></li>
+</ul>
+</body></html>
+"""
+
+RESULTS_HTML = """
+<html><body>
+<table class="result-overview">
+  <thead><tr><th>Club</th><th>Standard</th></tr></thead>
+</table>
+</body></html>
+"""
+
+
+CONTEST_HTML = """
+<div class="contest">
+  <h3><a href="/en_gb/contest-{n}/">Contest {n}</a></h3>
+  <div class="info">Somewhere, <b>2020</b></div>
+</div>
+"""
+
+
+def _page(html: str, etag: str = '"v1"'):
+    async def handler(request: web.Request) -> web.Response:
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=html, content_type="text/html", headers={"ETag": etag})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_fetch_downloads(httpserver, storage_dir) -> None:
+    # GIVEN
+    httpserver.route("/test/downloads", _page(DOWNLOADS_HTML))
+
+    # WHEN
+    downloads = await soaringspot.fetch_downloads(httpserver.url("/test/"))
+
+    # THEN
+    assert [d.filename for d in downloads] == ["airspace.txt", "waypoints.cup"]
+    assert downloads[0].href == f"{soaringspot.SOARINGSPOT_URL}/files/airspace.txt"
+    assert downloads[0].kind == soaringspot.DownloadableFileType.AIRSPACE
+    assert downloads[1].href == "https://cdn.local/waypoints.cup"
+    assert downloads[1].kind == soaringspot.DownloadableFileType.WAYPOINT
+
+
+@pytest.mark.asyncio
+async def test_fetch_downloads_not_modified(httpserver, storage_dir, mocker) -> None:
+    # GIVEN
+    httpserver.route("/test/downloads", _page(DOWNLOADS_HTML))
+    first = await soaringspot.fetch_downloads(httpserver.url("/test"))
+    parse = mocker.patch("compman.soaringspot._parse_downloads")
+
+    # WHEN
+    second = await soaringspot.fetch_downloads(httpserver.url("/test"))
+
+    # THEN
+    # Page is not parsed again, cached result is used instead
+    assert second == first
+    parse.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fetch_classes(httpserver, storage_dir) -> None:
+    # GIVEN
+    httpserver.route("/test/results", _page(RESULTS_HTML))
+
+    # WHEN
+    classes = await soaringspot.fetch_classes(httpserver.url("/test"))
+
+    # THEN
+    assert classes == ["Club", "Standard"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_classes_error() -> None:
+    # WHEN
+    error = ClientConnectionError("Connection refused")
+    with mock.patch("compman.http.fetch_cached", side_effect=error):
+        with pytest.raises(soaringspot.SoaringSpotClientError):
+            await soaringspot.fetch_classes("http://soaringspot.local/test")
+
+
+@pytest.mark.asyncio
+async def test_iter_competitions(httpserver, storage_dir, monkeypatch) -> None:
+    # GIVEN
+    second_part = asyncio.Event()
+
+    async def handler(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"ETag": '"v1"'})
+        response.content_type = "text/html"
+        await response.prepare(request)
+        await response.write(b"<html><body>" + CONTEST_HTML.format(n=1).encode())
+        await second_part.wait()
+        await response.write(CONTEST_HTML.format(n=2).encode() + b"</body></html>")
+        await response.write_eof()
+        return response
+
+    httpserver.route("/", handler)
+    monkeypatch.setattr(soaringspot, "SOARINGSPOT_URL", httpserver.url(""))
+
+    # WHEN
+    batches = []
+    async for batch in soaringspot.iter_competitions():
+        batches.append(batch)
+        second_part.set()
+
+    # THEN
+    # First contest is available before the whole page is downloaded
+    assert [[c.id for c in batch] for batch in batches] == [
+        ["contest-1"],
+        ["contest-2"],
+    ]
+    assert batches[0][0].title == "Contest 1"
+    assert batches[0][0].description == "Somewhere, 2020"
+    assert batches[0][0].href == httpserver.url("/en_gb/contest-1/")
+
+    # Whole list is cached
+    cached = soaringspot.get_cached_competitions()
+    assert cached is not None
+    assert [c.id for c in cached] == ["contest-1", "contest-2"]
+    assert await soaringspot.fetch_competitions() == cached
@@ -49,15 +49,14 @@ async def test_fetch_classes() -> None:
 
 
 @pytest.mark.asyncio
-async def test_fetch_file() -> None:
+async def test_download_file(tmp_path) -> None:
     # GIVEN
     ssurl = "https://www.soaringspot.com/en_gb/wgc2018pl/"
     downloads = await soaringspot.fetch_downloads(ssurl)
     dl0 = downloads[0]
 
     # WHEN
-    fetched = await http.fetch_file(dl0.href)
-    content = fetched.read()
+    size = await http.download_file(dl0.href, str(tmp_path / dl0.filename))
 
     # THEN
-    assert len(content) == 138067
+    assert size == 138067
@@ -1,4 +1,7 @@
+import asyncio
 import os
+import threading
+from typing import Iterator, Optional
 
 import mock
 import pytest
@@ -9,22 +12,371 @@ HERE = os.path.dirname(__file__)
 SOARSCORE_DIR = os.path.join(HERE, "fixtures", "soarscore")
 
 
+@pytest.fixture
+def no_http2(monkeypatch):
+    monkeypatch.setattr("compman.soarscore._HTTP2_UNAVAILABLE", True)
+
+
+class StreamingResponseStub:
+    def __init__(self, content: bytes, tail: Optional[threading.Event] = None) -> None:
+        self.content = content
+        self.consumed = 0
+        # Last chunk is held back until this is set
+        self.tail = tail
+
+    def __enter__(self) -> "StreamingResponseStub":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        for pos in range(0, len(self.content), chunk_size):
+            if self.tail is not None and pos + chunk_size >= len(self.content):
+                self.tail.wait(timeout=5)
+            chunk = self.content[pos : pos + chunk_size]
+            self.consumed += len(chunk)
+            yield chunk
+
+
 @pytest.mark.asyncio
-async def test_soarscore_two_classes(monkeypatch) -> None:
+async def test_soarscore_two_classes(monkeypatch, no_http2) -> None:
     # GIVEN
-    with open(os.path.join(SOARSCORE_DIR, "two-classes.html"), "rb") as f:
-        html = f.read()
-    get_mock = mock.Mock(name="get")
-    resp = mock.Mock()
-    resp.content = html
-    get_mock.return_value = resp
-    monkeypatch.setattr("compman.soarscore.requests.get", get_mock)
+    html = _read_fixture("two-classes.html")
+    tail = threading.Event()
+    resp = StreamingResponseStub(html, tail)
+    get_mock = mock.Mock(name="get", return_value=resp)
+    monkeypatch.setattr("compman.soarscore.requests.Session.get", get_mock)
 
     # WHEN
     tasks = await soarscore.fetch_latest_tasks("test")
 
     # THEN
+    # Tasks are returned before the page is read to the end
     assert len(tasks) == 2
+    assert resp.consumed < len(html)
+    # Rest of the page is drained, so the connection can be reused
+    tail.set()
+    await asyncio.gather(*soarscore._BACKGROUND)
+    assert resp.consumed == len(html)
+
+
+@pytest.mark.asyncio
+async def test_soarscore_drain_limited(monkeypatch, no_http2) -> None:
+    # GIVEN
+    html = _read_fixture("two-classes.html") + b"<!-- padding -->" * 10000
+    resp = StreamingResponseStub(html)
+    get_mock = mock.Mock(name="get", return_value=resp)
+    monkeypatch.setattr("compman.soarscore.requests.Session.get", get_mock)
+    monkeypatch.setattr("compman.soarscore.MAX_DRAIN_SIZE", 16 * 1024)
+
+    # WHEN
+    tasks = await soarscore.fetch_latest_tasks("test")
+    await asyncio.gather(*soarscore._BACKGROUND)
+
+    # THEN
+    assert len(tasks) == 2
+    # Too big rest of the page is not read
+    assert resp.consumed < len(html)
+
+
+@pytest.mark.asyncio
+async def test_fetch_latest_tasks_coalesced(monkeypatch, no_http2) -> None:
+    # GIVEN
+    html = _read_fixture("two-classes.html")
+    get_mock = mock.Mock(
+        name="get", side_effect=lambda *a, **kw: StreamingResponseStub(html)
+    )
+    monkeypatch.setattr("compman.soarscore.requests.Session.get", get_mock)
+
+    # WHEN
+    first, second = await asyncio.gather(
+        soarscore.fetch_latest_tasks("test"), soarscore.fetch_latest_tasks("test")
+    )
+    third = await soarscore.fetch_latest_tasks("test")
+
+    # THEN
+    assert len(first) == 2
+    assert first == second == third
+    # Concurrent calls share the request, later calls make their own
+    assert get_mock.call_count == 2
+
+
+def test_task_link_parser() -> None:
+    # GIVEN
+    html = _read_fixture("two-classes.html")
+    parser = soarscore.TaskLinkParser()
+
+    # WHEN
+    found = []
+    for pos in range(0, len(html), 256):
+        found.append(parser.feed(html[pos : pos + 256]))
+        if parser.done:
+            break
+
+    # THEN
+    assert parser.done
+    assert pos + 256 < len(html)
+    tasks = [ti for chunk in found for ti in chunk]
+    assert [(ti.comp_class, ti.day_no, ti.task_no) for ti in tasks] == [
+        ("Club", 6, 5),
+        ("Open", 6, 5),
+    ]
+    # Tasks are returned as soon as they are parsed, not at the end of the page
+    assert found[-1] == []
+
+
+def test_task_link_parser_no_tasks() -> None:
+    # GIVEN
+    html = _read_fixture("no-tasks.html")
+    parser = soarscore.TaskLinkParser()
+
+    # WHEN
+    tasks = parser.feed(html) + parser.close()
+
+    # THEN
+    assert tasks == []
+    assert parser.done
+
+
+@pytest.mark.asyncio
+async def test_session_reused() -> None:
+    # GIVEN
+    session = soarscore.get_session()
+    executor = soarscore.get_executor()
+
+    # THEN
+    assert soarscore.get_session() is session
+    assert soarscore.get_executor() is executor
+    assert executor._max_workers == soarscore.MAX_WORKERS
+
+    # WHEN
+    await soarscore.close()
+
+    # THEN
+    # Fresh ones are created on demand after closing
+    assert soarscore.get_session() is not session
+    assert soarscore.get_executor() is not executor
+    await soarscore.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_url_in_dedicated_thread(monkeypatch, no_http2) -> None:
+    # GIVEN
+    threads = []
+
+    def get(url, timeout):
+        threads.append(threading.current_thread().name)
+        return mock.Mock(content=b"task")
+
+    monkeypatch.setattr(soarscore.get_session(), "get", get)
+
+    # WHEN
+    content = await soarscore.fetch_url("https://soarscore.local/task.tsk")
+
+    # THEN
+    assert content == b"task"
+    assert threads[0].startswith("soarscore")
+    await soarscore.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_url_http2(monkeypatch) -> None:
+    # GIVEN
+    httpx = pytest.importorskip("httpx")
+    requested = []
+
+    def handler(request):
+        requested.append(request.url)
+        return httpx.Response(200, content=b"task")
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(soarscore, "get_async_client", lambda: client)
+    get_executor = mock.Mock(side_effect=AssertionError("Thread is used"))
+    monkeypatch.setattr(soarscore, "get_executor", get_executor)
+
+    # WHEN
+    content = await soarscore.fetch_url("https://soarscore.local/task.tsk")
+
+    # THEN
+    # Request is made right in the event loop
+    assert content == b"task"
+    assert requested == ["https://soarscore.local/task.tsk"]
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fetch_url_http2_unavailable(monkeypatch) -> None:
+    # GIVEN
+    # httpx is installed, but without HTTP/2 support
+    httpx = mock.Mock()
+    httpx.AsyncClient.side_effect = ImportError("h2 is not installed")
+    monkeypatch.setattr(soarscore, "httpx", httpx)
+    monkeypatch.setattr(soarscore, "_HTTP2_UNAVAILABLE", False)
+    monkeypatch.setattr(soarscore, "_ASYNC_CLIENT", None)
+    monkeypatch.setattr(
+        soarscore.get_session(), "get", lambda url, timeout: mock.Mock(content=b"t")
+    )
+
+    # WHEN
+    content = await soarscore.fetch_url("https://soarscore.local/task.tsk")
+
+    # THEN
+    # Falls back to requests running in a thread
+    assert content == b"t"
+    assert soarscore.get_async_client() is None
+    await soarscore.close()
+
+
+class HTTPError(Exception):
+    pass
+
+
+class TransportError(HTTPError):
+    pass
+
+
+@pytest.fixture
+def fake_httpx(monkeypatch):
+    # httpx with HTTP/2 client, that does not need to be installed
+    client = mock.Mock(name="client")
+    client.aclose = mock.AsyncMock()
+    httpx = mock.Mock(HTTPError=HTTPError, TransportError=TransportError)
+    httpx.AsyncClient.return_value = client
+    monkeypatch.setattr(soarscore, "httpx", httpx)
+    monkeypatch.setattr(soarscore, "_HTTP2_UNAVAILABLE", False)
+    monkeypatch.setattr(soarscore, "_HTTP2_DISABLED_UNTIL", 0.0)
+    monkeypatch.setattr(soarscore, "_ASYNC_CLIENT", None)
+    return httpx
+
+
+@pytest.fixture
+def broken_http2(fake_httpx):
+    # HTTP/2 client fails on every request, like on failed ALPN negotiation
+    client = fake_httpx.AsyncClient.return_value
+    client.get.side_effect = TransportError("ALPN negotiation failed")
+    client.stream.side_effect = TransportError("ALPN negotiation failed")
+    return client
+
+
+@pytest.mark.asyncio
+async def test_fetch_url_http2_follows_redirects(fake_httpx) -> None:
+    # GIVEN
+    client = fake_httpx.AsyncClient.return_value
+    client.get = mock.AsyncMock(return_value=mock.Mock(content=b"task"))
+
+    # WHEN
+    content = await soarscore.fetch_url("https://soarscore.local/task.tsk")
+
+    # THEN
+    assert content == b"task"
+    fake_httpx.AsyncClient.assert_called_once_with(
+        http2=True, timeout=soarscore.REQUEST_TIMEOUT, follow_redirects=True
+    )
+    await soarscore.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_url_http2_bad_status(fake_httpx) -> None:
+    # GIVEN
+    resp = mock.Mock(content=b"Not found")
+    resp.raise_for_status.side_effect = HTTPError("404 Not Found")
+    client = fake_httpx.AsyncClient.return_value
+    client.get = mock.AsyncMock(return_value=resp)
+
+    # WHEN
+    with pytest.raises(soarscore.SoarScoreClientError) as e:
+        await soarscore.fetch_url("https://soarscore.local/task.tsk")
+
+    # THEN
+    # Error page is not returned as the task
+    assert "404 Not Found" in str(e.value)
+    await soarscore.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_url_http2_decoding_error(fake_httpx) -> None:
+    # GIVEN
+    client = fake_httpx.AsyncClient.return_value
+    client.get = mock.AsyncMock(side_effect=HTTPError("Malformed gzip"))
+
+    # WHEN
+    with pytest.raises(soarscore.SoarScoreClientError):
+        await soarscore.fetch_url("https://soarscore.local/task.tsk")
+    await soarscore.close()
+
+
+@pytest.mark.asyncio
+async def test_async_client_of_other_loop_closed(fake_httpx, monkeypatch) -> None:
+    # GIVEN
+    stale = mock.Mock(name="stale")
+    stale.aclose = mock.AsyncMock()
+    monkeypatch.setattr(soarscore, "_ASYNC_CLIENT", stale)
+    monkeypatch.setattr(soarscore, "_ASYNC_CLIENT_LOOP", mock.Mock())
+
+    # WHEN
+    client = soarscore.get_async_client()
+    await asyncio.sleep(0)
+
+    # THEN
+    assert client is fake_httpx.AsyncClient.return_value
+    stale.aclose.assert_awaited_once()
+    await soarscore.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_url_http2_transport_error(monkeypatch, broken_http2) -> None:
+    # GIVEN
+    get_mock = mock.Mock(name="get", return_value=mock.Mock(content=b"t"))
+    monkeypatch.setattr(soarscore.get_session(), "get", get_mock)
+
+    # WHEN
+    content = await soarscore.fetch_url("https://soarscore.local/task.tsk")
+    content2 = await soarscore.fetch_url("https://soarscore.local/task.tsk")
+
+    # THEN
+    # Falls back to requests in the same call, HTTP/2 is not retried
+    assert content == content2 == b"t"
+    assert broken_http2.get.call_count == 1
+    assert get_mock.call_count == 2
+    assert soarscore.get_async_client() is None
+    await soarscore.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_url_http2_retried_later(monkeypatch, broken_http2) -> None:
+    # GIVEN
+    monkeypatch.setattr(
+        soarscore.get_session(), "get", lambda url, timeout: mock.Mock(content=b"t")
+    )
+    await soarscore.fetch_url("https://soarscore.local/task.tsk")
+
+    # WHEN
+    now = soarscore.time.monotonic() + soarscore.HTTP2_RETRY_AFTER
+    monkeypatch.setattr(soarscore.time, "monotonic", lambda: now)
+
+    # THEN
+    assert soarscore.get_async_client() is broken_http2
+    await soarscore.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_latest_tasks_http2_transport_error(
+    monkeypatch, broken_http2
+) -> None:
+    # GIVEN
+    resp = StreamingResponseStub(_read_fixture("two-classes.html"))
+    monkeypatch.setattr(
+        "compman.soarscore.requests.Session.get", mock.Mock(return_value=resp)
+    )
+
+    # WHEN
+    tasks = await soarscore.fetch_latest_tasks("test")
+
+    # THEN
+    assert len(tasks) == 2
+    assert broken_http2.stream.call_count == 1
+    await soarscore.close()
 
 
 def test_parse_soarscore_description() -> None:
@@ -41,3 +393,8 @@ def test_parse_soarscore_description() -> None:
     assert taskinfo.day_no == 6
     assert taskinfo.task_no == 5
     assert taskinfo.timestamp == "01-07-2020 21:35:04"
+
+
+def _read_fixture(name: str) -> bytes:
+    with open(os.path.join(SOARSCORE_DIR, name), "rb") as f:
+        return f.read()
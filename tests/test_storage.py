@@ -165,3 +165,150 @@ def test_storedfile_format_size() -> None:
 def test_get_full_file_path(storage_dir) -> None:
     path = storage.get_full_file_path("test", "airspace.txt")
     assert path == os.path.join(storage_dir, "test", "airspace.txt")
+
+
+def test_store_file_dedupe(storage_dir) -> None:
+    # GIVEN
+    storage.save_competition(storage.StoredCompetition(id="first", title="First"))
+    storage.save_competition(storage.StoredCompetition(id="second", title="Second"))
+
+    # WHEN
+    first = storage.store_file("first", "airspace.txt", io.BytesIO(b"airspace"))
+    second = storage.store_file("second", "national.txt", io.BytesIO(b"airspace"))
+
+    # THEN
+    # Identical content is stored only once
+    assert first.sha256 == second.sha256
+    path1 = storage.get_full_file_path("first", "airspace.txt")
+    path2 = storage.get_full_file_path("second", "national.txt")
+    assert path1 == path2
+    with open(path1, "rb") as f:
+        assert f.read() == b"airspace"
+
+    files = storage.get_airspace_files("second")
+    assert [(f.name, f.size) for f in files] == [("national.txt", 8)]
+
+
+def test_import_file_link_url(storage_dir) -> None:
+    # GIVEN
+    storage.save_competition(storage.StoredCompetition(id="first", title="First"))
+    storage.save_competition(storage.StoredCompetition(id="second", title="Second"))
+    url = "http://soaringspot.local/airspace.txt"
+    dlpath = storage.get_download_path(url)
+    with open(dlpath, "wb") as f:
+        f.write(b"airspace")
+    storage.import_file("first", "airspace.txt", dlpath, url)
+
+    # WHEN
+    linked = storage.link_url("second", "airspace.txt", url)
+
+    # THEN
+    assert linked is not None
+    assert linked.size == 8
+    assert [f.name for f in storage.get_airspace_files("second")] == ["airspace.txt"]
+    assert storage.link_url("second", "other.txt", "http://other") is None
+
+
+def test_delete_competition_collects_garbage(storage_dir) -> None:
+    # GIVEN
+    storage.save_competition(storage.StoredCompetition(id="first", title="First"))
+    storage.save_competition(storage.StoredCompetition(id="second", title="Second"))
+    storage.store_file("first", "shared.txt", io.BytesIO(b"shared"))
+    storage.store_file("second", "shared.txt", io.BytesIO(b"shared"))
+    storage.store_file("second", "own.txt", io.BytesIO(b"own"))
+    own_path = storage.get_full_file_path("second", "own.txt")
+    shared_path = storage.get_full_file_path("second", "shared.txt")
+
+    # WHEN
+    storage.delete_competition("second")
+
+    # THEN
+    assert not os.path.exists(own_path)
+    assert os.path.exists(shared_path)
+
+
+def test_derived_file_collected_with_sources(storage_dir) -> None:
+    # GIVEN
+    storage.save_competition(storage.StoredCompetition(id="first", title="First"))
+    storage.store_file("first", "airspace.txt", io.BytesIO(b"airspace"))
+    source = storage.get_file_digest("first", "airspace.txt")
+    assert source is not None
+    tmpname = storage.get_temp_path("trimmed")
+    with open(tmpname, "wb") as f:
+        f.write(b"trimmed")
+    derived = storage.store_derived_file("trimmed", [source], tmpname)
+    assert storage.find_derived_file("trimmed", [source]) == derived
+    assert storage.find_derived_file("other", [source]) is None
+
+    # WHEN
+    storage.delete_competition("first")
+
+    # THEN
+    assert storage.find_derived_file("trimmed", [source]) is None
+    assert derived.sha256 is not None
+    assert not os.path.exists(storage.get_object_path(derived.sha256))
+
+
+def test_get_files_legacy(storage_dir) -> None:
+    # GIVEN
+    storage.save_competition(storage.StoredCompetition(id="first", title="First"))
+    legacy_path = os.path.join(storage_dir, "first", "legacy.txt")
+    with open(legacy_path, "wb") as f:
+        f.write(b"legacy")
+    storage.store_file("first", "new.txt", io.BytesIO(b"new"))
+
+    # WHEN
+    files = storage.get_airspace_files("first")
+
+    # THEN
+    assert sorted(f.name for f in files) == ["legacy.txt", "new.txt"]
+    assert storage.get_full_file_path("first", "legacy.txt") == legacy_path
+
+
+def test_store_task(storage_dir) -> None:
+    # GIVEN
+    storage.save_competition(storage.StoredCompetition(id="first", title="First"))
+    storage.store_task("first", "Club", 1, 1, "day1", "Club Task", b"<Task 1/>")
+    storage.store_task("first", "Club", 2, 1, "day2", "Club Task", b"<Task 2/>")
+    storage.store_task("first", "Std", 2, 1, "day2", "Std Task", b"<Task 2/>")
+
+    # WHEN
+    storage.init(storage_dir)
+    found = storage.find_task("first", "Club", 1, 1, "day1")
+
+    # THEN
+    assert found is not None
+    assert storage.read_task(found) == b"<Task 1/>"
+    assert storage.find_task("first", "Club", 1, 1, "other") is None
+    club = storage.list_tasks("first", "Club")
+    assert [(t.day_no, t.task_no) for t in club] == [(2, 1), (1, 1)]
+    assert len(storage.list_tasks("first")) == 3
+
+
+def test_delete_competition_removes_tasks(storage_dir) -> None:
+    # GIVEN
+    storage.save_competition(storage.StoredCompetition(id="first", title="First"))
+    storage.save_competition(storage.StoredCompetition(id="second", title="Second"))
+    storage.store_task("first", "Club", 1, 1, "day1", "Club Task", b"<Shared/>")
+    storage.store_task("second", "Club", 1, 1, "day1", "Club Task", b"<Shared/>")
+    own = storage.store_task("second", "Club", 2, 1, "day2", "Club Task", b"<Own/>")
+    own_path = storage.get_object_path(own.sha256)
+
+    # WHEN
+    storage.delete_competition("second")
+
+    # THEN
+    assert not os.path.exists(own_path)
+    assert storage.list_tasks("second") == []
+    shared = storage.find_task("first", "Club", 1, 1, "day1")
+    assert shared is not None
+    assert storage.read_task(shared) == b"<Shared/>"
+
+
+def test_stored_objects_read_only(storage_dir) -> None:
+    # WHEN
+    storage.store_file("first", "airspace.txt", io.BytesIO(b"airspace"))
+
+    # THEN
+    path = storage.get_full_file_path("first", "airspace.txt")
+    assert os.stat(path).st_mode & 0o777 == 0o444
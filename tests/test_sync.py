@@ -0,0 +1,256 @@
+import os
+import subprocess
+import sys
+from typing import Optional
+
+import pytest
+
+from compman import storage, sync, xcsoar
+from compman.soaringspot import (
+    DownloadableFileType,
+    SoaringSpotClientError,
+    SoaringSpotDownloadableFile,
+)
+from compman.soarscore import SoarScoreTaskInfo
+
+AIRSPACE = b"AC D\nDP 46:00:00 N 014:00:00 E\nDP 46:10:00 N 014:00:00 E\nDP 46:10:00 N 014:10:00 E\n"
+
+
+@pytest.mark.asyncio
+async def test_sync_all(storage_dir, xcsoar_dir, soaringspot, soarscore) -> None:
+    # GIVEN
+    current = _setup_comp("current", set_current=True)
+    current.selected_class = "Club"
+    current.add_profile("openvario.prf")
+    current.airspace = "airspace.txt"
+    storage.save_competition(current)
+    other = _setup_comp("other")
+    _setup_comp("local", soaringspot_url=None)
+
+    soaringspot.classes = ["Club", "Standard"]
+    soaringspot.files = [
+        SoaringSpotDownloadableFile(
+            "airspace.txt",
+            href="https://soaringspot.local/airspace.txt",
+            kind=DownloadableFileType.AIRSPACE,
+        )
+    ]
+    soaringspot.file_contents = AIRSPACE
+    soarscore.tasks = [
+        SoarScoreTaskInfo(
+            comp_class="Club",
+            title="Club Task",
+            day_no=1,
+            task_no=1,
+            timestamp="today",
+            task_url="http://soarscore.local/club.tsk",
+        )
+    ]
+    soarscore.task_content = b"<Task />"
+
+    # WHEN
+    results = await sync.sync_all(install_tasks=True)
+
+    # THEN
+    assert [r.competition.id for r in results] == ["current", "other"]
+    assert all(not r.errors for r in results)
+    assert results[0].new_files == ["airspace.txt"]
+    # Shared file is downloaded only once
+    assert soaringspot.downloaded == ["https://soaringspot.local/airspace.txt"]
+    assert [f.name for f in storage.get_airspace_files(other.id)] == ["airspace.txt"]
+
+    loaded = storage.load_competition(other.id)
+    assert loaded is not None
+    assert loaded.classes == ["Club", "Standard"]
+
+    # Task is installed and profile updated for current competition only
+    assert results[0].task == os.path.join(xcsoar_dir, "Default.tsk")
+    assert results[1].task is None
+    with open(results[0].task, "rb") as f:
+        assert f.read() == b"<Task />"
+    profile = xcsoar.get_xcsoar_profile("openvario.prf")
+    assert 'AirspaceFile="%LOCAL_PATH%\\compman-airspace.txt"\n' in profile.lines
+
+
+@pytest.mark.asyncio
+async def test_sync_task_not_installed(
+    storage_dir, xcsoar_dir, soaringspot, soarscore
+) -> None:
+    # GIVEN
+    comp = _setup_comp("test", set_current=True)
+    comp.selected_class = "Club"
+    storage.save_competition(comp)
+    soarscore.tasks = [
+        SoarScoreTaskInfo(
+            comp_class="Club",
+            title="Club Task",
+            day_no=1,
+            task_no=1,
+            timestamp="today",
+            task_url="http://soarscore.local/club.tsk",
+        )
+    ]
+    soarscore.task_content = b"<Task />"
+
+    # WHEN
+    result = await sync.sync_current()
+
+    # THEN
+    # Task is kept in the archive, but pilot's task is not replaced
+    assert result is not None
+    assert result.task is None
+    assert [t.title for t in storage.list_tasks("test")] == ["Club Task"]
+    assert not os.path.exists(os.path.join(xcsoar_dir, "Default.tsk"))
+    assert result.format() == "Test test: task downloaded: Club Task day 1"
+
+    # WHEN
+    comp.autoinstall_tasks = True
+    result = await sync.sync_competition(comp, current=True)
+
+    # THEN
+    assert result.task == os.path.join(xcsoar_dir, "Default.tsk")
+
+
+@pytest.mark.asyncio
+async def test_sync_errors(storage_dir, xcsoar_dir, soaringspot, soarscore) -> None:
+    # GIVEN
+    _setup_comp("test")
+    soaringspot.classes = ["Club"]
+    soaringspot.fetch_downloads_exc = SoaringSpotClientError("No network")
+
+    # WHEN
+    results = await sync.sync_all()
+
+    # THEN
+    assert results[0].errors == ["Cannot fetch file list: No network"]
+    assert results[0].format() == (
+        "Test test: error: Cannot fetch file list: No network"
+    )
+    # Other information is still refreshed
+    loaded = storage.load_competition("test")
+    assert loaded is not None
+    assert loaded.classes == ["Club"]
+
+
+@pytest.mark.asyncio
+async def test_sync_storage_error(
+    storage_dir, xcsoar_dir, soaringspot, soarscore, mocker
+) -> None:
+    # GIVEN
+    _setup_comp("first")
+    _setup_comp("second")
+    soaringspot.files = [
+        SoaringSpotDownloadableFile(
+            "airspace.txt",
+            href="https://soaringspot.local/airspace.txt",
+            kind=DownloadableFileType.AIRSPACE,
+        )
+    ]
+    soaringspot.file_contents = AIRSPACE
+    mocker.patch(
+        "compman.storage.import_file",
+        side_effect=OSError(28, "No space left on device"),
+    )
+
+    # WHEN
+    results = await sync.sync_all()
+
+    # THEN
+    # Error is reported for every competition, none is aborted
+    assert [r.competition.id for r in results] == ["first", "second"]
+    for result in results:
+        assert result.errors == [
+            "Cannot store airspace.txt: [Errno 28] No space left on device"
+        ]
+
+
+@pytest.mark.asyncio
+async def test_sync_current(storage_dir, xcsoar_dir, soaringspot, soarscore) -> None:
+    # GIVEN
+    _setup_comp("test", set_current=True)
+    _setup_comp("other")
+
+    # WHEN
+    result = await sync.sync_current()
+
+    # THEN
+    assert result is not None
+    assert result.competition.id == "test"
+    current = storage.load_competition("test")
+    other = storage.load_competition("other")
+    assert current is not None and other is not None
+    assert sync.is_recently_synced(current)
+    assert not sync.is_recently_synced(other)
+    assert not sync.is_recently_synced(current, max_age=0)
+
+
+@pytest.mark.asyncio
+async def test_sync_current_none(storage_dir, soaringspot, soarscore) -> None:
+    assert await sync.sync_current() is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_task_archived(storage_dir, soarscore) -> None:
+    # GIVEN
+    _setup_comp("test")
+    taskinfo = SoarScoreTaskInfo(
+        comp_class="Club",
+        title="Club Task",
+        day_no=1,
+        task_no=1,
+        timestamp="today",
+        task_url="http://soarscore.local/club.tsk",
+    )
+    soarscore.task_content = b"<Task />"
+    first = await sync.fetch_task("test", taskinfo)
+
+    # WHEN
+    second = await sync.fetch_task("test", taskinfo)
+
+    # THEN
+    assert soarscore.fetched == ["http://soarscore.local/club.tsk"]
+    assert second == first
+    assert storage.read_task(second) == b"<Task />"
+
+
+def test_run(storage_dir, xcsoar_dir, soaringspot, soarscore, mocker, capsys) -> None:
+    # GIVEN
+    mocker.patch("compman.sync.setup_logging")
+    _setup_comp("test")
+
+    # WHEN
+    code = sync.run(["--datadir", str(storage_dir), "--xcsoardir", xcsoar_dir])
+
+    # THEN
+    assert code == 0
+    assert capsys.readouterr().out == "Test test: up to date\n"
+
+
+@pytest.mark.parametrize("parallel", ["0", "-1", "many"])
+def test_run_invalid_parallel(parallel: str, capsys) -> None:
+    # WHEN
+    with pytest.raises(SystemExit) as e:
+        sync.run(["--parallel", parallel])
+
+    # THEN
+    assert e.value.code == 2
+    assert "must be a positive number" in capsys.readouterr().err
+
+
+def test_sync_without_urwid() -> None:
+    # Headless sync is used in boot scripts and should not load the UI
+    code = "import sys, compman.cli, compman.sync; print('urwid' in sys.modules)"
+    out = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert out.strip() == "False"
+
+
+def _setup_comp(
+    cid: str,
+    set_current: bool = False,
+    soaringspot_url: Optional[str] = "https://soaringspot.local/comp",
+) -> storage.StoredCompetition:
+    comp = storage.StoredCompetition(
+        id=cid, title=f"Test {cid}", soaringspot_url=soaringspot_url
+    )
+    storage.save_competition(comp, set_current=set_current)
+    return comp
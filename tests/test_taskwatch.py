@@ -0,0 +1,60 @@
+import time
+from typing import List
+
+import pytest
+
+from compman import taskwatch
+from compman.soarscore import SoarScoreClientError, SoarScoreTaskInfo
+
+
+def _task(timestamp: str) -> SoarScoreTaskInfo:
+    return SoarScoreTaskInfo(
+        comp_class="Club",
+        title="Club Task",
+        day_no=1,
+        task_no=1,
+        timestamp=timestamp,
+        task_url="http://soarscore.local/club.tsk",
+    )
+
+
+@pytest.mark.asyncio
+async def test_poll_detects_change(soarscore) -> None:
+    # GIVEN
+    changes: List[List[SoarScoreTaskInfo]] = []
+    watcher = taskwatch.TaskWatcher("test", changes.append)
+    watcher.reset([_task("morning")])
+
+    # WHEN
+    soarscore.tasks = [_task("morning")]
+    unchanged = await watcher.poll()
+    soarscore.tasks = [_task("noon")]
+    changed = await watcher.poll()
+
+    # THEN
+    assert not unchanged
+    assert changed
+    assert changes == [[_task("noon")]]
+    assert watcher.misses == 0
+
+
+@pytest.mark.asyncio
+async def test_poll_backoff(soarscore) -> None:
+    # GIVEN
+    watcher = taskwatch.TaskWatcher("test", lambda tasks: None)
+    watcher.reset([])
+    briefing = time.mktime((2021, 7, 1, 9, 0, 0, 0, 0, -1))
+    evening = time.mktime((2021, 7, 1, 20, 0, 0, 0, 0, -1))
+    assert watcher.next_interval(briefing) == taskwatch.FAST_INTERVAL
+    assert watcher.next_interval(evening) == taskwatch.SLOW_INTERVAL
+
+    # WHEN
+    await watcher.poll()
+    soarscore.fetch_latest_tasks_exc = SoarScoreClientError("No network")
+    for _ in range(5):
+        await watcher.poll()
+
+    # THEN
+    assert watcher.misses == 6
+    max_backoff = 2**taskwatch.MAX_BACKOFF_STEPS
+    assert watcher.next_interval(briefing) == taskwatch.FAST_INTERVAL * max_backoff
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from compman import cup, tsk
+
+HERE = os.path.dirname(__file__)
+SAMPLE = os.path.join(HERE, "fixtures", "soarscore", "task.tsk")
+
+
+def test_parse() -> None:
+    # GIVEN
+    with open(SAMPLE, "rb") as f:
+        content = f.read()
+
+    # WHEN
+    summary = tsk.parse(content)
+
+    # THEN
+    assert summary.type == "AAT"
+    assert summary.min_time == 10800
+    assert [(tp.type, tp.name) for tp in summary.points] == [
+        ("Start", "Lesce"),
+        ("Area", "Ptuj"),
+        ("Area", "Bovec"),
+        ("Finish", "Lesce"),
+    ]
+    assert summary.points[0].zone == tsk.ObservationZone("Line", length=10000)
+    assert summary.points[1].zone == tsk.ObservationZone("Cylinder", radius=20000)
+    assert summary.turnpoints == 2
+    assert summary.distance == pytest.approx(353.6, abs=0.1)
+    assert summary.format() == (
+        "Assigned area task, min. time 3:00, 2 turnpoints, 353.6 km"
+    )
+    assert summary.format_route() == "Lesce - Ptuj - Bovec - Lesce"
+
+
+@pytest.mark.parametrize(
+    "content, error",
+    [
+        (b"", "not a task file"),
+        (b"<html><body>Not found</body></html>", "unexpected <html>"),
+        (b'<Task type="RT"></Task>', "less than two points"),
+        (b'<Task><Point type="Start"><Waypoint/></Point></Task>', "no location"),
+    ],
+)
+def test_parse_invalid(content: bytes, error: str) -> None:
+    with pytest.raises(tsk.TaskError, match=error):
+        tsk.parse(content)
+
+
+def test_leg_distances() -> None:
+    # GIVEN
+    lats = [46.0, 46.5, 45.2, 46.0]
+    lons = [14.0, 15.1, 13.7, 14.0]
+
+    # WHEN
+    legs = tsk.leg_distances(lats, lons)
+
+    # THEN
+    # Same as computing every leg separately
+    assert legs == [
+        pytest.approx(cup.distance_km(lats[i], lons[i], lats[i + 1], lons[i + 1]))
+        for i in range(3)
+    ]
+    assert tsk.leg_distances([46.0], [14.0]) == []
+
+
+def test_summarize_file_cached(mocker) -> None:
+    # GIVEN
+    parse = mocker.spy(tsk, "parse")
+
+    # WHEN
+    first = tsk.summarize_file(SAMPLE, "digest")
+    second = tsk.summarize_file(SAMPLE, "digest")
+
+    # THEN
+    assert first is second
+    assert parse.call_count == 1
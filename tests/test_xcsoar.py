@@ -0,0 +1,147 @@
+import os
+
+from compman import xcsoar
+
+
+def _write_profile(xcsoar_dir: str, content: str) -> str:
+    fname = os.path.join(xcsoar_dir, "test.prf")
+    with open(fname, "w") as f:
+        f.write(content)
+    return fname
+
+
+def test_profile_set_options(xcsoar_dir) -> None:
+    # GIVEN
+    fname = _write_profile(
+        xcsoar_dir,
+        '# Comment without value\nWPFile="old.cup"\nPilotName="Test"\n'
+        'WPFile="older.cup"\nSpeedUnit="1"',
+    )
+    profile = xcsoar.get_xcsoar_profile("test.prf")
+
+    # WHEN
+    profile.set_options({"WPFile": "new.cup", "AirspaceFile": "air.txt"})
+    saved = profile.save()
+
+    # THEN
+    assert saved
+    with open(fname) as f:
+        assert f.read() == (
+            '# Comment without value\nWPFile="old.cup"\nPilotName="Test"\n'
+            'WPFile="new.cup"\nSpeedUnit="1"\nAirspaceFile="air.txt"\n'
+        )
+    assert profile.get_option("WPFile") == "new.cup"
+    assert profile.get_option("PilotName") == "Test"
+    assert profile.get_option("Missing") is None
+
+
+def test_profile_save_unmodified(xcsoar_dir) -> None:
+    # GIVEN
+    fname = _write_profile(xcsoar_dir, 'WPFile="same.cup"\n')
+    os.utime(fname, (0, 0))
+    profile = xcsoar.get_xcsoar_profile("test.prf")
+
+    # WHEN
+    profile.set_options({"WPFile": "same.cup"})
+    saved = profile.save()
+
+    # THEN
+    assert not saved
+    assert os.stat(fname).st_mtime == 0
+
+
+def test_install_default_task(xcsoar_dir) -> None:
+    # WHEN
+    taskfname = xcsoar.install_default_task(b"<Task />")
+
+    # THEN
+    with open(taskfname, "rb") as f:
+        assert f.read() == b"<Task />"
+    assert sorted(os.listdir(xcsoar_dir)) == ["Default.tsk", "openvario.prf"]
+
+
+def test_install_file_unchanged(storage_dir, xcsoar_dir) -> None:
+    # GIVEN
+    src = os.path.join(storage_dir, "airspace.txt")
+    with open(src, "w") as f:
+        f.write("AC D\n")
+
+    # WHEN
+    installed = xcsoar.install_file(src, xcsoar.AIRSPACE_FILE)
+    again = xcsoar.install_file(src, xcsoar.AIRSPACE_FILE)
+
+    # THEN
+    assert installed is not None and installed.backup is None
+    assert again is None
+    dest = os.path.join(xcsoar_dir, xcsoar.AIRSPACE_FILE)
+    assert not os.path.samefile(src, dest)
+
+
+def test_install_file_edited_in_place(storage_dir, xcsoar_dir) -> None:
+    # GIVEN
+    src = os.path.join(storage_dir, "airspace.txt")
+    with open(src, "w") as f:
+        f.write("AC D\n")
+    xcsoar.install_file(src, xcsoar.AIRSPACE_FILE)
+    dest = os.path.join(xcsoar_dir, xcsoar.AIRSPACE_FILE)
+
+    # WHEN
+    with open(dest, "a") as f:
+        f.write("AC EDITED\n")
+    installed = xcsoar.install_file(src, xcsoar.AIRSPACE_FILE)
+
+    # THEN
+    # Source is intact and installed again
+    assert installed is not None
+    with open(src) as f:
+        assert f.read() == "AC D\n"
+    with open(dest) as f:
+        assert f.read() == "AC D\n"
+
+
+def test_install_file_replaces_hardlink(storage_dir, xcsoar_dir) -> None:
+    # GIVEN
+    # Installed by older version, hard linked to the stored file
+    src = os.path.join(storage_dir, "airspace.txt")
+    with open(src, "w") as f:
+        f.write("AC D\n")
+    xcsoar.install_file(src, xcsoar.AIRSPACE_FILE)
+    dest = os.path.join(xcsoar_dir, xcsoar.AIRSPACE_FILE)
+    os.unlink(dest)
+    os.link(src, dest)
+
+    # WHEN
+    installed = xcsoar.install_file(src, xcsoar.AIRSPACE_FILE)
+
+    # THEN
+    assert installed is not None
+    xcsoar.discard_backup(installed)
+    assert not os.path.samefile(src, dest)
+    assert xcsoar.install_file(src, xcsoar.AIRSPACE_FILE) is None
+
+
+def test_install_file_copy(storage_dir, xcsoar_dir, mocker) -> None:
+    # GIVEN
+    src = os.path.join(storage_dir, "airspace.txt")
+    with open(src, "w") as f:
+        f.write("AC D\n")
+    dest = os.path.join(xcsoar_dir, xcsoar.AIRSPACE_FILE)
+    with open(dest, "w") as f:
+        f.write("AC OLD\n")
+    mocker.patch("compman.xcsoar._reflink", side_effect=OSError("Not supported"))
+
+    # WHEN
+    installed = xcsoar.install_file(src, xcsoar.AIRSPACE_FILE)
+
+    # THEN
+    assert installed is not None and installed.backup is not None
+    with open(dest) as f:
+        assert f.read() == "AC D\n"
+    assert not os.path.samefile(src, dest)
+
+    # Modified file is installed again
+    with open(dest, "w") as f:
+        f.write("AC MODIFIED\n")
+    assert xcsoar.install_file(src, xcsoar.AIRSPACE_FILE) is not None
+    with open(dest) as f:
+        assert f.read() == "AC D\n"
@@ -1,12 +1,17 @@
 import asyncio
+import io
+import time
 
 import pytest
+from aiohttp import ClientError
 
 from compman import storage, xcsoar
 from compman.soaringspot import DownloadableFileType, SoaringSpotDownloadableFile
 from compman.soarscore import SoarScoreTaskInfo
 from compman.ui.compdetails import CompetitionDetailsScreen
 
+AIRSPACE = b"AC D\nDP 46:00:00 N 014:00:00 E\nDP 46:10:00 N 014:00:00 E\nDP 46:10:00 N 014:10:00 E\n"
+
 
 @pytest.mark.asyncio
 async def test_compdetails_view(
@@ -22,6 +27,46 @@ async def test_compdetails_view(
         assert "No updates" in activity_testbed.render()
 
 
+@pytest.mark.asyncio
+async def test_compdetails_waypoint_summary(
+    storage_dir, soaringspot, soarscore, xcsoar_dir, activity_testbed
+) -> None:
+    # GIVEN
+    _setup_test_comp()
+    storage.store_file(
+        "test",
+        "waypoints.cup",
+        io.BytesIO(
+            b"name,code,country,lat,lon\n"
+            b"Lesce,LESCE,SI,4621.467N,01410.417E\n"
+            b"Ptuj,PTUJ,SI,4624.000N,01551.000E\n"
+        ),
+    )
+
+    # WHEN
+    async with activity_testbed.shown(CompetitionDetailsScreen):
+        # THEN
+        await activity_testbed.wait_for_text("2 waypoints, 129 x 5 km")
+
+
+@pytest.mark.asyncio
+async def test_compdetails_airspace_warnings(
+    storage_dir, soaringspot, soarscore, xcsoar_dir, activity_testbed
+) -> None:
+    # GIVEN
+    _setup_test_comp()
+    zones = AIRSPACE * 20 + b"AC D\nDP 46:xx:00 N 014:00:00 E\n"
+    storage.store_file("test", "airspace.txt", io.BytesIO(zones))
+
+    # WHEN
+    async with activity_testbed.shown(CompetitionDetailsScreen):
+        # THEN
+        # File is still usable, errors are only shown
+        await activity_testbed.wait_for_text("20 zones: 20 D")
+        assert "ignored" in activity_testbed.render()
+        assert "Invalid" not in activity_testbed.render()
+
+
 @pytest.mark.asyncio
 async def test_compdetails_download(
     storage_dir, soaringspot, soarscore, xcsoar_dir, activity_testbed
@@ -53,6 +98,148 @@ async def test_compdetails_download(
         await asyncio.sleep(0)
 
 
+@pytest.mark.asyncio
+async def test_compdetails_download_shared_file(
+    storage_dir, soaringspot, soarscore, xcsoar_dir, activity_testbed
+) -> None:
+    # GIVEN
+    comp = _setup_test_comp()
+    airspace_url = "https://soaringspot.local/national/airspace.txt"
+    soaringspot.files = [
+        SoaringSpotDownloadableFile(
+            "airspace.txt", href=airspace_url, kind=DownloadableFileType.AIRSPACE
+        )
+    ]
+    soaringspot.file_contents = b"Hello World!"
+    async with activity_testbed.shown(CompetitionDetailsScreen):
+        await activity_testbed.gather_tasks()
+
+    # WHEN
+    # Another competition refers to the same file
+    other = storage.StoredCompetition(
+        id="other", title="Other", soaringspot_url="https://soaringspot.local/other"
+    )
+    storage.save_competition(other, set_current=True)
+    async with activity_testbed.shown(CompetitionDetailsScreen):
+        await activity_testbed.gather_tasks()
+        assert "airspace.txt (12.0B)" in activity_testbed.render()
+
+    # THEN
+    # File is downloaded and stored only once
+    assert soaringspot.downloaded == [airspace_url]
+    assert storage.get_full_file_path(
+        comp.id, "airspace.txt"
+    ) == storage.get_full_file_path(other.id, "airspace.txt")
+
+
+@pytest.mark.asyncio
+async def test_compdetails_download_failed(
+    storage_dir, soaringspot, soarscore, xcsoar_dir, activity_testbed
+) -> None:
+    # GIVEN
+    comp = _setup_test_comp()
+    soaringspot.files = [
+        SoaringSpotDownloadableFile(
+            "airspace.txt",
+            href=f"{comp.soaringspot_url}/airspace.txt",
+            kind=DownloadableFileType.AIRSPACE,
+        )
+    ]
+    soaringspot.download_file_exc = ClientError("Connection lost")
+
+    # WHEN
+    async with activity_testbed.shown(CompetitionDetailsScreen):
+        await activity_testbed.gather_tasks()
+
+        # THEN
+        assert "Download failed: Connection lost" in activity_testbed.render()
+
+    # File is not stored, so it will be downloaded again next time
+    assert storage.get_airspace_files(comp.id) == []
+
+
+@pytest.mark.asyncio
+async def test_compdetails_download_storage_error(
+    storage_dir, soaringspot, soarscore, xcsoar_dir, activity_testbed, mocker
+) -> None:
+    # GIVEN
+    comp = _setup_test_comp()
+    soaringspot.files = [
+        SoaringSpotDownloadableFile(
+            "airspace.txt",
+            href=f"{comp.soaringspot_url}/airspace.txt",
+            kind=DownloadableFileType.AIRSPACE,
+        )
+    ]
+    soaringspot.file_contents = AIRSPACE
+    mocker.patch(
+        "compman.storage.import_file",
+        side_effect=OSError(28, "No space left on device"),
+    )
+
+    # WHEN
+    async with activity_testbed.shown(CompetitionDetailsScreen):
+        await activity_testbed.gather_tasks()
+
+        # THEN
+        assert "Download failed: [Errno 28]" in activity_testbed.render()
+
+
+@pytest.mark.asyncio
+async def test_compdetails_offline(
+    storage_dir, soaringspot, soarscore, xcsoar_dir, activity_testbed, network
+) -> None:
+    # GIVEN
+    comp = _setup_test_comp()
+    soaringspot.files = [
+        SoaringSpotDownloadableFile(
+            "airspace.txt",
+            href=f"{comp.soaringspot_url}/airspace.txt",
+            kind=DownloadableFileType.AIRSPACE,
+        )
+    ]
+    network.go_offline()
+
+    # WHEN
+    async with activity_testbed.shown(CompetitionDetailsScreen):
+        await activity_testbed.gather_tasks()
+
+        # THEN
+        contents = activity_testbed.render()
+        assert "Offline, using stored competition files" in contents
+        assert "Offline, cannot fetch task" in contents
+
+    # Nothing is even attempted to download
+    assert soaringspot.downloaded == []
+
+
+@pytest.mark.asyncio
+async def test_compdetails_recently_synced(
+    storage_dir, soaringspot, soarscore, xcsoar_dir, activity_testbed
+) -> None:
+    # GIVEN
+    comp = _setup_test_comp()
+    comp.synced_at = time.time()
+    storage.save_competition(comp)
+    soaringspot.files = [
+        SoaringSpotDownloadableFile(
+            "airspace.txt",
+            href=f"{comp.soaringspot_url}/airspace.txt",
+            kind=DownloadableFileType.AIRSPACE,
+        )
+    ]
+
+    # WHEN
+    async with activity_testbed.shown(CompetitionDetailsScreen):
+        await activity_testbed.gather_tasks()
+
+        # THEN
+        assert "Competition files are up to date" in activity_testbed.render()
+
+    # Files were refreshed in background already, nothing is fetched again
+    assert soaringspot.downloaded == []
+
+
 @pytest.mark.asyncio
 async def test_compdetails_activate(
     storage_dir, soaringspot, soarscore, activity_testbed, xcsoar_dir, async_sleep
@@ -71,21 +258,24 @@ async def test_compdetails_activate(
             kind=DownloadableFileType.WAYPOINT,
         ),
     ]
-    soaringspot.file_contents = b"Hello World!"
+    soaringspot.file_contents = AIRSPACE
 
     async with activity_testbed.shown(CompetitionDetailsScreen):
         # Let everything to be downloaded
         await activity_testbed.gather_tasks()
 
         assert "New contest files detected!" in activity_testbed.render()
+        # Airspace is checked and its zones are counted
+        await activity_testbed.wait_for_text("1 zone: 1 D")
 
-        await activity_testbed.keypress("enter", "down")
+        await activity_testbed.keypress("enter", "down", "down")
         focused = activity_testbed.get_focus_widgets()[-1]
         assert focused.get_label() == "Activate"
         await activity_testbed.keypress("enter")
 
         # THEN
-        assert "XCSoar profiles updated" in activity_testbed.render()
+        # Profiles are updated off the event loop
+        await activity_testbed.wait_for_text("XCSoar profiles updated")
 
 
 @pytest.mark.asyncio
@@ -106,7 +296,7 @@ async def test_compdetails_select_files(
             kind=DownloadableFileType.WAYPOINT,
         ),
     ]
-    soaringspot.file_contents = b"Hello World!"
+    soaringspot.file_contents = AIRSPACE
 
     # WHEN
     async with activity_testbed.shown(CompetitionDetailsScreen):
@@ -119,10 +309,10 @@ async def test_compdetails_select_files(
         await activity_testbed.keypress("enter", "up", "enter", "up", "enter")
 
         # THEN
+        await activity_testbed.wait_for_text("Airspace changed to: airspace.txt")
         content = activity_testbed.render()
         assert "(X) airspace.txt" in content
         assert "(X) waypoints.cup" in content
-        assert "Airspace changed to: airspace.txt" in content
         assert "[X] openvario.prf" in content
 
     with open(xcsoar.get_xcsoar_profile_filename("openvario.prf"), "r") as f:
@@ -179,11 +369,15 @@ async def test_compdetails_select_class_and_download_task(
         # Click download
         await activity_testbed.keypress("down", "enter")
         await asyncio.sleep(0)
-        assert "Downloading Standard Task..." in activity_testbed.render()
-        await asyncio.sleep(0)
-        # await activity_testbed.gather_tasks()
+        # Task was already fetched to show its details, so it is installed
+        # without downloading it again
         rendered = activity_testbed.render()
         assert "Task downloaded and installed" in rendered
+        assert soarscore.fetched == ["http://soarscore.com/standard.tsk"]
+
+    # Task is kept in the competition task archive
+    archived = storage.list_tasks("test")
+    assert [t.title for t in archived] == ["Standard Task"]
 
 
 @pytest.mark.asyncio
@@ -198,7 +392,7 @@ async def test_remove_competition_confirm(
 
         # WHEN
         # Navigate to "remove" button and press it
-        await activity_testbed.keypress("down", "right", "enter")
+        await activity_testbed.keypress("down", "down", "right", "enter")
 
         # THEN
         rendered = activity_testbed.render()
@@ -226,7 +420,7 @@ async def test_remove_competition_cancel(
 
         # WHEN
         # Navigate to "remove" button and press it
-        await activity_testbed.keypress("down", "right", "enter")
+        await activity_testbed.keypress("down", "down", "right", "enter")
 
         # THEN
         rendered = activity_testbed.render()
@@ -3,7 +3,7 @@ import asyncio
 import pytest
 
 from compman import storage
-from compman.soaringspot import SoaringSpotContest
+from compman.soaringspot import SoaringSpotClientError, SoaringSpotContest
 from compman.ui.soaringspot import SoaringSpotPickerScreen
 from tests.fixtures.activitytestbed import ActivityTestbed
 from tests.fixtures.soaringspot import SoaringSpotFixture
@@ -50,6 +50,39 @@ async def test_soaringspot_view(
         assert focused.get_label() == "One"
 
 
+@pytest.mark.asyncio
+async def test_soaringspot_progressive(
+    soaringspot: SoaringSpotFixture, activity_testbed: ActivityTestbed
+) -> None:
+    # GIVEN
+    soaringspot.competitions = [
+        SoaringSpotContest(
+            id="one", href="http://soaringspot.local/one", title="One", description=""
+        ),
+        SoaringSpotContest(
+            id="two", href="http://soaringspot.local/two", title="Two", description=""
+        ),
+    ]
+
+    async with activity_testbed.shown(SoaringSpotPickerScreen):
+        # WHEN
+        while "One" not in activity_testbed.render():
+            await asyncio.sleep(0)
+
+        # THEN
+        # First contests can be picked while the rest is still downloading
+        contents = activity_testbed.render()
+        assert "Two" not in contents
+        assert "Downloading..." in contents
+        focused = activity_testbed.get_focus_widgets()[-1]
+        assert focused.get_label() == "One"
+
+        await activity_testbed.gather_tasks()
+        contents = activity_testbed.render()
+        assert "Two" in contents
+        assert "Downloading..." not in contents
+
+
 @pytest.mark.asyncio
 async def test_soaringspot_select(
     storage_dir: str, soaringspot: SoaringSpotFixture, activity_testbed: ActivityTestbed
@@ -124,3 +157,78 @@ async def test_soaringspot_existing(
         assert res.id == "one"
         assert res.title == "One"
         assert res.soaringspot_url == "http://soaringspot.local/one"
+
+
+@pytest.mark.asyncio
+async def test_soaringspot_cached(
+    soaringspot: SoaringSpotFixture, activity_testbed: ActivityTestbed
+) -> None:
+    # GIVEN
+    one = SoaringSpotContest(
+        id="one", href="http://soaringspot.local/one", title="One", description="1"
+    )
+    two = SoaringSpotContest(
+        id="two", href="http://soaringspot.local/two", title="Two", description="2"
+    )
+    new = SoaringSpotContest(
+        id="new", href="http://soaringspot.local/new", title="New", description="N"
+    )
+    soaringspot.cached_competitions = [one, two]
+    soaringspot.competitions = [new, one, two]
+
+    async with activity_testbed.shown(SoaringSpotPickerScreen):
+        # WHEN
+        # Cached list is shown right away, before it is revalidated
+        await asyncio.sleep(0)
+        contents = activity_testbed.render()
+        assert "Downloading..." not in contents
+        assert "One" in contents
+        assert "Two" in contents
+        assert "New" not in contents
+        await activity_testbed.keypress("down")
+
+        await activity_testbed.gather_tasks()
+
+        # THEN
+        # Refreshed list is shown, focus stays on the same competition
+        contents = activity_testbed.render()
+        assert "New" in contents
+        focused = activity_testbed.get_focus_widgets()[-1]
+        assert focused.get_label() == "Two"
+
+
+@pytest.mark.asyncio
+async def test_soaringspot_cached_offline(
+    soaringspot: SoaringSpotFixture, activity_testbed: ActivityTestbed
+) -> None:
+    # GIVEN
+    soaringspot.cached_competitions = [
+        SoaringSpotContest(
+            id="one", href="http://soaringspot.local/one", title="One", description=""
+        )
+    ]
+    soaringspot.fetch_competitions_exc = SoaringSpotClientError("No network")
+
+    # WHEN
+    async with activity_testbed.shown(SoaringSpotPickerScreen):
+        await activity_testbed.gather_tasks()
+
+        # THEN
+        contents = activity_testbed.render()
+        assert "One" in contents
+        assert "Error" not in contents
+
+
+@pytest.mark.asyncio
+async def test_soaringspot_offline(
+    soaringspot: SoaringSpotFixture, activity_testbed: ActivityTestbed, network
+) -> None:
+    # GIVEN
+    network.go_offline()
+
+    # WHEN
+    async with activity_testbed.shown(SoaringSpotPickerScreen):
+        await activity_testbed.gather_tasks()
+
+        # THEN
+        assert "Offline, cannot download competition list" in activity_testbed.render()
@@ -1,4 +1,6 @@
 import asyncio
+import os
+from typing import List
 
 import pytest
 import urwid
@@ -8,6 +10,9 @@ from compman.soarscore import SoarScoreClientError, SoarScoreTaskInfo
 from compman.ui.activity import Activity
 from compman.ui.taskdownload import TaskDownloadWidget
 
+HERE = os.path.dirname(__file__)
+TASK = os.path.join(HERE, "..", "fixtures", "soarscore", "task.tsk")
+
 
 class ActivityStub(Activity):
     async def wait_for_tasks(self) -> None:
@@ -50,6 +55,101 @@ async def test_taskdownload_notask(storage_dir, soarscore, widget_testbed) -> No
     assert "Refresh" in rendered
 
 
+@pytest.mark.asyncio
+async def test_taskdownload_previous_tasks(
+    storage_dir, soarscore, widget_testbed
+) -> None:
+    # GIVEN
+    state = {"installing_task": None}
+
+    def _on_install_task(ev, task):
+        state["installing_task"] = task
+
+    comp = storage.StoredCompetition(
+        "test",
+        "Test Competition",
+        soaringspot_url="http://soaringspot.com/test",
+        selected_class="Club",
+    )
+    storage.save_competition(comp)
+    storage.store_task("test", "Club", 1, 1, "yesterday", "Club Task", b"<T1/>")
+    storage.store_task("test", "Std", 1, 1, "yesterday", "Std Task", b"<S1/>")
+
+    # WHEN
+    act = ActivityStub(urwid.SolidFill("T"))
+    wdg = TaskDownloadWidget(act, comp)
+    urwid.connect_signal(wdg, "install", _on_install_task)
+    wtb = widget_testbed.for_widget(wdg)
+    await act.wait_for_tasks()
+
+    # THEN
+    rendered = wtb.render()
+    assert "No task for today" in rendered
+    assert "Previous tasks" in rendered
+    assert "Club Task day 1 task 1" in rendered
+    assert "Std Task" not in rendered
+
+    await wtb.keypress("down", "down", "enter")
+    installing = state["installing_task"]
+    assert isinstance(installing, storage.StoredTask)
+    assert storage.read_task(installing) == b"<T1/>"
+
+
+@pytest.mark.asyncio
+async def test_taskdownload_watch(storage_dir, soarscore, widget_testbed) -> None:
+    # GIVEN
+    state = {"downloading_task": None}
+
+    def _on_download_task(ev, task):
+        state["downloading_task"] = task
+
+    comp = storage.StoredCompetition(
+        "test",
+        "Test Competition",
+        soaringspot_url="http://soaringspot.com/test",
+        selected_class="Club",
+        autoinstall_tasks=True,
+    )
+    storage.save_competition(comp)
+    act = ActivityStub(urwid.SolidFill("T"))
+    wdg = TaskDownloadWidget(act, comp)
+    urwid.connect_signal(wdg, "download", _on_download_task)
+    wtb = widget_testbed.for_widget(wdg)
+    await act.wait_for_tasks()
+    assert "No task for today" in wtb.render()
+
+    # WHEN
+    await wtb.keypress("down", "enter")
+
+    # THEN
+    loaded = storage.load_competition("test")
+    assert loaded is not None and loaded.watch_tasks
+    assert wdg._watch_task is not None
+
+    # Nothing changed, nothing is emitted
+    assert not await wdg._watcher.poll()
+    assert state["downloading_task"] is None
+
+    # New task is shown and installed automatically
+    soarscore.tasks = [
+        SoarScoreTaskInfo(
+            comp_class="Club",
+            title="Club Task",
+            day_no=1,
+            task_no=1,
+            timestamp="now",
+            task_url="http://soarscore.com/club.tsk",
+        )
+    ]
+    assert await wdg._watcher.poll()
+    assert "Club Task day 1 task 1" in wtb.render()
+    assert state["downloading_task"] == soarscore.tasks[0]
+
+    # Unchecking stops the watcher
+    await wtb.keypress("down", "enter")
+    assert wdg._watch_task is None
+
+
 @pytest.mark.asyncio
 async def test_taskdownload_task_view(storage_dir, soarscore, widget_testbed) -> None:
     comp = storage.StoredCompetition(
@@ -90,6 +190,86 @@ async def test_taskdownload_task_view(storage_dir, soarscore, widget_testbed) ->
     assert "Refresh" in rendered
 
 
+@pytest.mark.asyncio
+async def test_taskdownload_task_summary(
+    storage_dir, soarscore, widget_testbed
+) -> None:
+    # GIVEN
+    comp = storage.StoredCompetition(
+        "test",
+        "Test Competition",
+        soaringspot_url="http://soaringspot.com/test",
+        selected_class="Club",
+    )
+    soarscore.tasks = [
+        SoarScoreTaskInfo(
+            comp_class="Club",
+            title="Club Task",
+            day_no=1,
+            task_no=1,
+            timestamp="now",
+            task_url="http://soarscore.com/club.tsk",
+        )
+    ]
+    with open(TASK, "rb") as f:
+        soarscore.task_content = f.read()
+    act = ActivityStub(urwid.SolidFill("T"))
+
+    # WHEN
+    wdg = TaskDownloadWidget(act, comp)
+    wtb = widget_testbed.for_widget(wdg)
+    await act.wait_for_tasks()
+    assert "Loading task details..." in wtb.render()
+    await act.wait_for_tasks()
+
+    # THEN
+    # Task is shown before it is installed, and kept in the archive
+    rendered = wtb.render()
+    assert "2 turnpoints, 353.6 km" in rendered
+    assert "Lesce - Ptuj - Bovec - Lesce" in rendered
+    assert [t.title for t in storage.list_tasks("test")] == ["Club Task"]
+
+    # Refreshing the view does not fetch the task again
+    wdg.update_archive()
+    await act.wait_for_tasks()
+    assert "353.6 km" in wtb.render()
+    assert soarscore.fetched == ["http://soarscore.com/club.tsk"]
+
+
+@pytest.mark.asyncio
+async def test_taskdownload_task_summary_invalid(
+    storage_dir, soarscore, widget_testbed
+) -> None:
+    # GIVEN
+    comp = storage.StoredCompetition(
+        "test",
+        "Test Competition",
+        soaringspot_url="http://soaringspot.com/test",
+        selected_class="Club",
+    )
+    soarscore.tasks = [
+        SoarScoreTaskInfo(
+            comp_class="Club",
+            title="Club Task",
+            day_no=1,
+            task_no=1,
+            timestamp="now",
+            task_url="http://soarscore.com/club.tsk",
+        )
+    ]
+    soarscore.task_content = b"<html>Not found</html>"
+    act = ActivityStub(urwid.SolidFill("T"))
+
+    # WHEN
+    wdg = TaskDownloadWidget(act, comp)
+    wtb = widget_testbed.for_widget(wdg)
+    await act.wait_for_tasks()
+    await act.wait_for_tasks()
+
+    # THEN
+    assert "Invalid task: not a task file" in wtb.render()
+
+
 @pytest.mark.asyncio
 async def test_taskdownload_task_download(
     storage_dir, soarscore, widget_testbed
@@ -179,6 +359,106 @@ async def test_taskdownload_refresh_api(storage_dir, soarscore, widget_testbed)
     assert "Club Task day 1 task 1" in rendered
 
 
+@pytest.mark.asyncio
+async def test_taskdownload_refresh_supersedes(
+    storage_dir, soarscore, widget_testbed, monkeypatch
+) -> None:
+    # GIVEN
+    responses: List[asyncio.Future] = []
+
+    async def fetch_latest_tasks(comp_id: str) -> List[SoarScoreTaskInfo]:
+        fut = asyncio.get_running_loop().create_future()
+        responses.append(fut)
+        return await fut
+
+    monkeypatch.setattr("compman.soarscore.fetch_latest_tasks", fetch_latest_tasks)
+    comp = storage.StoredCompetition(
+        "test",
+        "Test Competition",
+        soaringspot_url="http://soaringspot.com/test",
+        selected_class="Club",
+    )
+    act = ActivityStub(urwid.SolidFill("T"))
+    wdg = TaskDownloadWidget(act, comp)
+    wtb = widget_testbed.for_widget(wdg)
+    await asyncio.sleep(0)
+    superseded = wdg._fetch_task
+
+    # WHEN
+    wdg.refresh()
+    await asyncio.sleep(0)
+    responses[-1].set_result(
+        [
+            SoarScoreTaskInfo(
+                comp_class="Club",
+                title="Club Task",
+                day_no=2,
+                task_no=1,
+                timestamp="now",
+                task_url="http://soarscore.com/club.tsk",
+            )
+        ]
+    )
+    await act.wait_for_tasks()
+
+    # THEN
+    assert superseded is not None and superseded.cancelled()
+    assert responses[0].cancelled()
+    assert "Club Task day 2 task 1" in wtb.render()
+
+
+@pytest.mark.asyncio
+async def test_taskdownload_refresh_supersedes_coalesced(
+    storage_dir, widget_testbed, monkeypatch
+) -> None:
+    # GIVEN
+    # Only the page fetch is stubbed, so requests go through coalescing
+    responses: List[asyncio.Future] = []
+
+    async def _fetch_latest_tasks(comp_id: str) -> List[SoarScoreTaskInfo]:
+        fut = asyncio.get_running_loop().create_future()
+        responses.append(fut)
+        return await fut
+
+    monkeypatch.setattr("compman.soarscore._fetch_latest_tasks", _fetch_latest_tasks)
+    comp = storage.StoredCompetition(
+        "test",
+        "Test Competition",
+        soaringspot_url="http://soaringspot.com/test",
+        selected_class="Club",
+    )
+    act = ActivityStub(urwid.SolidFill("T"))
+    wdg = TaskDownloadWidget(act, comp)
+    wtb = widget_testbed.for_widget(wdg)
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    superseded = wdg._fetch_task
+
+    # WHEN
+    wdg.refresh()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    responses[-1].set_result(
+        [
+            SoarScoreTaskInfo(
+                comp_class="Club",
+                title="Club Task",
+                day_no=2,
+                task_no=1,
+                timestamp="now",
+                task_url="http://soarscore.com/club.tsk",
+            )
+        ]
+    )
+    await act.wait_for_tasks()
+
+    # THEN
+    assert superseded is not None and superseded.cancelled()
+    assert len(responses) == 2
+    assert wdg._fetch_task is not None and not wdg._fetch_task.cancelled()
+    assert "Club Task day 2 task 1" in wtb.render()
+
+
 @pytest.mark.asyncio
 async def test_taskdownload_refresh_btn(storage_dir, soarscore, widget_testbed) -> None:
     comp = storage.StoredCompetition(